@@ -11,23 +11,100 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 import models, database, hashlib
 from schemas import UserCreate
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from collections import OrderedDict
+import os, threading, time
 router = APIRouter()
 security = HTTPBearer()
 
+def hash_token(token: str) -> str:
+    """What the tokens table stores: the hex SHA-256 of the token, never the token itself."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# ---------- Token cache ----------
+class TokenCache:
+    """
+    Bounded LRU of API token -> user with a TTL.
+    Entries are keyed by hash_token(token), the value the tokens table stores, so raw
+    tokens are never kept in memory and one hash serves the cache and the DB lookup.
+    The DB only sees cold misses.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, user):
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache(
+    max_size=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300")),
+)
+
 # ---------- Token verification ----------
-def get_current_user(x_api_key: str = Header(...), db: Session = Depends(database.get_db)):
-    token = db.query(models.Token).filter(models.Token.token == x_api_key).first()
+async def get_current_user(x_api_key: str = Header(...), db: AsyncSession = Depends(database.get_async_db)):
+    # Async, so authenticating an async route never takes a thread-pool worker
+    token_hash = hash_token(x_api_key)
+    user = token_cache.get(token_hash)
+    if user is not None:
+        return user
+
+    # Load the token and its owner in one query so the cached user is fully loaded
+    result = await db.execute(
+        select(models.Token)
+        .options(joinedload(models.Token.owner))
+        .where(models.Token.token_hash == token_hash)
+    )
+    token = result.scalars().first()
     if not token:
         raise HTTPException(status_code=403, detail="Invalid token")
+    token_cache.put(token_hash, token.owner)
     return token.owner
 
 # ---------- Admin: Create token ----------
 def create_token(user, db: Session, name: str):
     token_str = secrets.token_hex(16)
-    new_token = models.Token(token=token_str, owner=user)
+    new_token = models.Token(token_hash=hash_token(token_str), owner=user)
     db.add(new_token)
     db.commit()
     db.refresh(new_token)
+    new_token.token = token_str  # only the hash is stored; this is the one chance to hand the token out
     return new_token
 
 from fastapi import APIRouter, Depends, HTTPException
@@ -47,20 +124,32 @@ def create_token(token_in: TokenCreate, db: Session = Depends(database.get_db)):
     # Generate random token
     token_str = secrets.token_hex(16)  # 32-character hex string
 
-    # Create and store the token
-    token = models.Token(token=token_str, owner=user)
+    # Create and store the token (only its hash is kept)
+    token = models.Token(token_hash=hash_token(token_str), owner=user)
     db.add(token)
     db.commit()
     db.refresh(token)
 
     return {
-        "token": token.token,
+        "token": token_str,
         "name": token_in.name,
         "user_email": user.username,
         "created_at": token.created_at
     }
 
 
+#@router.delete("v1/admin/tokens/{token}")
+def revoke_token(token: str, db: Session = Depends(database.get_db)):
+    token_hash = hash_token(token)
+    deleted = db.query(models.Token).filter(models.Token.token_hash == token_hash).delete()
+    db.commit()
+    # Drop the cached user right away instead of waiting for the TTL
+    token_cache.invalidate(token_hash)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Token not found")
+    return {"revoked": True}
+
+
 #@router.post("v1/admin/users")
 def create_user(user_in: UserCreate, db: Session = Depends(database.get_db)):
     existing = db.query(models.User).filter(models.User.username == user_in.username).first()
@@ -0,0 +1,63 @@
+"""
+Compare a fresh httpx client per decision (the previous get_ai_decision) with the
+shared pooled client in services.ai_services, against a running mock LLM:
+
+    uvicorn benchmarks.mock_llm_server:app --port 9100
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 python -m benchmarks.bench_ai_client [requests] [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+from services import ai_services
+from services.ai_services import ai_service
+
+PAYLOAD = {"symbol": "EURUSDm", "timeframes": {}, "sentiment": {}, "journal_recent": [], "backtest_profile": {}}
+
+
+async def fresh_client_decision(model_input):
+    body = {"model": ai_services.OPENAI_MODEL, "messages": [{"role": "user", "content": str(model_input)}]}
+    async with httpx.AsyncClient(timeout=None) as client:
+        response = await client.post(f"{ai_services.OPENAI_BASE_URL}/chat/completions", json=body)
+    return response.json()
+
+
+async def run(name, decide, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await decide(PAYLOAD)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{name:>8}: {requests / elapsed:8.1f} req/s  "
+        f"p50 {statistics.median(latencies) * 1e3:7.1f} ms  p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e3:7.1f} ms"
+    )
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"base_url={ai_services.OPENAI_BASE_URL} requests={requests} concurrency={concurrency}")
+
+    await run("fresh", fresh_client_decision, requests, concurrency)
+    await ai_service.start()
+    try:
+        await run("pooled", ai_service.get_ai_decision, requests, concurrency)
+    finally:
+        await ai_service.close()
+    print(f"retries={ai_service.retries} failures={ai_service.failures}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
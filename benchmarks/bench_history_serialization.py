@@ -0,0 +1,53 @@
+"""
+Compare the two ways of serializing /market/quotes/{symbol}/history:
+
+- dataframe: the previous path (DataFrame, iloc[::-1], to_dict, HistoricalDataResponse validation, JSON)
+- fast:      services.fast_json straight from the numpy rates array
+
+run: python -m benchmarks.bench_history_serialization [candles] [repeats]
+"""
+import json
+import sys
+import timeit
+
+import pandas as pd
+
+from schemas import HistoricalDataResponse
+from services import fast_json
+from services.mt5_sim import SimulatedMT5
+
+
+def dataframe_path(symbol: str, timeframe: str, rates) -> bytes:
+    df = pd.DataFrame(rates)
+    df["time"] = pd.to_datetime(df["time"], unit="s", utc=True)
+    df = df[["time", "open", "high", "low", "close", "tick_volume"]]
+    df = df.iloc[::-1].reset_index(drop=True)
+    body = {"symbol": symbol, "timeframe": timeframe, "historical_data": df.to_dict(orient="records")}
+    return HistoricalDataResponse.model_validate(body).model_dump_json().encode()
+
+
+def fast_path(symbol: str, timeframe: str, rates) -> bytes:
+    return fast_json.history_response(symbol, timeframe, rates)
+
+
+def main():
+    candles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    sim = SimulatedMT5(clock=lambda: 1_730_000_000.0)
+    rates = sim.copy_rates_from_pos("EURUSDm", sim.TIMEFRAME_M5, 0, candles)
+
+    # Both paths must produce the same document
+    assert json.loads(dataframe_path("EURUSDm", "5MIN", rates)) == json.loads(fast_path("EURUSDm", "5MIN", rates))
+
+    print(f"candles={candles} repeats={repeats} encoder={'orjson' if fast_json.orjson else 'json'}")
+    results = {}
+    for name, fn in (("dataframe", dataframe_path), ("fast", fast_path)):
+        seconds = min(timeit.repeat(lambda: fn("EURUSDm", "5MIN", rates), number=repeats, repeat=5)) / repeats
+        results[name] = seconds
+        print(f"{name:>10}: {seconds * 1e6:10.1f} us/request")
+    print(f"{'speedup':>10}: {results['dataframe'] / results['fast']:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
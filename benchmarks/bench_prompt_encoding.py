@@ -0,0 +1,64 @@
+"""
+Prompt size and encode time of the /ai/decision dataset:
+
+- raw:     json.dumps(model_input), the previous prompt body
+- compact: services.ai_services.encode_model_input without a token budget
+- budget:  encode_model_input with AI_PROMPT_TOKEN_BUDGET (or the budget given)
+
+Tokens are exact when tiktoken is installed, otherwise estimated.
+
+run: python -m benchmarks.bench_prompt_encoding [budget] [repeats]
+"""
+import json
+import sys
+import timeit
+
+from services import ai_services, fast_json
+from services.ai_services import count_tokens, encode_model_input
+from services.mt5_sim import SimulatedMT5
+
+TIMEFRAMES = {"M5": 200, "M15": 100, "H1": 100, "H4": 50, "D1": 30}
+
+
+def sample_payload() -> dict:
+    sim = SimulatedMT5(clock=lambda: 1_730_000_000.0)
+    frames = {}
+    for tf, count in TIMEFRAMES.items():
+        rates = sim.copy_rates_from_pos("EURUSDm", getattr(sim, f"TIMEFRAME_{tf}"), 0, count)
+        # Shaped like /market/quotes/{symbol}/bundle: newest first, ISO times, float64 prices
+        frames[tf] = {"symbol": "EURUSDm", "timeframe": tf, "historical_data": fast_json.candle_records(rates)}
+    return {
+        "symbol": "EURUSDm",
+        "timeframes": frames,
+        "sentiment": {"score": 0.2, "headlines": ["ECB holds rates", "US CPI due 13:30"]},
+        "journal_recent": [
+            {"symbol": "EURUSDm", "direction": "buy", "entry_price": 1.08512, "stop_loss": 1.08312, "result_pnl": 42.0}
+        ] * 10,
+        "backtest_profile": {"win_rate": 0.56, "best_session": "london"},
+    }
+
+
+def main():
+    budget = int(sys.argv[1]) if len(sys.argv) > 1 else ai_services.AI_PROMPT_TOKEN_BUDGET
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    payload = sample_payload()
+
+    variants = {
+        "raw": lambda: json.dumps(payload),
+        "compact": lambda: encode_model_input(payload, token_budget=0),
+        "budget": lambda: encode_model_input(payload, token_budget=budget),
+    }
+
+    # The compact encoding must carry the same candles as the raw payload
+    compact = json.loads(variants["compact"]())
+    assert compact["timeframes"]["M5"]["c"][-1] == payload["timeframes"]["M5"]["historical_data"][0]["close"]
+
+    print(f"timeframes={TIMEFRAMES} budget={budget} tokens={'tiktoken' if ai_services.tiktoken else 'estimated'}")
+    for name, encode in variants.items():
+        text = encode()
+        seconds = min(timeit.repeat(encode, number=repeats, repeat=3)) / repeats
+        print(f"{name:>8}: {len(text):9,d} chars {count_tokens(text):9,d} tokens {seconds * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
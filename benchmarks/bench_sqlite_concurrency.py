@@ -0,0 +1,96 @@
+"""
+Concurrent journal reads and writes against a scratch SQLite file, with the
+default SQLite settings versus the tuned engine from database.make_engine
+(WAL, synchronous=NORMAL, cache_size, mmap_size, busy_timeout, sized pool).
+
+Writers insert TradeJournal rows one commit at a time, like POST /journal/.
+Readers run db_service.get_recent_trades, like GET /journal/recent.
+
+run: python -m benchmarks.bench_sqlite_concurrency [writers] [readers] [seconds]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+import models
+from schemas import TradeJournalCreate
+from services import db_service
+
+
+ROW = TradeJournalCreate(
+    symbol="EURUSDm",
+    direction="buy",
+    entry_price=1.085,
+    stop_loss=1.082,
+    take_profit_1=1.09,
+    position_size=0.1,
+    risk_pct=1.0,
+    confidence=72,
+    reasoning="benchmark",
+    snapshot_json="{}",
+    sentiment_json="{}",
+)
+
+
+def run(engine, writers: int, readers: int, seconds: float) -> dict:
+    database.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind: str):
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            db = Session()
+            try:
+                if kind == "writes":
+                    db_service.create_trade_journal(db, ROW)
+                else:
+                    db_service.get_recent_trades(db, 50)
+                done += 1
+            except Exception:
+                errors += 1
+            finally:
+                db.close()
+        with lock:
+            counts[kind] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=worker, args=("writes",)) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=("reads",)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return {k: (v / seconds if k != "errors" else v) for k, v in counts.items()}
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    print(f"writers={writers} readers={readers} seconds={seconds}")
+    with tempfile.TemporaryDirectory() as tmp:
+        engines = {
+            "default": create_engine(
+                f"sqlite:///{os.path.join(tmp, 'default.db')}",
+                connect_args={"check_same_thread": False},
+            ),
+            "tuned": database.make_engine(f"sqlite:///{os.path.join(tmp, 'tuned.db')}"),
+        }
+        for name, engine in engines.items():
+            result = run(engine, writers, readers, seconds)
+            print(f"{name:>8}: {result['writes']:8.0f} writes/s {result['reads']:8.0f} reads/s {result['errors']:5d} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Minimal stand-in for the OpenAI chat completions API, for benchmarks and local runs.
+
+run:  uvicorn benchmarks.mock_llm_server:app --port 9100
+then: OPENAI_BASE_URL=http://127.0.0.1:9100/v1 uvicorn main:app
+
+MOCK_LLM_LATENCY_MS   delay before answering (default 200)
+MOCK_LLM_ERROR_RATE   fraction of requests answered with 503 (default 0)
+MOCK_LLM_429_RATE     fraction of requests answered with 429 + Retry-After (default 0)
+MOCK_LLM_CHUNK_MS     delay between chunks of a "stream": true answer (default 20)
+
+With "stream": true the latency is the time to the first chunk and the decision
+is sent as SSE chunks of a few characters each, like the real API.
+"""
+import asyncio
+import json
+import os
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = float(os.getenv("MOCK_LLM_LATENCY_MS", "200")) / 1000
+ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+RATE_LIMIT_RATE = float(os.getenv("MOCK_LLM_429_RATE", "0"))
+CHUNK_DELAY = float(os.getenv("MOCK_LLM_CHUNK_MS", "20")) / 1000
+
+DECISION = {
+    "direction": "buy",
+    "entry": 1.0850,
+    "stop": 1.0830,
+    "targets": [1.0870, 1.0890],
+    "confidence": 72,
+    "reasoning": "mock decision",
+}
+
+app = FastAPI(title="Mock LLM")
+app.state.requests = 0
+app.state.streams_cancelled = 0
+
+
+async def stream_chunks(request_id: str, model: str):
+    content = json.dumps(DECISION)
+    try:
+        for i in range(0, len(content), 8):
+            chunk = {
+                "id": request_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[i:i + 8]}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(CHUNK_DELAY)
+        yield "data: [DONE]\n\n"
+    except asyncio.CancelledError:
+        app.state.streams_cancelled += 1  # the client closed the connection mid-generation
+        raise
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    app.state.requests += 1
+    await asyncio.sleep(LATENCY)
+
+    roll = random.random()
+    if roll < RATE_LIMIT_RATE:
+        return JSONResponse({"error": {"message": "rate limited"}}, status_code=429, headers={"Retry-After": "0.05"})
+    if roll < RATE_LIMIT_RATE + ERROR_RATE:
+        return JSONResponse({"error": {"message": "overloaded"}}, status_code=503)
+
+    if body.get("stream"):
+        return StreamingResponse(
+            stream_chunks(f"mock-{app.state.requests}", body.get("model", "mock")), media_type="text/event-stream"
+        )
+
+    prompt_chars = sum(len(m.get("content", "")) for m in body.get("messages", []))
+    return {
+        "id": f"mock-{app.state.requests}",
+        "object": "chat.completion",
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": json.dumps(DECISION)}}],
+        "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": 40, "total_tokens": prompt_chars // 4 + 40},
+    }
+
+
+@app.get("/v1/stats")
+async def stats():
+    return {"requests": app.state.requests, "streams_cancelled": app.state.streams_cancelled}
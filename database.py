@@ -1,15 +1,100 @@
-from sqlalchemy import create_engine
+from sqlalchemy import (
+    Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text,
+    bindparam, create_engine, event, inspect, text,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from datetime import datetime, timezone
 import os
-import sqlite3
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./instruments.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Applied to every new SQLite connection. WAL lets readers run while a writer commits,
+# synchronous=NORMAL is durable in WAL mode without an fsync per commit.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KB", "65536")),  # negative = KiB per connection
+    "mmap_size": int(os.getenv("SQLITE_MMAP_MB", "256")) * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "foreign_keys": "ON",
+}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def make_engine(url: str = DATABASE_URL):
+    """Engine with the pool sized for the API's thread pool and, for SQLite, the pragmas above."""
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_pre_ping=True)
+
+    options = {"connect_args": {"check_same_thread": False}}
+    if ":memory:" not in url:
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        )
+    engine = create_engine(url, **options)
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+# Async drivers for the same database, used by the event-loop routes
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def make_async_engine(url: str = DATABASE_URL):
+    """Async twin of make_engine(): same pool sizing and SQLite pragmas."""
+    if not url.startswith("sqlite"):
+        return create_async_engine(async_url(url), pool_pre_ping=True)
+
+    options = {}
+    if ":memory:" not in url:
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        )
+    engine = create_async_engine(async_url(url), **options)
+    event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = make_async_engine(DATABASE_URL)
+# expire_on_commit=False: returned rows stay readable after commit without another round trip
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Dialects whose insert() supports ON CONFLICT DO NOTHING (the upserts in services/)
+DIALECT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def dialect_insert(db, table):
+    """insert(table) for the database behind `db` (a Session, AsyncSession or Connection)."""
+    dialect = db.dialect if hasattr(db, "dialect") else db.get_bind().dialect
+    try:
+        return DIALECT_INSERTS[dialect.name](table)
+    except KeyError:
+        raise NotImplementedError(f"No ON CONFLICT insert for the {dialect.name} dialect")
+
 def get_db():
     db = SessionLocal()
     try:
@@ -17,53 +102,192 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ---------- Versioned schema setup ----------
+
+def _baseline_schema() -> MetaData:
+    """
+    The tables as the first release created them, frozen here rather than taken from
+    models.py: later migrations add to this, so a fresh database goes through the same
+    steps as an upgraded one.
+    """
+    metadata = MetaData()
+    Table(
+        "users", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("username", String, unique=True, index=True),
+        Column("hashed_password", String),
+        Column("role", String),
+    )
+    Table(
+        "tokens", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("token", String, unique=True, index=True),
+        Column("user_id", Integer, ForeignKey("users.id")),
+        Column("created_at", DateTime),
+    )
+    Table(
+        "instruments", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("symbol", String, index=True),
+        Column("description", String),
+        Column("session", String),
+        Column("volatility_profile", Text),
+        Column("backtest_json", Text),
+        Column("created_at", DateTime),
+    )
+    Table(
+        "trade_journal", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("symbol", String, index=True),
+        Column("direction", String),
+        Column("entry_price", Float),
+        Column("stop_loss", Float),
+        Column("take_profit_1", Float),
+        Column("take_profit_2", Float),
+        Column("take_profit_3", Float),
+        Column("position_size", Float),
+        Column("risk_pct", Float),
+        Column("status", String),
+        Column("result_pnl", Float),
+        Column("confidence", Float),
+        Column("reasoning", Text),
+        Column("snapshot_json", Text),
+        Column("sentiment_json", Text),
+        Column("opened_at", DateTime),
+        Column("closed_at", DateTime),
+    )
+    return metadata
+
+
+def _create_tables(conn):
+    # checkfirst: databases from the first release already have these tables
+    _baseline_schema().create_all(bind=conn, checkfirst=True)
+
+
+def _retire_legacy_tables(conn):
+    """
+    Older builds also ran a raw sqlite3 init_db() at import time. It created a `trades`
+    table next to `trade_journal` and an `instruments` table without the ORM's indexes.
+    """
+    tables = inspect(conn).get_table_names()
+    if "trades" in tables:
+        columns = (
+            "symbol, direction, entry_price, stop_loss, take_profit_1, take_profit_2, take_profit_3, "
+            "position_size, risk_pct, status, result_pnl, confidence, reasoning, snapshot_json, "
+            "sentiment_json, opened_at, closed_at"
+        )
+        conn.execute(text(f"INSERT INTO trade_journal ({columns}) SELECT {columns} FROM trades"))
+        conn.execute(text("DROP TABLE trades"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_instruments_id ON instruments (id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_instruments_symbol ON instruments (symbol)"))
+
+
+def _journal_query_indexes(conn):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_trade_journal_symbol_status_opened_at ON trade_journal (symbol, status, opened_at)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_trade_journal_opened_at ON trade_journal (opened_at)"))
+
+
+def _journal_stats(conn):
+    """exit_price on trade_journal plus the journal_stats aggregate table (fill it with services.journal_stats rebuild)."""
+    import models
+    if "exit_price" not in {c["name"] for c in inspect(conn).get_columns("trade_journal")}:
+        conn.execute(text("ALTER TABLE trade_journal ADD COLUMN exit_price FLOAT"))
+    models.JournalStats.__table__.create(bind=conn, checkfirst=True)
+
+
+def _snapshot_blobs(conn, batch_size: int = 500):
+    """
+    Move the inline snapshot_json / sentiment_json text into snapshot_blobs and keep
+    only the refs on trade_journal. Run VACUUM afterwards to return the freed pages.
+    """
+    import models
+    from services import snapshot_store
+
+    models.SnapshotBlob.__table__.create(bind=conn, checkfirst=True)
+    columns = {c["name"] for c in inspect(conn).get_columns("trade_journal")}
+    for ref in ("snapshot_ref", "sentiment_ref"):
+        if ref not in columns:
+            conn.execute(text(f"ALTER TABLE trade_journal ADD COLUMN {ref} VARCHAR REFERENCES snapshot_blobs (hash)"))
+
+    for legacy, ref in (("snapshot_json", "snapshot_ref"), ("sentiment_json", "sentiment_ref")):
+        if legacy not in columns:
+            continue
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                text(f"SELECT id, {legacy} FROM trade_journal WHERE id > :last_id AND {legacy} IS NOT NULL ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": batch_size},
+            ).fetchall()
+            if not rows:
+                break
+            conn.execute(
+                text(f"UPDATE trade_journal SET {ref} = :ref WHERE id = :id"),
+                [{"id": row_id, "ref": snapshot_store.put(conn, value)} for row_id, value in rows],
+            )
+            last_id = rows[-1][0]
+        conn.execute(text(f"ALTER TABLE trade_journal DROP COLUMN {legacy}"))
+
+
+def _hash_api_tokens(conn):
+    """Replace the plaintext tokens.token column with token_hash (hex SHA-256, as auth.hash_token)."""
+    import hashlib
+
+    if "token" not in {c["name"] for c in inspect(conn).get_columns("tokens")}:
+        return
+    rows = conn.execute(text("SELECT id, token FROM tokens WHERE token IS NOT NULL")).fetchall()
+    conn.execute(text("DROP INDEX IF EXISTS ix_tokens_token"))
+    conn.execute(text("ALTER TABLE tokens RENAME COLUMN token TO token_hash"))
+    if rows:
+        conn.execute(
+            text("UPDATE tokens SET token_hash = :token_hash WHERE id = :id"),
+            [{"id": row_id, "token_hash": hashlib.sha256(token.encode()).hexdigest()} for row_id, token in rows],
+        )
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_tokens_token_hash ON tokens (token_hash)"))
+
+
+def _backfill_opened_at(conn):
+    """
+    Rows copied from the legacy `trades` table can have no opened_at. Keyset pagination
+    orders and encodes cursors by (opened_at, id), so give them closed_at, or else the
+    time of this migration.
+    """
+    conn.execute(
+        text("UPDATE trade_journal SET opened_at = COALESCE(closed_at, :now) WHERE opened_at IS NULL")
+        .bindparams(bindparam("now", type_=DateTime)),
+        {"now": datetime.now(timezone.utc).replace(tzinfo=None)},
+    )
+
+
+# (version, migration) pairs, applied in order; append new ones, never edit applied ones
+MIGRATIONS = [
+    (1, _create_tables),
+    (2, _retire_legacy_tables),
+    (3, _journal_query_indexes),
+    (4, _journal_stats),
+    (5, _snapshot_blobs),
+    (6, _hash_api_tokens),
+    (7, _backfill_opened_at),
+]
 
 
-def get_connection():
-    conn = sqlite3.connect("instruments.db")
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS trades (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        symbol TEXT,
-        direction TEXT,
-        entry_price REAL,
-        stop_loss REAL,
-        take_profit_1 REAL,
-        take_profit_2 REAL,
-        take_profit_3 REAL,
-        position_size REAL,
-        risk_pct REAL,
-        status TEXT,
-        result_pnl REAL,
-        confidence REAL,
-        reasoning TEXT,
-        snapshot_json TEXT,
-        sentiment_json TEXT,
-        opened_at TEXT,
-        closed_at TEXT
-    );
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS instruments (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        symbol TEXT,
-        description TEXT,
-        session TEXT,
-        volatility_profile TEXT,
-        backtest_json TEXT,
-        created_at TEXT
-    );
-    """)
-
-    conn.commit()
-    conn.close()
-
-init_db()
+def init_db(bind=None):
+    """Bring the schema up to the latest version. Called once from the app lifespan."""
+    bind = bind or engine
+    with bind.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        current = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+        for version, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            migrate(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": version})
+            print(f"Database schema migrated to version {version}")
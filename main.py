@@ -3,19 +3,34 @@ from routes import market, account, trade
 import database
 from contextlib import asynccontextmanager
 from services import mt5_service
+from services.tick_stream import tick_hub
+from services.indicators import indicator_engine
+from services.ai_services import ai_service
+from services.decision_cache import decision_cache
 import auth
-from routes import journal, instruments
+from routes import journal, instruments, backtest, bias, ai
 
 # ---------- Lifespan ----------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    database.Base.metadata.create_all(bind=database.engine)
-    try:
-        mt5_service.initialize()
+    # Versioned schema setup, once per process (nothing runs at import time)
+    database.init_db()
+    # One thread owns the terminal; one long-lived session on it health-checks and reconnects itself
+    mt5_service.worker.start()
+    mt5_service.session.start()
+    if mt5_service.session.connected:
         print("MT5 connected on startup")
-    except Exception as e:
-        print("Warning: MT5 failed to initialize", e)
+        try:
+            print(f"Symbol catalog loaded: {mt5_service.symbol_catalog.refresh()} symbols")
+        except Exception as e:
+            print("Warning: symbol catalog failed to load", e)
+    # Pooled keep-alive client for the LLM API, shared by every decision request
+    await ai_service.start()
     yield
+    await ai_service.close()
+    await tick_hub.close()
+    mt5_service.session.stop()
+    mt5_service.worker.stop()
     print("MT5 connection closed on shutdown")
 
 app = FastAPI(
@@ -31,6 +46,9 @@ app.include_router(account.router, dependencies=[Depends(auth.get_current_user)]
 app.include_router(trade.router, dependencies=[Depends(auth.get_current_user)])
 app.include_router(instruments.router, dependencies=[Depends(auth.get_current_user)])
 app.include_router(journal.router, dependencies=[Depends(auth.get_current_user)])
+app.include_router(backtest.router, dependencies=[Depends(auth.get_current_user)])
+app.include_router(bias.router, dependencies=[Depends(auth.get_current_user)])
+app.include_router(ai.router, dependencies=[Depends(auth.get_current_user)])
 
 # Make the routes public
 #app.include_router(market.router)
@@ -40,3 +58,17 @@ app.include_router(journal.router, dependencies=[Depends(auth.get_current_user)]
 @app.get("/")
 def root():
     return {"message": "Welcome to the FOREX Trading API"}
+
+@app.get("/health")
+def health():
+    """MT5 session state and worker queue depth."""
+    return {
+        "mt5": mt5_service.session.status(),
+        "worker": mt5_service.worker.stats(),
+        "candle_cache": mt5_service.candle_cache.stats(),
+        "tick_stream": tick_hub.stats(),
+        "indicators": indicator_engine.stats(),
+        "ai_client": ai_service.stats(),
+        "ai_decision_cache": decision_cache.stats(),
+        "auth_cache": auth.token_cache.stats(),
+    }
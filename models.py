@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Index, LargeBinary
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 from database import Base
 
@@ -16,7 +16,7 @@ class User(Base):
 class Token(Base):
     __tablename__ = "tokens"
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, unique=True, index=True)
+    token_hash = Column(String, unique=True, index=True)  # auth.hash_token(token); the token itself is not stored
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
     owner = relationship("User", back_populates="tokens")
@@ -34,13 +34,30 @@ class Instrument(Base):
     symbol = Column(String, index=True)
     description = Column(String, nullable=True)
     session = Column(String, nullable=True)
-    volatility_profile = Column(Text, nullable=True)
-    backtest_json = Column(Text, nullable=True)
+    # Large Text columns are deferred (group "detail"): loaded only when a query asks for them
+    volatility_profile = deferred(Column(Text, nullable=True), group="detail")
+    backtest_json = deferred(Column(Text, nullable=True), group="detail")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SnapshotBlob(Base):
+    """Compressed snapshot text, keyed by the sha256 of the uncompressed text."""
+    __tablename__ = "snapshot_blobs"
+
+    hash = Column(String, primary_key=True)
+    codec = Column(String, nullable=False)     # zlib / zstd
+    size = Column(Integer, nullable=False)     # uncompressed bytes
+    data = Column(LargeBinary, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class TradeJournal(Base):
     __tablename__ = "trade_journal"
+    __table_args__ = (
+        # Journal queries filter on symbol/status and page newest-first by (opened_at, id)
+        Index("ix_trade_journal_symbol_status_opened_at", "symbol", "status", "opened_at"),
+        Index("ix_trade_journal_opened_at", "opened_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -59,13 +76,42 @@ class TradeJournal(Base):
     # Trade status + PnL
     status = Column(String, default="open")   # open/closed/cancelled
     result_pnl = Column(Float, nullable=True)
+    exit_price = Column(Float, nullable=True)  # used for the R multiple in journal_stats
 
     # AI reasoning + memory snapshots
     confidence = Column(Float)
-    reasoning = Column(Text)
-    snapshot_json = Column(Text)        # LTF + HTF candle data at entry
-    sentiment_json = Column(Text)       # News sentiment at entry
+    reasoning = deferred(Column(Text), group="detail")
+    # Keys into snapshot_blobs (see services.snapshot_store), loaded only on request
+    snapshot_ref = Column(String, ForeignKey("snapshot_blobs.hash"), nullable=True)    # LTF + HTF candle data at entry
+    sentiment_ref = Column(String, ForeignKey("snapshot_blobs.hash"), nullable=True)   # News sentiment at entry
 
     # Timestamps
     opened_at = Column(DateTime, default=datetime.utcnow)
     closed_at = Column(DateTime, nullable=True)
+
+
+class JournalStats(Base):
+    """
+    Running performance aggregates per (symbol, direction), maintained by
+    db_service.close_trade. "*" rows aggregate across all symbols / directions.
+    """
+    __tablename__ = "journal_stats"
+
+    symbol = Column(String, primary_key=True)
+    direction = Column(String, primary_key=True)
+
+    trades = Column(Integer, default=0, nullable=False)
+    wins = Column(Integer, default=0, nullable=False)
+    losses = Column(Integer, default=0, nullable=False)
+    gross_profit = Column(Float, default=0.0, nullable=False)
+    gross_loss = Column(Float, default=0.0, nullable=False)   # positive number
+
+    r_trades = Column(Integer, default=0, nullable=False)     # trades with a known R multiple
+    sum_r = Column(Float, default=0.0, nullable=False)
+
+    # Closed-trade equity curve, in close order
+    equity = Column(Float, default=0.0, nullable=False)
+    peak_equity = Column(Float, default=0.0, nullable=False)
+    max_drawdown = Column(Float, default=0.0, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -1,19 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, List
-from services.ai_services import ai_service
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from typing import Dict, Any, List, Optional
+import asyncio
+import os
+import time
+import httpx
+from services import fast_json, mt5_service
+from services.ai_context import assemble_model_payload
+from services.ai_services import ai_service, parse_decision
+from services.decision_cache import decision_cache
+from schemas import TimeframeData
 import auth
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
+AI_SCAN_CONCURRENCY = int(os.getenv("AI_SCAN_CONCURRENCY", "5"))      # scan LLM calls in flight, across all scans
+AI_SCAN_DEADLINE = float(os.getenv("AI_SCAN_DEADLINE", "30"))         # seconds per LLM call
+SCAN_MAX_SYMBOLS = 100
 
-# ---------- Request Schema ----------
+# Shared by every /ai/scan request, so parallel scans cannot multiply the upstream load
+scan_slots = asyncio.Semaphore(AI_SCAN_CONCURRENCY)
 
-class TimeframeData(BaseModel):
-    symbol: str
-    timeframe: str
-    historical_data: List[Dict[str, Any]]
 
+# ---------- Request Schema ----------
 
 class AIRequest(BaseModel):
     symbol: str
@@ -23,14 +35,227 @@ class AIRequest(BaseModel):
     backtest_profile: Dict[str, Any] = {}
 
 
+class AIContextRequest(BaseModel):
+    """Body of /ai/decision/{symbol}: everything else is assembled on the server."""
+    timeframes: Optional[Dict[str, int]] = Field(
+        None,
+        example={"M5": 200, "M15": 100, "H1": 100, "H4": 50, "D1": 30},
+        description="Timeframe -> number of candles (1-1000); defaults to M5/M15/H1/H4/D1 x 100"
+    )
+    sentiment: Dict[str, Any] = {}
+    journal_limit: int = Field(10, ge=0, le=100, description="Recent trades on this symbol to include")
+
+
+class AIScanRequest(BaseModel):
+    """Body of /ai/scan: one decision per watchlist symbol, payloads assembled on the server."""
+    symbols: List[str] = Field(
+        ..., min_length=1, max_length=SCAN_MAX_SYMBOLS, json_schema_extra={"example": ["EURUSD", "XAUUSD", "GBPJPY"]}
+    )
+    timeframes: Optional[Dict[str, int]] = Field(None, description="As in /ai/decision/{symbol}, shared by all symbols")
+    sentiment: Dict[str, Dict[str, Any]] = Field({}, description="Symbol -> sentiment; symbols not listed get {}")
+    journal_limit: int = Field(10, ge=0, le=100)
+    deadline: Optional[float] = Field(None, gt=0, le=300, description="Seconds per LLM call; default AI_SCAN_DEADLINE")
+
+
+# ---------- Decision helpers ----------
+
+def symbol_digits(symbol: str) -> Optional[int]:
+    """Price digits from the symbol catalog, if it is loaded (never calls MT5 from the event loop)."""
+    catalog = mt5_service.symbol_catalog
+    if not catalog.loaded:
+        return None
+    resolved = catalog.resolve(symbol.upper())
+    info = catalog.get(resolved) if resolved else None
+    return getattr(info, "digits", None)
+
+
+async def cached_decision(model_payload: Dict[str, Any], refresh: bool = False):
+    """
+    (decision, cache outcome) for a model payload. Identical payloads within the same
+    bar share one upstream call; upstream failures become HTTP errors.
+    """
+    digits = symbol_digits(model_payload["symbol"])
+    try:
+        return await decision_cache.get_or_compute(
+            model_payload, lambda: ai_service.decide(model_payload, digits), refresh=refresh
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=504 if isinstance(e, httpx.TimeoutException) else 502, detail=upstream_error(e))
+    except asyncio.TimeoutError:  # joined a /ai/scan call that ran out of its deadline
+        raise HTTPException(status_code=504, detail="AI provider timed out")
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def upstream_error(e: Exception) -> str:
+    """Client-facing message for a failed decision: httpx errors, or the ValueError of an invalid answer."""
+    if isinstance(e, httpx.TimeoutException):
+        return "AI provider timed out"
+    if isinstance(e, httpx.HTTPStatusError):
+        return f"AI provider returned {e.response.status_code}"
+    if isinstance(e, httpx.HTTPError):
+        return f"AI provider unreachable: {e}"
+    return str(e)
+
+
+async def decision_events(model_payload: Dict[str, Any], refresh: bool = False):
+    """
+    SSE body of the streaming decision endpoints: "token" events with the model's
+    output as it arrives, then one "decision" event with the validated JSON, or an
+    "error" event. A cached decision, or one another request is already producing
+    for the same payload, is sent as the "decision" event without tokens. If the
+    client disconnects, Starlette cancels this generator and closing the upstream
+    stream cancels the generation; requests coalesced on it then start their own.
+    """
+    while True:
+        outcome, value = decision_cache.claim(model_payload, refresh)
+        if outcome == "miss":
+            break
+        if outcome == "hit":
+            yield fast_json.sse_event("decision", value)
+            return
+        try:
+            decision = await decision_cache.wait(value)
+        except (httpx.HTTPError, ValueError) as e:
+            yield fast_json.sse_event("error", {"detail": upstream_error(e)})
+            return
+        if decision is not None:
+            yield fast_json.sse_event("decision", decision)
+            return
+
+    # This request owns the in-flight entry: stream the completion and settle `value`
+    digits = symbol_digits(model_payload["symbol"])
+    parts = []
+    try:
+        async for delta in ai_service.stream_ai_decision(model_payload, digits):
+            parts.append(delta)
+            yield fast_json.sse_event("token", {"delta": delta})
+        decision = parse_decision("".join(parts))
+    except (httpx.HTTPError, ValueError) as e:
+        value.set_exception(e)
+        yield fast_json.sse_event("error", {"detail": upstream_error(e)})
+        return
+    else:
+        value.set_result(decision)
+    finally:
+        if not value.done():
+            value.cancel()  # disconnected mid-stream
+
+    yield fast_json.sse_event("decision", decision)
+
+
+def stream_decision(model_payload: Dict[str, Any], refresh: bool) -> StreamingResponse:
+    return StreamingResponse(
+        decision_events(model_payload, refresh),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # keep nginx from buffering the tokens
+            # State when the stream opened; the cache is claimed once the body starts
+            "X-Decision-Cache": decision_cache.peek(model_payload, refresh),
+        },
+    )
+
+
+async def context_payload(db: AsyncSession, symbol: str, request: AIContextRequest) -> Dict[str, Any]:
+    """assemble_model_payload() for a path symbol, with its failures as HTTP errors."""
+    symbol = symbol.upper()
+    resolved = await mt5_service.resolve_symbol_async(symbol)  # also tries the broker suffix, e.g. EURUSDm
+    if resolved is None:
+        raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
+
+    try:
+        return await assemble_model_payload(
+            db, symbol, resolved,
+            timeframes=request.timeframes,
+            sentiment=request.sentiment,
+            journal_limit=request.journal_limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+async def scan_symbol(symbol: str, request: AIScanRequest, deadline: float) -> Dict[str, Any]:
+    """
+    One /ai/scan result line. The payload's database reads use a session of their
+    own, closed as soon as they finish rather than after the candles or the LLM, so
+    a large scan does not hold a pool connection per symbol. The decision goes through the
+    decision cache like /ai/decision. Only the LLM call holds one of the
+    `scan_slots`, and `deadline` bounds both the wait for a slot and the call itself.
+    """
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"symbol": symbol}
+    try:
+        resolved = await mt5_service.resolve_symbol_async(symbol)
+        if resolved is None:
+            raise LookupError(f"Symbol '{symbol}' not found on MT5")
+        model_payload = await assemble_model_payload(
+            None, symbol, resolved,
+            timeframes=request.timeframes,
+            sentiment=request.sentiment.get(symbol, {}),
+            journal_limit=request.journal_limit,
+        )
+
+        async def decide():
+            async with scan_slots:
+                # The call outlives this scan if other requests joined it; still free the slot in time
+                return await asyncio.wait_for(ai_service.decide(model_payload, symbol_digits(resolved)), timeout=deadline)
+
+        decision, result["cache"] = await asyncio.wait_for(
+            decision_cache.get_or_compute(model_payload, decide), timeout=deadline
+        )
+        result.update(status="ok", decision=decision)
+    except asyncio.TimeoutError:
+        result.update(status="timeout", detail=f"No decision within {deadline:g}s")
+    except httpx.HTTPError as e:
+        result.update(status="error", detail=upstream_error(e))
+    except Exception as e:
+        # One broken symbol (unknown name, no data, MT5 down) must not end the scan
+        result.update(status="error", detail=str(e))
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def scan_lines(request: AIScanRequest):
+    """NDJSON body of /ai/scan: a line per symbol in completion order, then a summary line."""
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in request.symbols))
+    request.sentiment = {symbol.upper(): value for symbol, value in request.sentiment.items()}
+    deadline = request.deadline or AI_SCAN_DEADLINE
+
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(scan_symbol(symbol, request, deadline)) for symbol in symbols]
+    counts = {"ok": 0, "error": 0, "timeout": 0}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            counts[result["status"]] += 1
+            yield fast_json.dumps(result) + b"\n"
+    finally:
+        # The client went away: stop the symbols still pending
+        for task in tasks:
+            task.cancel()
+
+    summary = {"symbols": len(symbols), **counts, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+    yield fast_json.dumps({"summary": summary}) + b"\n"
+
+
 # ---------- Endpoint ----------
 
 @router.post("/decision")
-async def ai_decision(payload: AIRequest, user: dict = Depends(auth.get_current_user)):
+async def ai_decision(
+    payload: AIRequest,
+    response: Response,
+    refresh: bool = Query(False, description="Ignore a cached decision for this payload and ask the model again"),
+    user: dict = Depends(auth.get_current_user),
+):
     """
     Takes full market data (M5–D1 + sentiment + journal)
     Sends to OpenAI
     Returns trade decision in strict JSON format.
+    Identical payloads within the same bar are answered from the decision cache
+    (X-Decision-Cache: hit | coalesced | miss).
     """
 
     try:
@@ -42,19 +267,84 @@ async def ai_decision(payload: AIRequest, user: dict = Depends(auth.get_current_
             backtest_profile=payload.backtest_profile
         )
 
-        ai_response = await ai_service.get_ai_decision(model_payload)
-
-        # "choices" is returned by OpenAI – extract the JSON body
-        try:
-            raw = ai_response["choices"][0]["message"]["content"]
-            decision_json = json.loads(raw)
-        except Exception:
-            raise HTTPException(
-                status_code=500,
-                detail="AI returned an invalid JSON response."
-            )
-
+        decision_json, outcome = await cached_decision(model_payload, refresh=refresh)
+        response.headers["X-Decision-Cache"] = outcome
         return decision_json
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/decision/stream")
+async def ai_decision_stream(
+    payload: AIRequest,
+    refresh: bool = Query(False, description="Ignore a cached decision for this payload and ask the model again"),
+    user: dict = Depends(auth.get_current_user),
+):
+    """
+    POST /ai/decision as Server-Sent Events: "token" events carry the model's output
+    as it is generated, a final "decision" event the validated JSON (or an "error"
+    event). A cached decision is sent as the "decision" event straight away.
+    Disconnecting cancels the upstream generation.
+    """
+    model_payload = await ai_service.build_model_payload(
+        symbol=payload.symbol,
+        timeframe_data={k: v.dict() for k, v in payload.timeframes.items()},
+        sentiment=payload.sentiment,
+        journal_recent=payload.journal_recent,
+        backtest_profile=payload.backtest_profile
+    )
+    return stream_decision(model_payload, refresh)
+
+
+@router.post("/decision/{symbol}")
+async def ai_decision_for_symbol(
+    symbol: str,
+    response: Response,
+    request: Optional[AIContextRequest] = None,
+    refresh: bool = Query(False, description="Ignore a cached decision for this payload and ask the model again"),
+    db: AsyncSession = Depends(get_async_db),
+    user: dict = Depends(auth.get_current_user),
+):
+    """
+    Same decision as POST /ai/decision, but the server builds the model input itself:
+    candles from the candle cache, recent trades on the symbol from the journal and
+    the instrument's backtest profile. The body is optional (timeframes, sentiment,
+    journal_limit).
+    """
+    model_payload = await context_payload(db, symbol, request or AIContextRequest())
+    decision_json, outcome = await cached_decision(model_payload, refresh=refresh)
+    response.headers["X-Decision-Cache"] = outcome
+    return decision_json
+
+
+@router.post("/decision/{symbol}/stream")
+async def ai_decision_for_symbol_stream(
+    symbol: str,
+    request: Optional[AIContextRequest] = None,
+    refresh: bool = Query(False, description="Ignore a cached decision for this payload and ask the model again"),
+    db: AsyncSession = Depends(get_async_db),
+    user: dict = Depends(auth.get_current_user),
+):
+    """POST /ai/decision/{symbol} streamed as Server-Sent Events, like /ai/decision/stream."""
+    model_payload = await context_payload(db, symbol, request or AIContextRequest())
+    return stream_decision(model_payload, refresh)
+
+
+@router.post("/scan")
+async def ai_scan(request: AIScanRequest, user: dict = Depends(auth.get_current_user)):
+    """
+    Decisions for a watchlist in one request, streamed as NDJSON as each symbol
+    finishes (fastest first), followed by a {"summary": ...} line. Payloads are
+    assembled concurrently; at most AI_SCAN_CONCURRENCY LLM calls run at once across
+    all scans, and each symbol gets `deadline` seconds for its decision, so one slow
+    symbol only costs its own line ({"status": "timeout"}) instead of holding up the
+    batch. Decisions are shared with /ai/decision through the decision cache.
+    """
+    return StreamingResponse(
+        scan_lines(request),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from services import db_service
+from schemas import InstrumentCreate
 import auth
 from datetime import datetime
 from typing import Dict, Any, Optional
+import json
 
 router = APIRouter(prefix="/backtest", tags=["Backtest"])
 
@@ -25,14 +27,14 @@ class BacktestUploadResponse(BaseModel):
 
 
 @router.post("/upload", response_model=BacktestUploadResponse)
-def upload_backtest(payload: BacktestUploadRequest, db: Session = Depends(get_db), user=Depends(auth.get_current_user)):
+async def upload_backtest(payload: BacktestUploadRequest, db: AsyncSession = Depends(get_async_db), user=Depends(auth.get_current_user)):
     """
     Save or update backtest data tied to an instrument.
     This writes into your `instruments` table (backtest_json column).
     If instrument exists, update backtest_json; else create instrument.
     """
     try:
-        existing = db_service.get_instrument(db, payload.symbol)
+        existing = await db_service.get_instrument_async(db, payload.symbol)
         if existing:
             # update fields
             existing.backtest_json = json.dumps(payload.backtest_json)
@@ -42,19 +44,19 @@ def upload_backtest(payload: BacktestUploadRequest, db: Session = Depends(get_db
                 existing.session = payload.session
             if payload.volatility_profile:
                 existing.volatility_profile = payload.volatility_profile
-            db.commit()
-            db.refresh(existing)
+            await db.commit()
+            await db.refresh(existing)
             return {"success": True, "instrument_id": existing.id, "message": "updated"}
         else:
-            # create instrument via db_service.create_instrument
-            create_payload = {
+            # create instrument via db_service.create_instrument_async
+            create_payload = InstrumentCreate(**{
                 "symbol": payload.symbol,
                 "description": payload.description or "",
                 "session": payload.session or "",
                 "volatility_profile": payload.volatility_profile or "",
                 "backtest_json": json.dumps(payload.backtest_json)
-            }
-            item = db_service.create_instrument(db, create_payload)
+            })
+            item = await db_service.create_instrument_async(db, create_payload)
             return {"success": True, "instrument_id": item.id, "message": "created"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
 from datetime import datetime
+import numpy as np
 import auth
+from services import mt5_service
+from services.trend_bias import trend_bias, trend_bias_rates
 
 router = APIRouter(prefix="/bias", tags=["Bias"])
 
@@ -30,54 +33,63 @@ class BiasResult(BaseModel):
     computed_at: str
 
 
+BATCH_MAX_PAIRS = 500
+
+
+class BiasBatchItem(BaseModel):
+    symbol: str
+    timeframe: str
+    historical_data: Optional[List[Candle]] = None  # omitted: use the server's cached candles
+
+
+class BiasBatchRequest(BaseModel):
+    items: List[BiasBatchItem] = Field(default_factory=list)
+    symbols: List[str] = Field(default_factory=list, example=["EURUSD", "GBPUSD", "XAUUSD"])
+    timeframes: List[str] = Field(default_factory=list, example=["H1", "H4", "D1"])
+    candles: int = Field(100, ge=3, le=1000, description="Bars per pair when the server supplies the candles")
+
+
+class BiasBatchResponse(BaseModel):
+    results: List[Optional[BiasResult]] = Field(
+        description="One entry per requested pair in request order (items, then symbols x timeframes); null where it failed"
+    )
+    errors: Dict[int, str] = Field(default_factory=dict, description="Per-pair errors, keyed by the pair's index in results")
+
+
 def simple_trend_bias(candles: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Simple heuristic bias:
     - compute last N close changes, sma slope, recent higher highs / higher lows.
     - return { bias, confidence, reason }
-    This is intentionally simple and deterministic.
+    This is intentionally simple and deterministic; see services.trend_bias.
     """
     n = len(candles)
-    if n < 3:
-        return {"bias": "neutral", "confidence": 40, "reason": "insufficient data"}
-
-    closes = [c["close"] for c in candles]
-    # slope over entire window
-    slope = (closes[-1] - closes[0]) / max(1, n)
-    # recent direction using last 3 closes
-    last_changes = closes[-3:]
-    rise_count = sum(1 for i in range(1, len(last_changes)) if last_changes[i] > last_changes[i-1])
-    fall_count = sum(1 for i in range(1, len(last_changes)) if last_changes[i] < last_changes[i-1])
-
-    # HH/HL vs LL/LH detection
-    highs = [c["high"] for c in candles]
-    lows = [c["low"] for c in candles]
-    hh = highs[-1] > max(highs[:-1])
-    ll = lows[-1] < min(lows[:-1])
-
-    confidence = 50
-    if slope > 0 and rise_count >= 2:
-        bias = "bullish"
-        confidence = min(95, 60 + int(abs(slope) * 1000))
-        reason = "Upward slope and recent higher closes"
-    elif slope < 0 and fall_count >= 2:
-        bias = "bearish"
-        confidence = min(95, 60 + int(abs(slope) * 1000))
-        reason = "Downward slope and recent lower closes"
-    else:
-        bias = "neutral"
-        confidence = 40
-        reason = "No clear slope; mixed closes"
-
-    # strengthen confidence if HH/HL or LL/LH obvious
-    if bias == "bullish" and hh:
-        confidence = min(100, confidence + 10)
-        reason += "; detected higher high"
-    if bias == "bearish" and ll:
-        confidence = min(100, confidence + 10)
-        reason += "; detected lower low"
-
-    return {"bias": bias, "confidence": confidence, "reason": reason}
+    return trend_bias(
+        np.fromiter((c["close"] for c in candles), dtype=np.float64, count=n),
+        np.fromiter((c["high"] for c in candles), dtype=np.float64, count=n),
+        np.fromiter((c["low"] for c in candles), dtype=np.float64, count=n),
+    )
+
+
+def candle_columns(candles: List[Candle]):
+    """close, high, low arrays straight from parsed Candle models."""
+    n = len(candles)
+    return (
+        np.fromiter((c.close for c in candles), dtype=np.float64, count=n),
+        np.fromiter((c.high for c in candles), dtype=np.float64, count=n),
+        np.fromiter((c.low for c in candles), dtype=np.float64, count=n),
+    )
+
+
+def bias_result(symbol: str, timeframe: str, result: Dict[str, Any], computed_at: str) -> Dict[str, Any]:
+    return {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "bias": result["bias"],
+        "confidence": int(result["confidence"]),
+        "reason": result["reason"],
+        "computed_at": computed_at,
+    }
 
 
 @router.post("/compute", response_model=BiasResult)
@@ -87,15 +99,77 @@ def compute_bias(payload: BiasComputeRequest, user=Depends(auth.get_current_user
     This provides a fast, reproducible bias for H1/H4/D1.
     """
     try:
-        candles = [c.dict() for c in payload.historical_data]
-        result = simple_trend_bias(candles)
-        return {
-            "symbol": payload.symbol,
-            "timeframe": payload.timeframe,
-            "bias": result["bias"],
-            "confidence": int(result["confidence"]),
-            "reason": result["reason"],
-            "computed_at": datetime.utcnow().isoformat() + "Z"
-        }
+        result = trend_bias(*candle_columns(payload.historical_data))
+        return bias_result(payload.symbol, payload.timeframe, result, datetime.utcnow().isoformat() + "Z")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/compute/batch", response_model=BiasBatchResponse)
+async def compute_bias_batch(payload: BiasBatchRequest, user=Depends(auth.get_current_user)):
+    """
+    Compute bias for many (symbol, timeframe) pairs in one request: the `items` list
+    plus every combination of `symbols` x `timeframes`. Pairs without
+    historical_data use the server's cached candles (the latest `candles` bars,
+    oldest first), all fetched in a single MT5 worker job. Every pair gets an entry
+    in `results`, in request order; a failing pair is null there and explained under
+    `errors`, and does not fail the batch. For server-side candles `symbol` is the
+    broker's name (EURUSD -> EURUSDm), as in /market; items with their own
+    historical_data never touch the terminal and keep the name they were sent with.
+    """
+    pairs = [
+        (item.symbol if item.historical_data is not None else item.symbol.upper(), item.timeframe.upper(), item.historical_data)
+        for item in payload.items
+    ]
+    pairs += [(symbol.upper(), timeframe.upper(), None) for symbol in payload.symbols for timeframe in payload.timeframes]
+    if not pairs:
+        raise HTTPException(status_code=400, detail="No (symbol, timeframe) pairs requested")
+    if len(pairs) > BATCH_MAX_PAIRS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_PAIRS} pairs per request")
+
+    computed_at = datetime.utcnow().isoformat() + "Z"
+    results, errors = [None] * len(pairs), {}
+
+    try:
+        resolved = {
+            symbol: await mt5_service.resolve_symbol_async(symbol)
+            for symbol in {symbol for symbol, _, candles in pairs if candles is None}
+        }
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    # Server-side candles: one worker job for every distinct pair
+    wanted = set()
+    for index, (symbol, timeframe, candles) in enumerate(pairs):
+        if candles is not None:
+            continue
+        if resolved[symbol] is None:
+            errors[index] = f"Symbol '{symbol}' not found on MT5"
+        elif timeframe not in mt5_service.TIMEFRAME_MAP:
+            errors[index] = f"Invalid timeframe '{timeframe}'"
+        else:
+            wanted.add((resolved[symbol], timeframe))
+
+    rates = {}
+    if wanted:
+        try:
+            rates = await mt5_service.run(
+                mt5_service.get_rates_many,
+                [(broker_name, timeframe, payload.candles) for broker_name, timeframe in wanted],
+            )
+        except ConnectionError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    for index, (symbol, timeframe, candles) in enumerate(pairs):
+        if index in errors:
+            continue
+        if candles is not None:
+            results[index] = bias_result(symbol, timeframe, trend_bias(*candle_columns(candles)), computed_at)
+            continue
+        series = rates[(resolved[symbol], timeframe)]
+        if isinstance(series, Exception):
+            errors[index] = str(series)
+            continue
+        results[index] = bias_result(resolved[symbol], timeframe, trend_bias_rates(series), computed_at)
+
+    return {"results": results, "errors": errors}
@@ -1,25 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import Instrument
 from schemas import InstrumentCreate, InstrumentRead
 from services import db_service
+from typing import Optional
 
 router = APIRouter(prefix="/instruments", tags=["Instruments"])
 
 
 @router.post("", response_model=InstrumentRead)
-def create_instrument_route(data: InstrumentCreate, db: Session = Depends(get_db)):
-    return db_service.create_instrument(db, data)
+async def create_instrument_route(data: InstrumentCreate, db: AsyncSession = Depends(get_async_db)):
+    return await db_service.create_instrument_async(db, data)
 
 
 @router.get("/{symbol}", response_model=InstrumentRead)
-def get_instrument_route(symbol: str, db: Session = Depends(get_db)):
-    item = db_service.get_instrument(db, symbol)
+async def get_instrument_route(symbol: str, db: AsyncSession = Depends(get_async_db)):
+    item = await db_service.get_instrument_async(db, symbol)
     if not item:
         raise HTTPException(status_code=404, detail="Instrument not found")
     return item
 
 
 @router.get("", response_model=list[InstrumentRead])
-def get_all_instruments_route(db: Session = Depends(get_db)):
-    return db_service.get_instruments(db)
+async def get_all_instruments_route(
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,symbol,session"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    All instruments. backtest_json and volatility_profile can be large and are only
+    read from the database when `fields` is omitted or names them.
+    """
+    try:
+        selected = db_service.parse_fields(fields, Instrument)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    items = await db_service.get_instruments_async(db, fields=selected)
+    if selected is None:
+        return items
+    return JSONResponse(jsonable_encoder(items))
\ No newline at end of file
@@ -1,17 +1,180 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
-from schemas import TradeJournalCreate, TradeJournalRead
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import TradeJournal
+from pydantic import ValidationError
+from schemas import BulkJournalResponse, JournalStatsRead, TradeCloseRequest, TradeJournalCreate, TradeJournalRead
 from services import db_service
+from datetime import datetime
+from typing import Optional
+import json
+import os
 
 router = APIRouter(prefix="/journal", tags=["Journal"])
 
+BULK_BATCH_SIZE = int(os.getenv("JOURNAL_BULK_BATCH_SIZE", "500"))
+BULK_MAX_ROWS = int(os.getenv("JOURNAL_BULK_MAX_ROWS", "100000"))
+
+# Optional parts of a journal row, loaded only when asked for with ?include=
+INCLUDES = {"snapshot"}
+INCLUDE_QUERY = Query(None, description="Comma-separated extras: snapshot (adds snapshot_json and sentiment_json)")
+
+
+def parse_include(include: Optional[str]) -> set:
+    requested = {part.strip() for part in (include or "").split(",") if part.strip()}
+    unknown = requested - INCLUDES
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+    return requested
+
 
 @router.post("/", response_model=TradeJournalRead)
-def create_trade_journal_entry(data: TradeJournalCreate, db: Session = Depends(get_db)):
-    return db_service.create_trade_journal(db, data)
+async def create_trade_journal_entry(data: TradeJournalCreate, db: AsyncSession = Depends(get_async_db)):
+    return await db_service.create_trade_journal_async(db, data)
+
+
+def _validation_detail(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+        for err in e.errors()
+    )
+
+
+def parse_bulk_body(body: bytes, content_type: str):
+    """JSON array or NDJSON (one object per line) -> (rows, errors, row count); rows and errors are keyed by index."""
+    if "ndjson" in content_type or "jsonl" in content_type:
+        raw = []
+        for line in (line for line in body.decode().splitlines() if line.strip()):
+            try:
+                raw.append(json.loads(line))
+            except ValueError as e:
+                raw.append(e)
+    else:
+        try:
+            raw = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(raw, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of journal entries")
+
+    rows, errors = {}, {}
+    for index, item in enumerate(raw):
+        if isinstance(item, Exception):
+            errors[index] = f"Invalid JSON: {item}"
+            continue
+        try:
+            rows[index] = TradeJournalCreate.parse_obj(item)
+        except ValidationError as e:
+            errors[index] = _validation_detail(e)
+    return rows, errors, len(raw)
+
+
+@router.post("/bulk", response_model=BulkJournalResponse)
+async def bulk_create_journal_entries(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Insert many journal entries in one request. The body is a JSON array of
+    TradeJournalCreate objects, or NDJSON with Content-Type: application/x-ndjson.
+    Rows are inserted in batched transactions; invalid rows are reported by index
+    in `errors` and do not stop the others.
+    """
+    rows, errors, total = parse_bulk_body(await request.body(), request.headers.get("content-type", ""))
+    if total > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+
+    indexes = sorted(rows)
+    inserted_ids, insert_errors = await db_service.bulk_create_trade_journal_async(
+        db, [rows[index] for index in indexes], batch_size=BULK_BATCH_SIZE
+    )
+
+    ids = [None] * total
+    for index, trade_id in zip(indexes, inserted_ids):
+        ids[index] = trade_id
+    errors.update({indexes[position]: detail for position, detail in insert_errors.items()})
+    return {
+        "inserted": sum(trade_id is not None for trade_id in ids),
+        "ids": ids,
+        "errors": dict(sorted(errors.items())),
+    }
 
 
 @router.get("/recent", response_model=list[TradeJournalRead])
-def get_recent(limit: int = 50, db: Session = Depends(get_db)):
-    return db_service.get_recent_trades(db, limit)
+async def get_recent(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    symbol: Optional[str] = Query(None, description="Exact symbol, e.g. EURUSDm"),
+    status: Optional[str] = Query(None, description="open, closed or cancelled"),
+    direction: Optional[str] = Query(None, description="buy or sell"),
+    opened_from: Optional[datetime] = Query(None, description="Only trades opened at or after this time"),
+    opened_to: Optional[datetime] = Query(None, description="Only trades opened before this time"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header from the previous page"),
+    include: Optional[str] = INCLUDE_QUERY,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,symbol,status,entry_price"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Newest trades first, filtered in SQL. When more rows match, the `X-Next-Cursor`
+    response header holds the cursor for the next page. With `fields`, only those
+    columns are read and returned.
+    """
+    includes = parse_include(include)
+    try:
+        selected = db_service.parse_fields(fields, TradeJournal, extra=db_service.SNAPSHOT_REFS)
+        if selected is not None and "snapshot" in includes:
+            selected += [name for name in db_service.SNAPSHOT_REFS if name not in selected]
+        items, next_cursor = await db_service.query_trades_async(
+            db,
+            limit=limit,
+            fields=selected,
+            symbol=symbol,
+            status=status,
+            direction=direction,
+            opened_from=opened_from,
+            opened_to=opened_to,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if selected is not None:
+        # Partial rows bypass the TradeJournalRead response model
+        return JSONResponse(jsonable_encoder(items), headers=headers)
+
+    if "snapshot" in includes:
+        await db_service.load_snapshots_async(db, items)
+    response.headers.update(headers)
+    return items
+
+
+@router.get("/stats", response_model=JournalStatsRead)
+async def get_stats(
+    symbol: str = Query("*", description='Exact symbol, or "*" for all'),
+    direction: str = Query("*", description='buy, sell or "*" for both'),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Performance over closed trades, read from the incrementally maintained journal_stats table."""
+    return await db_service.get_journal_stats_async(db, symbol, direction)
+
+
+@router.get("/{trade_id}", response_model=TradeJournalRead)
+async def get_trade(trade_id: int, include: Optional[str] = INCLUDE_QUERY, db: AsyncSession = Depends(get_async_db)):
+    includes = parse_include(include)
+    item = await db_service.get_trade_async(db, trade_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Trade not found")
+    if "snapshot" in includes:
+        await db_service.load_snapshots_async(db, [item])
+    return item
+
+
+@router.post("/{trade_id}/close", response_model=TradeJournalRead)
+async def close_trade(trade_id: int, data: TradeCloseRequest, db: AsyncSession = Depends(get_async_db)):
+    try:
+        item = await db_service.close_trade_async(db, trade_id, data.result_pnl, data.exit_price)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if item is None:
+        raise HTTPException(status_code=404, detail="Trade not found")
+    return item
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, Query, HTTPException
-from services import mt5_service
-from schemas import MarketQuoteResponse,HistoricalDataResponse
+from fastapi import APIRouter, Query, HTTPException, Response, WebSocket, WebSocketDisconnect
+from services import mt5_service, fast_json
+from services.tick_stream import tick_hub, TickSubscriber
+from services.indicators import indicator_engine, parse_specs
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from schemas import MarketQuoteResponse,HistoricalDataResponse,BatchQuoteResponse,TimeframeBundleRequest,TimeframeData,IndicatorResponse
 import json
 from fastapi import Depends
 from auth import get_current_user
@@ -11,27 +16,44 @@ from services import mt5_service
 router = APIRouter(prefix="/market", tags=["Market"])
 
 @router.get("/quote/{symbol}", response_model=MarketQuoteResponse)
-def get_quote(symbol: str):
+async def get_quote(symbol: str):
     """
         Get current market quote for a specific symbol.
         Returns bid, ask, last price, and timestamp.
     """
     symbol = symbol.upper()
     try:# Check if symbol exists on MT5
-        if not mt5_service.symbol_exists(symbol):
-            symbol = symbol + "m"  # try with .m suffix
-            if not mt5_service.symbol_exists(symbol):
-                raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
+        resolved = await mt5_service.resolve_symbol_async(symbol)  # also tries the broker suffix, e.g. EURUSDm
+        if resolved is None:
+            raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
+        symbol = resolved
 
-        data = mt5_service.get_quote(symbol)
+        data = await mt5_service.run(mt5_service.get_quote, symbol)
         return data
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
+@router.get("/quotes", response_model=BatchQuoteResponse)
+async def get_quotes(symbols: str = Query(..., description="Comma separated symbols, e.g. EURUSD,XAUUSD")):
+    """
+        Get current quotes for many symbols in one request.
+        Symbols that are unknown or have no tick are listed under `errors`; the rest are still returned.
+    """
+    requested = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="At least one symbol is required")
+    if len(requested) > 100:
+        raise HTTPException(status_code=400, detail="At most 100 symbols per request")
+
+    try:
+        return await mt5_service.run(mt5_service.get_quotes, requested)
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 @router.get("/quotes/{symbol}/history", response_model=HistoricalDataResponse)
-def get_historical_data(
+async def get_historical_data(
     symbol: str,
     timeframe: str = Query(
         "H1",
@@ -58,24 +80,152 @@ def get_historical_data(
                 detail="Candlesticks must be an integer between 1 and 1000"
             )
         # Check if symbol exists on MT5
-        if not mt5_service.symbol_exists(symbol):
-            symbol = symbol + "m"  # try with .m suffix
-            if not mt5_service.symbol_exists(symbol):
-                raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
-
-        # Fetch data safely
-        df = mt5_service.get_historical_data(symbol, candlesticks, tf_normalized)
-        if df is None or df.empty:
+        resolved = await mt5_service.resolve_symbol_async(symbol)  # also tries the broker suffix, e.g. EURUSDm
+        if resolved is None:
+            raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
+        symbol = resolved
+
+        # Fetch data safely (numpy rates straight from the candle cache, no DataFrame)
+        rates = await mt5_service.run(mt5_service.get_rates, symbol, candlesticks, tf_normalized)
+        if rates is None or len(rates) == 0:
             raise HTTPException(status_code=404, detail="No data returned from MT5")
         
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error))
 
-    # Reverse order: newest candles first
-    df = df.iloc[::-1].reset_index(drop=True)
-    return {
-    
-        "symbol": symbol,
-        "timeframe": tf_normalized,
-        "historical_data": df.to_dict(orient="records")
-    }
\ No newline at end of file
+    # Newest candles first; serialized directly, response_model is kept for the OpenAPI docs only
+    return Response(
+        content=fast_json.history_response(symbol, tf_normalized, rates),
+        media_type="application/json",
+    )
+
+
+@router.post("/quotes/{symbol}/bundle", response_model=Dict[str, TimeframeData])
+async def get_timeframe_bundle(symbol: str, request: Optional[TimeframeBundleRequest] = None):
+    """
+        Get candles for several timeframes of one symbol in a single call (newest candle first),
+        keyed and shaped like AIRequest.timeframes, e.g. {"M5": 200, "H1": 100, "D1": 30}.
+    """
+    request = request or TimeframeBundleRequest()
+    timeframes = {tf.upper(): count for tf, count in request.timeframes.items()}
+    if not timeframes:
+        raise HTTPException(status_code=400, detail="At least one timeframe is required")
+    for tf, count in timeframes.items():
+        if tf not in mt5_service.TIMEFRAME_MAP:
+            raise HTTPException(status_code=400, detail=f"Invalid timeframe '{tf}'")
+        if not (1 <= count <= 1000):
+            raise HTTPException(status_code=400, detail=f"Candle count for {tf} must be between 1 and 1000")
+
+    symbol = symbol.upper()
+    try:
+        resolved = await mt5_service.resolve_symbol_async(symbol)  # also tries the broker suffix, e.g. EURUSDm
+        if resolved is None:
+            raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
+
+        # All timeframes in one worker job, each served from the candle cache
+        bundle = await mt5_service.run(mt5_service.get_timeframe_bundle, resolved, timeframes)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+    return Response(content=fast_json.timeframe_bundle_response(resolved, bundle), media_type="application/json")
+
+
+def _iso(epoch_seconds: Optional[int]) -> Optional[str]:
+    if epoch_seconds is None:
+        return None
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@router.get("/indicators/{symbol}", response_model=IndicatorResponse)
+async def get_indicators(
+    symbol: str,
+    timeframe: str = Query("H1", description="M1/M5/M15/M30/H1/H4/D1/W1/MN1 or 1min/5min/15min/30min"),
+    indicators: Optional[str] = Query(None, description="Comma-separated kind:period, e.g. ema:20,rsi:14,atr:14 (sma, ema, rsi, atr). Defaults to the server's INDICATORS set"),
+):
+    """
+        Current indicator values for a symbol/timeframe without downloading candles.
+        State is kept on the server and advanced only by bars that closed since the
+        last request; `live` also includes the forming bar.
+    """
+    timeframe = timeframe.upper()
+    if timeframe not in mt5_service.TIMEFRAME_MAP:
+        raise HTTPException(status_code=400, detail=f"Invalid timeframe '{timeframe}'")
+
+    symbol = symbol.upper()
+    try:
+        specs = parse_specs(indicators) if indicators is not None else None
+        resolved = await mt5_service.resolve_symbol_async(symbol)  # also tries the broker suffix, e.g. EURUSDm
+        if resolved is None:
+            raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
+        result = await mt5_service.run(indicator_engine.compute, resolved, timeframe, specs)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    result["closed_bar_time"] = _iso(result["closed_bar_time"])
+    result["bar_time"] = _iso(result["bar_time"])
+    return result
+
+
+@router.websocket("/stream")
+async def stream_ticks(websocket: WebSocket, symbols: str = Query("", description="Comma separated symbols, e.g. EURUSD,XAUUSD")):
+    """
+        Stream live bid/ask changes over a WebSocket.
+        Subscribe with ?symbols=EURUSD,XAUUSD and/or by sending
+        {"action": "subscribe" | "unsubscribe", "symbols": ["EURUSD"]}.
+        Each message carries only the fields that changed; a slow client gets the latest tick, not a backlog.
+    """
+    await websocket.accept()
+    subscriber = TickSubscriber()
+    requested = {}  # requested name -> broker name; several names can share one broker symbol (EURUSD, EURUSDm)
+
+    async def update(action: str, names):
+        if action == "unsubscribe":
+            released = {requested.pop(n) for n in {n.upper() for n in names} if n in requested}
+            # Keep the broker subscription while another requested name still maps to it
+            tick_hub.unsubscribe(subscriber, released - set(requested.values()))
+            return
+        resolved = []
+        for name in names:
+            name = name.upper()
+            broker_name = await mt5_service.resolve_symbol_async(name)
+            if broker_name is None:
+                await websocket.send_json({"type": "error", "symbol": name, "message": f"Symbol '{name}' not found on MT5"})
+                continue
+            requested[name] = broker_name
+            resolved.append(broker_name)
+        tick_hub.subscribe(subscriber, resolved)
+        await websocket.send_json({"type": "subscribed", "symbols": sorted(subscriber.symbols)})
+
+    async def receive():
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action")
+            if action not in ("subscribe", "unsubscribe") or not isinstance(message.get("symbols"), list):
+                await websocket.send_json({"type": "error", "message": "Expected {\"action\": \"subscribe\"|\"unsubscribe\", \"symbols\": [...]}"})
+                continue
+            await update(action, message["symbols"])
+
+    async def send():
+        while True:
+            batch = await subscriber.next_batch()
+            for symbol, tick in batch.items():
+                message = subscriber.delta(symbol, tick)
+                if message:
+                    await websocket.send_json(message)
+
+    tasks = []
+    try:
+        if symbols:
+            await update("subscribe", [s for s in symbols.split(",") if s.strip()])
+        tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        tick_hub.unsubscribe(subscriber)
@@ -9,7 +9,7 @@ router = APIRouter(prefix="/trade", tags=["Trade Operations"])
 
 
 @router.post("/bulk-operations", response_model=BulkCloseResponse)
-def bulk_close_orders(
+async def bulk_close_orders(
     symbol: Optional[str] = Query(None, description="Filter by symbol (e.g., BTCUSDm)"),
     type: str = Query("all", description="buy, sell, pending, or all"),
     status: str = Query("open", description="open, pending, or all"),
@@ -33,22 +33,22 @@ def bulk_close_orders(
         "profit": filter_body.profit if filter_body and filter_body.profit else profit
     }
 
-    result = mt5_service.bulk_close_orders(filter_data)
+    result = await mt5_service.run(mt5_service.bulk_close_orders, filter_data)
     return result
 
 @router.post("/open", response_model=TradeResponse)
-def open_trade(request: TradeRequest):
+async def open_trade(request: TradeRequest):
     """
         Open a new trade (buy/sell) for a specific symbol with given volume, SL, TP.
     """
     symbol = request.symbol.upper()
     try:
-        if not mt5_service.symbol_exists(symbol):
-            symbol = symbol + "m"  # try with .m suffix
-            if not mt5_service.symbol_exists(symbol):
-                raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
+        resolved = await mt5_service.resolve_symbol_async(symbol)  # also tries the broker suffix, e.g. EURUSDm
+        if resolved is None:
+            raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
+        symbol = resolved
 
-        return mt5_service.open_trade(symbol, request.volume, request.order_type, request.sl, request.tp)
+        return await mt5_service.run(mt5_service.open_trade, symbol, request.volume, request.order_type, request.sl, request.tp)
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -57,8 +57,8 @@ def open_trade(request: TradeRequest):
 # POST /trade/close
 # -----------------------------
 @router.post("/close", description="Close an existing open trade by ticket ID.")
-def close_trade(request: CloseTradeRequest):
-    result = mt5_service.close_trade(request.ticket)
+async def close_trade(request: CloseTradeRequest):
+    result = await mt5_service.run(mt5_service.close_trade, request.ticket)
     #print(f'result: {result}')
     if isinstance(result, ValueError):
         raise HTTPException(status_code=404, detail=str(result))
@@ -71,8 +71,8 @@ def close_trade(request: CloseTradeRequest):
 # GET /trade/positions
 # -----------------------------
 @router.get("/positions", response_model=TradePositionsResponse, description="Get a list of all currently open trades/positions.")
-def get_open_positions():
-    positions = mt5_service.get_open_positions()
+async def get_open_positions():
+    positions = await mt5_service.run(mt5_service.get_open_positions)
     if not positions:
         raise HTTPException(status_code=404, detail="No open positions found")
     return {"positions": positions, "total_positions": len(positions)}
@@ -81,8 +81,8 @@ def get_open_positions():
 # GET /trade/pending_orders
 # -----------------------------
 @router.get("/pending", response_model=PendingOrdersResponse, summary="Get all pending orders")
-def get_pending_orders():
-    result = mt5_service.get_pending_orders()
+async def get_pending_orders():
+    result = await mt5_service.run(mt5_service.get_pending_orders)
 
     if result["status"] == "error":
         raise HTTPException(status_code=400, detail=result["message"])
@@ -96,17 +96,15 @@ def get_pending_orders():
 # POST /trade/modify
 # -----------------------------
 @router.post("/active/modification", description="Modify SL/TP or volume/lot size of an open trade.")
-def modify_trade(request: ModifyTradeRequest):
-    result = mt5_service.modify_trade(request.ticket, request.stop_loss, request.take_profit, request.volume)
+async def modify_trade(request: ModifyTradeRequest):
+    result = await mt5_service.run(mt5_service.modify_trade, request.ticket, request.stop_loss, request.take_profit, request.volume)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 @router.post("/pending/modification", description="Modify pending order parameters.")
-def modify_pending_order(request: PendingOrderModifyRequest):
-    result = mt5_service.modify_pending_order(ticket=request.ticket, price=request.price, sl=request.sl, tp=request.tp, volume=request.volume)
-    print(f'result: {result}')
-
+async def modify_pending_order(request: PendingOrderModifyRequest):
+    result = await mt5_service.run(mt5_service.modify_pending_order, ticket=request.ticket, price=request.price, sl=request.sl, tp=request.tp, volume=request.volume)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
@@ -115,17 +113,15 @@ def modify_pending_order(request: PendingOrderModifyRequest):
 # POST /trade/pending-order
 # -----------------------------
 @router.post("/pending", response_model=PendingOrderResponse, description="Place a pending order (buy_limit/sell_limit/buy_stop/sell_stop)")
-def create_pending_order(request: PendingOrderCreateRequest):
+async def create_pending_order(request: PendingOrderCreateRequest):
     symbol = request.symbol.upper()
     try:
-        if not mt5_service.symbol_exists(symbol):
-            symbol = symbol + "m"  # try with .m suffix
-            if not mt5_service.symbol_exists(symbol):
-                print(f"Symbol '{symbol}' not found on MT5")
-                raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
-
-        result = mt5_service.place_pending_order(symbol, order_type_str=request.order_type, price=request.price, volume=request.volume, sl=request.sl, tp=request.tp)
-        print(f'result: {result}')
+        resolved = await mt5_service.resolve_symbol_async(symbol)  # also tries the broker suffix, e.g. EURUSDm
+        if resolved is None:
+            raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found on MT5")
+        symbol = resolved
+
+        result = await mt5_service.run(mt5_service.place_pending_order, symbol, order_type_str=request.order_type, price=request.price, volume=request.volume, sl=request.sl, tp=request.tp)
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["message"])
         return result
@@ -136,8 +132,8 @@ def create_pending_order(request: PendingOrderCreateRequest):
 # POST /trade/cancel-order
 # -----------------------------
 @router.post("/pending/cancel", description="Cancel a pending (not yet executed) order.")
-def cancel_pending_order(request: CancelOrderRequest):
-    result = mt5_service.cancel_pending_order(request.ticket)
+async def cancel_pending_order(request: CancelOrderRequest):
+    result = await mt5_service.run(mt5_service.cancel_pending_order, request.ticket)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
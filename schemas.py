@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import List, Optional, Literal
+from typing import Any, Dict, List, Optional, Literal
 
 
 class TokenCreate(BaseModel):
@@ -54,6 +54,27 @@ class HistoricalDataResponse(BaseModel):
     )
 
 
+class TimeframeData(BaseModel):
+    symbol: str
+    timeframe: str
+    historical_data: List[Dict[str, Any]]
+
+class TimeframeBundleRequest(BaseModel):
+    timeframes: Dict[str, int] = Field(
+        default_factory=lambda: {"M5": 100, "M15": 100, "H1": 100, "H4": 100, "D1": 100},
+        example={"M5": 200, "M15": 100, "H1": 100, "H4": 50, "D1": 30},
+        description="Timeframe -> number of candles (1-1000). Accepts M1/M5/M15/M30/H1/H4/D1/W1/MN1 or 1min/5min/15min/30min"
+    )
+
+class IndicatorResponse(BaseModel):
+    symbol: str
+    timeframe: str
+    closed_bar_time: Optional[str] = Field(None, description="Open time of the last closed bar the values include")
+    bar_time: str = Field(description="Open time of the forming bar")
+    bars: int = Field(description="Closed bars the indicator state has consumed")
+    values: Dict[str, Optional[float]] = Field(description="As of the last closed bar, e.g. {\"ema_20\": 1.0842}; null while warming up")
+    live: Dict[str, Optional[float]] = Field(description="Same indicators including the forming bar")
+
 class MarketQuoteResponse(BaseModel):
     symbol: str
     bid: float
@@ -61,6 +82,10 @@ class MarketQuoteResponse(BaseModel):
     last: float
     time: str
 
+class BatchQuoteResponse(BaseModel):
+    quotes: List[MarketQuoteResponse]
+    errors: Dict[str, str] = Field(default_factory=dict, description="Per-symbol errors, keyed by the requested symbol")
+
 class TradeRequest(BaseModel):
     """
     Represents a trade order request.
@@ -276,20 +301,51 @@ class TradeJournalBase(BaseModel):
     risk_pct: float
     confidence: float
     reasoning: str
-    snapshot_json: str
-    sentiment_json: str
     status: str = "open"
 
 
 class TradeJournalCreate(TradeJournalBase):
-    pass
+    snapshot_json: str
+    sentiment_json: str
 
 
 class TradeJournalRead(TradeJournalBase):
     id: int
     result_pnl: Optional[float] = None
+    exit_price: Optional[float] = None
+    snapshot_ref: Optional[str] = None
+    sentiment_ref: Optional[str] = None
+    # Only filled when the request asks for include=snapshot
+    snapshot_json: Optional[str] = None
+    sentiment_json: Optional[str] = None
     opened_at: datetime
     closed_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
+
+
+class BulkJournalResponse(BaseModel):
+    inserted: int
+    ids: List[Optional[int]] = Field(description="Assigned ids in request order; null for rows that were not inserted")
+    errors: Dict[int, str] = Field(default_factory=dict, description="Per-row errors, keyed by the row's index in the request")
+
+
+class TradeCloseRequest(BaseModel):
+    result_pnl: float
+    exit_price: Optional[float] = None  # enables the R multiple in /journal/stats
+
+
+class JournalStatsRead(BaseModel):
+    symbol: str      # "*" = all symbols
+    direction: str   # "*" = both directions
+    trades: int
+    wins: int
+    losses: int
+    win_rate: Optional[float] = None
+    expectancy: Optional[float] = None     # average PnL per closed trade
+    avg_r: Optional[float] = None          # over trades closed with an exit_price
+    profit_factor: Optional[float] = None
+    net_pnl: float
+    max_drawdown: float                    # peak-to-trough of the closed-trade equity curve
+    updated_at: Optional[datetime] = None
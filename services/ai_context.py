@@ -0,0 +1,89 @@
+"""
+Server-side assembly of the AI model payload for a symbol: candles from the
+candle cache, recent trades from the journal and the instrument's backtest
+profile, so clients do not have to upload any of it.
+"""
+import asyncio
+import json
+import os
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from services import db_service, fast_json, mt5_service
+from services.ai_services import ai_service
+
+DEFAULT_TIMEFRAMES = {"M5": 100, "M15": 100, "H1": 100, "H4": 100, "D1": 100}
+JOURNAL_LIMIT = int(os.getenv("AI_CONTEXT_JOURNAL_LIMIT", "10"))
+
+# Journal columns worth sending to the model; reasoning and snapshots stay in the database
+JOURNAL_FIELDS = [
+    "symbol", "direction", "entry_price", "stop_loss", "take_profit_1", "status",
+    "result_pnl", "exit_price", "confidence", "opened_at", "closed_at",
+]
+
+
+def timeframe_data(symbol: str, bundle: Dict[str, Any]) -> Dict[str, Any]:
+    """{timeframe: rates} -> AIRequest.timeframes shape, so cached and uploaded payloads hash alike."""
+    return {
+        tf: {"symbol": symbol, "timeframe": tf, "historical_data": fast_json.candle_records(rates)}
+        for tf, rates in bundle.items()
+    }
+
+
+def parse_backtest_profile(raw: Optional[str]) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    try:
+        profile = json.loads(raw)
+    except ValueError:
+        return {}
+    return profile if isinstance(profile, dict) else {"profile": profile}
+
+
+async def _journal_and_profile(db: Optional[AsyncSession], requested: str, resolved: str, journal_limit: int):
+    if db is None:
+        # A session of our own, returned to the pool as soon as these reads are done
+        async with AsyncSessionLocal() as session:
+            return await _journal_and_profile(session, requested, resolved, journal_limit)
+    trades, _ = await db_service.query_trades_async(db, limit=journal_limit, symbol=resolved, fields=JOURNAL_FIELDS)
+    # Instruments may be stored under the plain name (XAUUSD) or the broker's (XAUUSDm)
+    backtest = await db_service.get_backtest_json_async(db, resolved, requested)
+    return jsonable_encoder(trades), parse_backtest_profile(backtest)
+
+
+async def assemble_model_payload(
+    db: Optional[AsyncSession],
+    requested: str,
+    resolved: str,
+    timeframes: Optional[Dict[str, int]] = None,
+    sentiment: Optional[Dict[str, Any]] = None,
+    journal_limit: int = JOURNAL_LIMIT,
+) -> Dict[str, Any]:
+    """
+    build_model_payload() output for `resolved` (the broker's symbol name). Candles
+    come from one MT5 worker job and run concurrently with the database reads. With
+    db=None the reads use a short-lived session of their own, so the caller holds no
+    connection while the candles load. Raises ValueError for an invalid timeframe or
+    missing data.
+    """
+    timeframes = {tf.upper(): count for tf, count in (timeframes or DEFAULT_TIMEFRAMES).items()}
+    for tf, count in timeframes.items():
+        if tf not in mt5_service.TIMEFRAME_MAP:
+            raise ValueError(f"Invalid timeframe '{tf}'")
+        if not (1 <= count <= 1000):
+            raise ValueError(f"Candle count for {tf} must be between 1 and 1000")
+
+    bundle, (journal_recent, backtest_profile) = await asyncio.gather(
+        mt5_service.run(mt5_service.get_timeframe_bundle, resolved, timeframes),
+        _journal_and_profile(db, requested, resolved, journal_limit),
+    )
+    return await ai_service.build_model_payload(
+        symbol=resolved,
+        timeframe_data=timeframe_data(resolved, bundle),
+        sentiment=sentiment or {},
+        journal_recent=journal_recent,
+        backtest_profile=backtest_profile,
+    )
@@ -1,14 +1,312 @@
 import os
 import json
+import math
+import random
+import asyncio
 import httpx
-from typing import Dict, Any
+import numpy as np
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+from services import fast_json
+
+try:
+    import tiktoken
+except ImportError:  # optional: token counts are estimated from the prompt length
+    tiktoken = None
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1")
+# Point at a local mock server for benchmarks, e.g. http://127.0.0.1:9100/v1
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", "5"))
+AI_READ_TIMEOUT = float(os.getenv("AI_READ_TIMEOUT", "90"))       # one LLM completion can take a while
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+AI_HTTP2 = os.getenv("AI_HTTP2", "0") == "1"                      # needs the h2 package (httpx[http2])
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+AI_RETRY_BASE_SECONDS = float(os.getenv("AI_RETRY_BASE_SECONDS", "0.5"))
+AI_RETRY_MAX_SECONDS = float(os.getenv("AI_RETRY_MAX_SECONDS", "8"))
+# Streamed completions: longest gap between two chunks before the generation counts as stalled
+AI_STREAM_IDLE_TIMEOUT = float(os.getenv("AI_STREAM_IDLE_TIMEOUT", "20"))
+
+# Compact prompt encoding (see encode_model_input); AI_PROMPT_COMPACT=0 sends the raw payload as before
+AI_PROMPT_COMPACT = os.getenv("AI_PROMPT_COMPACT", "1") == "1"
+AI_PROMPT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "12000"))  # 0 = no trimming
+AI_PROMPT_MIN_BARS = int(os.getenv("AI_PROMPT_MIN_BARS", "20"))            # never trim a timeframe below this
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Failures where the request never reached the model, so a retry cannot double-bill.
+# Not RemoteProtocolError: the server may drop the connection after the request was sent.
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def make_client() -> httpx.AsyncClient:
+    """Keep-alive pooled client for the LLM API, with bounded connect/read timeouts."""
+    http2 = AI_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("Warning: AI_HTTP2=1 but the h2 package is not installed, using HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        base_url=OPENAI_BASE_URL,
+        headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+        timeout=httpx.Timeout(AI_READ_TIMEOUT, connect=AI_CONNECT_TIMEOUT, pool=AI_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=AI_MAX_CONNECTIONS, max_keepalive_connections=AI_MAX_CONNECTIONS),
+        http2=http2,
+    )
+
+
+def retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Full-jitter exponential backoff; a numeric Retry-After from the server wins when present."""
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after and retry_after.replace(".", "", 1).isdigit():
+            return min(float(retry_after), AI_RETRY_MAX_SECONDS)
+    return random.uniform(0, min(AI_RETRY_MAX_SECONDS, AI_RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+# ---------- Prompt payload encoding ----------
+
+CANDLE_FORMAT = (
+    "timeframes.<TF>: columnar candles, oldest first. o/h/l/c prices, v tick volume. "
+    "end = open time of the last bar (UTC), bar = seconds per bar; "
+    "t = bar offsets from end, only present when bars are not consecutive"
+)
+_TOKENIZER = tiktoken.get_encoding("o200k_base") if tiktoken is not None else None
+
+
+def count_tokens(text: str) -> int:
+    """Exact with tiktoken installed, else a conservative estimate (numeric JSON runs ~3 chars per token)."""
+    if _TOKENIZER is not None:
+        return len(_TOKENIZER.encode(text))
+    return math.ceil(len(text) / 3)
+
+
+def _epoch_seconds(times: List[Any]) -> Optional[np.ndarray]:
+    """ISO-8601 strings ("...Z" or "+00:00") or epoch numbers -> int64 seconds; None if unparseable."""
+    try:
+        if times and isinstance(times[0], (int, float)):
+            return np.asarray(times, dtype=np.int64)
+        cleaned = [str(t).replace("Z", "").replace("+00:00", "") for t in times]
+        return np.array(cleaned, dtype="datetime64[s]").astype(np.int64)
+    except (ValueError, TypeError):
+        return None
+
+
+def _price_digits(values: np.ndarray, max_digits: int = 8) -> int:
+    """Fewest decimals that represent every price exactly, for symbols whose digits are unknown."""
+    for digits in range(max_digits + 1):
+        if np.allclose(np.round(values, digits), values, rtol=0, atol=10 ** -(max_digits + 2)):
+            return digits
+    return max_digits
+
+
+def columnar_candles(candles: List[Dict[str, Any]], digits: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Candle dicts (any order) -> {"end", "bar", ["t"], "o", "h", "l", "c", "v"}, oldest first,
+    prices rounded to `digits` (inferred from the data when None).
+    """
+    if not candles:
+        return {"o": [], "h": [], "l": [], "c": [], "v": []}
+
+    times = _epoch_seconds([c.get("time") for c in candles])
+    order = np.argsort(times, kind="stable") if times is not None else np.arange(len(candles))[::-1]
+    columns = {
+        key: np.array([float(candles[i].get(field) or 0) for i in order])
+        for key, field in (("o", "open"), ("h", "high"), ("l", "low"), ("c", "close"))
+    }
+    if digits is None:
+        digits = _price_digits(np.concatenate(list(columns.values())))
+
+    frame = {}
+    if times is not None:
+        times = times[order]
+        steps = np.diff(times)
+        steps = steps[steps > 0]
+        bar = int(steps.min()) if len(steps) else 0  # smallest spacing: weekend gaps do not stretch it
+        frame["end"] = fast_json.iso_times(times[-1:])[0]
+        frame["bar"] = bar
+        if bar > 0:
+            offsets = (times - times[-1]) // bar
+            if not np.array_equal(offsets, np.arange(1 - len(times), 1)):
+                frame["t"] = offsets.tolist()
+    else:
+        frame["time"] = [candles[i].get("time") for i in order]
+
+    for key, values in columns.items():
+        frame[key] = np.round(values, digits).tolist()
+    frame["v"] = [int(candles[i].get("tick_volume") or 0) for i in order]
+    return frame
+
+
+def _trim_oldest(frame: Dict[str, Any], drop: int) -> Dict[str, Any]:
+    return {key: value[drop:] if isinstance(value, list) else value for key, value in frame.items()}
+
+
+def encode_model_input(
+    model_input: Dict[str, Any],
+    digits: Optional[int] = None,
+    token_budget: int = AI_PROMPT_TOKEN_BUDGET,
+    min_bars: int = AI_PROMPT_MIN_BARS,
+) -> str:
+    """
+    build_model_payload() output -> compact JSON for the prompt: columnar candles,
+    prices rounded to the symbol's digits, timestamps relative to the last bar.
+    Over `token_budget`, the oldest bars of the lowest timeframe are dropped first
+    (down to `min_bars`), then the next timeframe up.
+    """
+    frames = {
+        tf: columnar_candles((data or {}).get("historical_data") or [], digits)
+        for tf, data in (model_input.get("timeframes") or {}).items()
+    }
+    document = {**model_input, "format": CANDLE_FORMAT, "timeframes": frames}
+
+    def render() -> str:
+        return fast_json.dumps(document).decode()
+
+    text = render()
+    if not token_budget:
+        return text
+
+    tokens = count_tokens(text)
+    # Lowest timeframe first; frames without a known bar length go last
+    for tf in sorted(frames, key=lambda name: frames[name].get("bar") or math.inf):
+        while tokens > token_budget and len(frames[tf]["c"]) > min_bars:
+            bars = len(frames[tf]["c"])
+            per_bar = max(1.0, count_tokens(fast_json.dumps(frames[tf]).decode()) / bars)
+            drop = min(bars - min_bars, max(1, math.ceil((tokens - token_budget) / per_bar)))
+            frames[tf] = _trim_oldest(frames[tf], drop)
+            text = render()
+            tokens = count_tokens(text)
+        if tokens <= token_budget:
+            break
+    return text
+
+
+def parse_decision(content: str) -> Dict[str, Any]:
+    """The model's output as a decision object; ValueError unless it is a JSON object."""
+    try:
+        decision = json.loads(content)
+    except Exception:
+        raise ValueError("AI returned an invalid JSON response.")
+    if not isinstance(decision, dict):
+        raise ValueError("AI returned an invalid JSON response.")
+    return decision
 
 
 class AIServices:
 
+    def __init__(self):
+        # App-lifetime client, opened and closed by the lifespan in main.py
+        self.client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def start(self):
+        if self.client is None:
+            self.client = make_client()
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def stats(self) -> dict:
+        return {
+            "base_url": OPENAI_BASE_URL,
+            "open": self.client is not None,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
+
+    async def post_json(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """POST to the LLM API, retrying 429/5xx and connection failures with jittered backoff."""
+        if self.client is None:
+            await self.start()  # used outside the app lifespan (scripts, benchmarks)
+
+        self.requests += 1
+        for attempt in range(AI_MAX_RETRIES + 1):
+            last_try = attempt == AI_MAX_RETRIES
+            try:
+                response = await self.client.post(path, json=body)
+            except RETRY_ERRORS:
+                if last_try:
+                    self.failures += 1
+                    raise
+                delay = retry_delay(attempt)
+            except httpx.HTTPError:
+                self.failures += 1
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES or last_try:
+                    if response.is_error:
+                        self.failures += 1
+                    response.raise_for_status()
+                    return response.json()
+                delay = retry_delay(attempt, response)
+
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def stream_chat(self, body: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Content deltas of a streamed chat completion, as they arrive. Failures before
+        the first delta are retried like post_json; a gap longer than
+        AI_STREAM_IDLE_TIMEOUT raises httpx.ReadTimeout. Closing the generator
+        (e.g. the client went away) closes the upstream connection, which stops
+        the generation.
+        """
+        if self.client is None:
+            await self.start()
+
+        body = {**body, "stream": True}
+        timeout = httpx.Timeout(AI_STREAM_IDLE_TIMEOUT, connect=AI_CONNECT_TIMEOUT, pool=AI_CONNECT_TIMEOUT)
+        self.requests += 1
+        started = False
+        for attempt in range(AI_MAX_RETRIES + 1):
+            last_try = attempt == AI_MAX_RETRIES
+            try:
+                async with self.client.stream("POST", "/chat/completions", json=body, timeout=timeout) as response:
+                    if response.status_code in RETRY_STATUSES and not last_try:
+                        delay = retry_delay(attempt, response)
+                    else:
+                        if response.is_error:
+                            self.failures += 1
+                            await response.aread()
+                            response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            # OpenAI SSE: "data: {chunk}" lines, terminated by "data: [DONE]"
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                return
+                            choices = json.loads(data).get("choices") or [{}]
+                            delta = (choices[0].get("delta") or {}).get("content")
+                            if delta:
+                                started = True
+                                yield delta
+                        return
+            except RETRY_ERRORS:
+                # Once deltas went out a retry would repeat them
+                if last_try or started:
+                    self.failures += 1
+                    raise
+                delay = retry_delay(attempt)
+            except httpx.HTTPStatusError:
+                raise
+            except httpx.HTTPError:
+                self.failures += 1
+                raise
+
+            self.retries += 1
+            await asyncio.sleep(delay)
+
     # ======================================================================
     # 1. UNIFIED DATASET PAYLOAD (your original)
     # ======================================================================
@@ -39,17 +337,13 @@ class AIServices:
     # 2. LLM DECISION CALL (your original)
     # ======================================================================
     @staticmethod
-    async def get_ai_decision(model_input: Dict[str, Any]) -> Dict[str, Any]:
+    def decision_request(model_input: Dict[str, Any], digits: Optional[int] = None) -> Dict[str, Any]:
         """
-        Sends a single JSON payload to OpenAI and returns structured JSON output.
-        This is the core decision engine call.
+        Chat completions body for a decision on `model_input`. `digits` is the
+        symbol's price precision for the compact encoding (inferred from the
+        candles when None).
         """
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {OPENAI_API_KEY}"
-        }
-
         system_prompt = """
             You are a professional financial trader with over 20 years of experience. 
             Your job is to generate scalping trade signals using:
@@ -71,10 +365,11 @@ class AIServices:
             7. If high-impact news is imminent, avoid taking trades.
         """
 
+        dataset = encode_model_input(model_input, digits) if AI_PROMPT_COMPACT else json.dumps(model_input)
         user_prompt = f"""
             Here is the full market dataset. Return trading decisions in JSON only.
 
-            {json.dumps(model_input)}
+            {dataset}
         """
 
         body = {
@@ -86,14 +381,29 @@ class AIServices:
             "response_format": {"type": "json_object"}
         }
 
-        async with httpx.AsyncClient(timeout=None) as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=body
-            )
+        return body
+
+    async def get_ai_decision(self, model_input: Dict[str, Any], digits: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Sends a single JSON payload to OpenAI and returns structured JSON output.
+        This is the core decision engine call.
+        """
+        return await self.post_json("/chat/completions", self.decision_request(model_input, digits))
+
+    async def decide(self, model_input: Dict[str, Any], digits: Optional[int] = None) -> Dict[str, Any]:
+        """get_ai_decision() reduced to the decision JSON the model returned."""
+        ai_response = await self.get_ai_decision(model_input, digits)
+        # "choices" is returned by OpenAI – extract the JSON body
+        try:
+            content = ai_response["choices"][0]["message"]["content"]
+        except Exception:
+            raise ValueError("AI returned an invalid JSON response.")
+        return parse_decision(content)
 
-        return response.json()
+    async def stream_ai_decision(self, model_input: Dict[str, Any], digits: Optional[int] = None) -> AsyncIterator[str]:
+        """get_ai_decision() streamed: yields the model's output as it is generated."""
+        async for delta in self.stream_chat(self.decision_request(model_input, digits)):
+            yield delta
 
     # ======================================================================
     # 3. BUILD TRADE CLOSE PAYLOAD
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class CandleSeries:
+    """
+    Ring buffer of candles for one (symbol, timeframe), stored as the numpy
+    structured array MT5 returns. Oldest bar first, like copy_rates_from_pos.
+    """
+
+    def __init__(self, rates: np.ndarray, capacity: int, complete: bool = False):
+        self.capacity = max(capacity, len(rates))
+        self.buffer = np.zeros(self.capacity, dtype=rates.dtype)
+        self.start = 0
+        self.size = 0
+        # True when the terminal has no older history than what we hold
+        self.complete = complete
+        self.synced_at = 0.0
+        self.append(rates)
+
+    @property
+    def nbytes(self) -> int:
+        return self.buffer.nbytes
+
+    @property
+    def last_time(self) -> Optional[int]:
+        if not self.size:
+            return None
+        return int(self.buffer["time"][(self.start + self.size - 1) % self.capacity])
+
+    def append(self, rates: np.ndarray):
+        """Append bars newer than the last one held; a bar with the same time replaces it (forming bar)."""
+        last = self.last_time
+        if last is not None:
+            if len(rates) and rates["time"][0] <= last:
+                same = rates[rates["time"] == last]
+                if len(same):
+                    self.buffer[(self.start + self.size - 1) % self.capacity] = same[-1]
+            rates = rates[rates["time"] > last]
+
+        rates = rates[-self.capacity:]
+        if not len(rates):
+            return
+        self.buffer[(self.start + self.size + np.arange(len(rates))) % self.capacity] = rates
+        overflow = self.size + len(rates) - self.capacity
+        if overflow > 0:
+            self.start = (self.start + overflow) % self.capacity
+            self.size = self.capacity
+            self.complete = False
+        else:
+            self.size += len(rates)
+
+    def tail(self, count: int) -> np.ndarray:
+        """Copy of the newest `count` bars, oldest first."""
+        count = min(count, self.size)
+        first = self.start + self.size - count
+        return np.take(self.buffer, np.arange(first, first + count) % self.capacity)
+
+
+class CandleCache:
+    """
+    LRU cache of CandleSeries keyed by (symbol, timeframe).
+
+    A request is served from memory when the series was synced less than
+    `refresh_interval` seconds ago. Otherwise only the newest bars are fetched:
+    a small window from position 0 that doubles until it overlaps the cached
+    bars, so the forming bar is patched and closed bars are appended. Series
+    are evicted least-recently-used first once `max_bytes` is exceeded.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, int, int, int], Optional[np.ndarray]],
+        max_bytes: int = 64 * 1024 * 1024,
+        capacity: int = 1000,
+        refresh_interval: float = 1.0,
+        initial_window: int = 2,
+    ):
+        self._fetch = fetch
+        self.max_bytes = max_bytes
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.initial_window = initial_window
+
+        self._series: "OrderedDict[tuple, CandleSeries]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.updates = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, symbol: str, timeframe: int, count: int) -> Optional[np.ndarray]:
+        """Return the newest `count` bars, oldest first, or None if the terminal returned nothing."""
+        key = (symbol, timeframe)
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None and (series.size >= count or series.complete):
+                self._series.move_to_end(key)
+                if time.monotonic() - series.synced_at < self.refresh_interval:
+                    self.hits += 1
+                elif self._sync(series, symbol, timeframe):
+                    self.updates += 1
+                else:
+                    series = None
+
+            if series is None or (series.size < count and not series.complete):
+                series = self._load(key, count)
+                if series is None:
+                    return None
+
+            return series.tail(count)
+
+    def _load(self, key: tuple, count: int) -> Optional[CandleSeries]:
+        symbol, timeframe = key
+        rates = self._fetch(symbol, timeframe, 0, max(count, self.capacity))
+        self.misses += 1
+        if rates is None or len(rates) == 0:
+            return None
+
+        series = CandleSeries(rates, max(count, self.capacity), complete=len(rates) < max(count, self.capacity))
+        series.synced_at = time.monotonic()
+        self._series[key] = series
+        self._series.move_to_end(key)
+        self._evict(keep=key)
+        return series
+
+    def _sync(self, series: CandleSeries, symbol: str, timeframe: int) -> bool:
+        """Fetch bars from the cached last bar onwards. Returns False if the gap is too large to patch."""
+        last = series.last_time
+        window = self.initial_window
+        while window <= series.capacity:
+            rates = self._fetch(symbol, timeframe, 0, window)
+            if rates is None or len(rates) == 0:
+                return False
+            if rates["time"][0] <= last or len(rates) < window:
+                series.append(rates)
+                series.synced_at = time.monotonic()
+                return True
+            window *= 2
+        return False
+
+    def _evict(self, keep: tuple):
+        total = sum(s.nbytes for s in self._series.values())
+        while total > self.max_bytes and len(self._series) > 1:
+            key = next(iter(self._series))
+            if key == keep:
+                self._series.move_to_end(key)
+                continue
+            total -= self._series.pop(key).nbytes
+            self.evictions += 1
+
+    def invalidate(self, symbol: Optional[str] = None):
+        with self._lock:
+            if symbol is None:
+                self._series.clear()
+                return
+            for key in [k for k in self._series if k[0] == symbol]:
+                del self._series[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "series": len(self._series),
+                "bytes": sum(s.nbytes for s in self._series.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "updates": self.updates,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
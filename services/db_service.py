@@ -1,7 +1,53 @@
-from sqlalchemy.orm import Session
-from models import Instrument, TradeJournal
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, undefer_group
+from sqlalchemy.orm.attributes import set_committed_value
+from models import Instrument, JournalStats, TradeJournal
 from schemas import InstrumentCreate, TradeJournalCreate
+from services import journal_stats, snapshot_store
 from datetime import datetime
+from typing import Iterable, Optional
+import base64
+
+
+# Deferred Text columns (group "detail" in models) that full-row reads load up front;
+# async sessions cannot lazy-load them later
+FULL_ROW = undefer_group("detail")
+
+# Journal fields served from snapshot_blobs, and the column holding each one's ref
+SNAPSHOT_REFS = {"snapshot_json": "snapshot_ref", "sentiment_json": "sentiment_ref"}
+
+
+# --------------------------- Column projection (fields=) ---------------------------
+
+def parse_fields(fields: Optional[str], model, extra: Iterable[str] = ()) -> Optional[list]:
+    """ "id,symbol" -> ["id", "symbol"], validated against the model's columns. None = full rows."""
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(part.strip() for part in fields.split(",") if part.strip()))
+    allowed = set(model.__table__.columns.keys()) | set(extra)
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field: {', '.join(unknown)}")
+    if not names:
+        raise ValueError("fields must name at least one column")
+    return names
+
+
+def columns_of(model, names: Iterable[str]):
+    return [getattr(model, name) for name in dict.fromkeys(names)]
+
+
+def project(rows, fields: list, texts: Optional[dict] = None) -> list:
+    """Rows of selected columns -> dicts holding exactly `fields`. Snapshot fields resolve through `texts`."""
+    texts = texts or {}
+    return [
+        {
+            name: texts.get(getattr(row, SNAPSHOT_REFS[name], None)) if name in SNAPSHOT_REFS else getattr(row, name)
+            for name in fields
+        }
+        for row in rows
+    ]
 
 
 # --------------------------- Instruments CRUD ---------------------------
@@ -24,18 +70,32 @@ def get_instruments(db: Session):
 
 # --------------------------- Trade Journal CRUD ---------------------------
 
+def _split_snapshots(data: TradeJournalCreate):
+    values = data.dict()
+    return values, values.pop("snapshot_json"), values.pop("sentiment_json")
+
+
+def _attach_snapshots(items, texts: dict):
+    # Plain attributes, not columns: TradeJournalRead picks them up as snapshot_json / sentiment_json
+    for item in items:
+        item.snapshot_json = texts.get(item.snapshot_ref)
+        item.sentiment_json = texts.get(item.sentiment_ref)
+    return items
+
+
 def create_trade_journal(db: Session, data: TradeJournalCreate):
-    item = TradeJournal(**data.dict())
+    values, snapshot, sentiment = _split_snapshots(data)
+    item = TradeJournal(
+        **values,
+        snapshot_ref=snapshot_store.put(db, snapshot),
+        sentiment_ref=snapshot_store.put(db, sentiment),
+    )
     db.add(item)
     db.commit()
     db.refresh(item)
     return item
 
 
-def get_trade(db: Session, trade_id: int):
-    return db.query(TradeJournal).filter(TradeJournal.id == trade_id).first()
-
-
 def get_recent_trades(db: Session, limit: int = 50):
     return (
         db.query(TradeJournal)
@@ -45,12 +105,187 @@ def get_recent_trades(db: Session, limit: int = 50):
     )
 
 
-def close_trade(db: Session, trade_id: int, result_pnl: float):
-    item = db.query(TradeJournal).filter(TradeJournal.id == trade_id).first()
+# --------------------------- Trade Journal queries (keyset pagination) ---------------------------
+
+def encode_cursor(item: TradeJournal) -> str:
+    raw = f"{item.opened_at.isoformat()}|{item.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        opened_at, trade_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(opened_at), int(trade_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def trade_journal_query(
+    columns: Optional[list] = None,
+    symbol: Optional[str] = None,
+    status: Optional[str] = None,
+    direction: Optional[str] = None,
+    opened_from: Optional[datetime] = None,
+    opened_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+):
+    """
+    Newest-first journal query, ordered by (opened_at, id) so it can page with a cursor
+    instead of OFFSET. Selects limit + 1 rows; see paginate(). With `columns`, only
+    those columns are read and rows come back as tuples instead of TradeJournal objects.
+    """
+    stmt = select(*columns) if columns else select(TradeJournal).options(FULL_ROW)
+    if symbol:
+        stmt = stmt.where(TradeJournal.symbol == symbol)
+    if status:
+        stmt = stmt.where(TradeJournal.status == status)
+    if direction:
+        stmt = stmt.where(TradeJournal.direction == direction)
+    if opened_from:
+        stmt = stmt.where(TradeJournal.opened_at >= opened_from)
+    if opened_to:
+        stmt = stmt.where(TradeJournal.opened_at < opened_to)
+    if cursor:
+        opened_at, trade_id = decode_cursor(cursor)
+        # The first condition keeps the range on the (…, opened_at) indexes; the second breaks ties
+        stmt = stmt.where(and_(
+            TradeJournal.opened_at <= opened_at,
+            or_(TradeJournal.opened_at < opened_at, TradeJournal.id < trade_id),
+        ))
+    return stmt.order_by(TradeJournal.opened_at.desc(), TradeJournal.id.desc()).limit(limit + 1)
+
+
+def paginate(rows: list, limit: int):
+    """Split a limit + 1 result into (page, next_cursor)."""
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+def _mark_closed(db: Session, item: TradeJournal, result_pnl: float, exit_price: Optional[float]):
+    values = {"status": "closed", "result_pnl": result_pnl, "exit_price": exit_price, "closed_at": datetime.utcnow()}
+    # One conditional UPDATE, so of two concurrent closes only one matches the row
+    result = db.execute(
+        update(TradeJournal)
+        .where(TradeJournal.id == item.id, TradeJournal.status.not_in(("closed", "cancelled")))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise ValueError(f"Trade {item.id} is already closed or cancelled")
+    for name, value in values.items():
+        set_committed_value(item, name, value)
+    # Same transaction as the close, so journal_stats never drifts from trade_journal
+    journal_stats.apply_close(db, item)
+
+
+# --------------------------- Async variants (event-loop routes) ---------------------------
+
+async def create_instrument_async(db: AsyncSession, data: InstrumentCreate):
+    item = Instrument(**data.dict())
+    db.add(item)
+    # Ids and column defaults are filled in at flush; a refresh would unload the deferred columns
+    await db.commit()
+    return item
+
+
+async def get_instrument_async(db: AsyncSession, symbol: str):
+    result = await db.execute(select(Instrument).options(FULL_ROW).where(Instrument.symbol == symbol).limit(1))
+    return result.scalars().first()
+
+
+async def get_backtest_json_async(db: AsyncSession, *symbols: str) -> Optional[str]:
+    """backtest_json of the first of `symbols` that has one, reading only that column."""
+    result = await db.execute(select(Instrument.symbol, Instrument.backtest_json).where(Instrument.symbol.in_(symbols)))
+    found = dict(result.all())
+    return next((found[symbol] for symbol in symbols if found.get(symbol)), None)
+
+
+async def get_instruments_async(db: AsyncSession, fields: Optional[list] = None):
+    if fields is None:
+        result = await db.execute(select(Instrument).options(FULL_ROW))
+        return result.scalars().all()
+    result = await db.execute(select(*columns_of(Instrument, fields)))
+    return project(result.all(), fields)
+
+
+async def create_trade_journal_async(db: AsyncSession, data: TradeJournalCreate):
+    values, snapshot, sentiment = _split_snapshots(data)
+    item = TradeJournal(
+        **values,
+        snapshot_ref=await snapshot_store.put_async(db, snapshot),
+        sentiment_ref=await snapshot_store.put_async(db, sentiment),
+    )
+    db.add(item)
+    # No refresh, see create_instrument_async
+    await db.commit()
+    return item
+
+
+async def bulk_create_trade_journal_async(db: AsyncSession, entries: list, batch_size: int = 500):
+    """
+    Insert many journal entries, one transaction and one executemany per batch.
+    Returns (ids, errors): ids align with `entries` (None where the insert failed),
+    errors maps an entry's index to the database error of its batch.
+    """
+    ids, errors = [None] * len(entries), {}
+    stmt = insert(TradeJournal).returning(TradeJournal.id, sort_by_parameter_order=True)
+    for start in range(0, len(entries), batch_size):
+        batch = entries[start:start + batch_size]
+        rows = [_split_snapshots(data) for data in batch]
+        try:
+            snapshot_refs = await snapshot_store.put_many_async(db, [snapshot for _, snapshot, _ in rows])
+            sentiment_refs = await snapshot_store.put_many_async(db, [sentiment for _, _, sentiment in rows])
+            result = await db.execute(stmt, [
+                {**values, "snapshot_ref": snapshot_ref, "sentiment_ref": sentiment_ref}
+                for (values, _, _), snapshot_ref, sentiment_ref in zip(rows, snapshot_refs, sentiment_refs)
+            ])
+            ids[start:start + len(batch)] = result.scalars().all()
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            ids[start:start + len(batch)] = [None] * len(batch)
+            errors.update({start + offset: f"Batch insert failed: {e}" for offset in range(len(batch))})
+    return ids, errors
+
+
+async def get_trade_async(db: AsyncSession, trade_id: int):
+    return await db.get(TradeJournal, trade_id, options=[FULL_ROW])
+
+
+async def load_snapshots_async(db: AsyncSession, items):
+    refs = [ref for item in items for ref in (item.snapshot_ref, item.sentiment_ref)]
+    return _attach_snapshots(items, await snapshot_store.load_async(db, refs))
+
+
+async def query_trades_async(db: AsyncSession, limit: int = 50, fields: Optional[list] = None, **filters):
+    """(page, next_cursor). With `fields`, the page is a list of dicts holding only those fields."""
+    if fields is None:
+        result = await db.execute(trade_journal_query(limit=limit, **filters))
+        return paginate(result.scalars().all(), limit)
+
+    # id and opened_at are always read: the cursor is built from them
+    columns = columns_of(TradeJournal, ["id", "opened_at", *(SNAPSHOT_REFS.get(name, name) for name in fields)])
+    result = await db.execute(trade_journal_query(columns=columns, limit=limit, **filters))
+    rows, next_cursor = paginate(result.all(), limit)
+
+    texts = {}
+    if SNAPSHOT_REFS.keys() & set(fields):
+        refs = [getattr(row, ref, None) for row in rows for ref in SNAPSHOT_REFS.values()]
+        texts = await snapshot_store.load_async(db, refs)
+    return project(rows, fields, texts), next_cursor
+
+
+async def close_trade_async(db: AsyncSession, trade_id: int, result_pnl: float, exit_price: Optional[float] = None):
+    item = await db.get(TradeJournal, trade_id, options=[FULL_ROW])
     if item:
-        item.status = "closed"
-        item.result_pnl = result_pnl
-        item.closed_at = datetime.utcnow()
-        db.commit()
-        db.refresh(item)
+        await db.run_sync(_mark_closed, item, result_pnl, exit_price)
+        # No refresh: expire_on_commit=False keeps the values just written, and a refresh
+        # would leave the deferred columns unloaded
+        await db.commit()
     return item
+
+
+async def get_journal_stats_async(db: AsyncSession, symbol: str = journal_stats.ALL, direction: str = journal_stats.ALL):
+    return journal_stats.to_dict(await db.get(JournalStats, (symbol, direction)), symbol, direction)
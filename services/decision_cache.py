@@ -0,0 +1,239 @@
+"""
+Cache of AI decisions keyed by a canonical hash of the model payload.
+
+Identical payloads within the same bar get the same decision: the key ignores the
+forming bar's live prices, and an entry expires when the newest bar of the payload's
+shortest timeframe closes. Concurrent requests for a payload that is
+already being decided wait for that one upstream call instead of starting their own.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services import fast_json
+from services.mt5_service import TIMEFRAME_SECONDS
+
+
+# Fields of the forming bar that move with every tick; payload_key leaves them out
+LIVE_FIELDS = {"high", "low", "close", "tick_volume", "real_volume", "spread", "volume"}
+
+
+def _forming_index(candles: List[Dict[str, Any]]) -> int:
+    """Position of the newest candle: the first (the bundle's newest-first order) unless the last is later."""
+    try:
+        return len(candles) - 1 if candles[-1].get("time") > candles[0].get("time") else 0
+    except TypeError:  # missing or mixed time formats
+        return 0
+
+
+def stable_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    `payload` with only the time and open of each timeframe's forming bar, so every
+    tick within one bar maps to the same key.
+    """
+    timeframes = payload.get("timeframes")
+    if not isinstance(timeframes, dict):
+        return payload
+    stable = {}
+    for tf, frame in timeframes.items():
+        candles = frame.get("historical_data") if isinstance(frame, dict) else None
+        if not candles or not isinstance(candles[0], dict):
+            stable[tf] = frame
+            continue
+        i = _forming_index(candles)
+        forming = {field: value for field, value in candles[i].items() if field not in LIVE_FIELDS}
+        stable[tf] = {**frame, "historical_data": [*candles[:i], forming, *candles[i + 1:]]}
+    return {**payload, "timeframes": stable}
+
+
+def payload_key(payload: Dict[str, Any]) -> str:
+    """sha256 of the stable payload as JSON with sorted keys, so key order does not matter."""
+    payload = stable_payload(payload)
+    if fast_json.orjson is not None:
+        raw = fast_json.orjson.dumps(payload, option=fast_json.orjson.OPT_SORT_KEYS)
+    else:
+        raw = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _epoch(value: Any) -> Optional[float]:
+    """A candle's time (epoch seconds or ISO-8601, naive = UTC) as epoch seconds; None if unparseable."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def bar_close(payload: Dict[str, Any], now: float, fallback_ttl: float, server_offset: float = 0.0) -> float:
+    """
+    Epoch second at which the newest bar of the payload's shortest timeframe closes:
+    its open time plus the bar length. MT5 stamps bars in the broker's server time,
+    `server_offset` seconds ahead of UTC. now + fallback_ttl when there are no candles.
+    """
+    frames = [
+        (TIMEFRAME_SECONDS[tf.upper()], frame.get("historical_data"))
+        for tf, frame in (payload.get("timeframes") or {}).items()
+        if tf.upper() in TIMEFRAME_SECONDS and isinstance(frame, dict)
+    ]
+    for seconds, candles in sorted(frames, key=lambda item: item[0]):
+        if not candles or not isinstance(candles[0], dict):
+            continue
+        opened = _epoch(candles[_forming_index(candles)].get("time"))
+        if opened is not None:
+            return opened + seconds - server_offset
+    return now + fallback_ttl
+
+
+def _settle(future: asyncio.Future, task: asyncio.Future):
+    """Copy a finished compute task's outcome onto the future coalesced callers wait on."""
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+class DecisionCache:
+    def __init__(
+        self,
+        max_entries: int = 256,
+        fallback_ttl: float = 300.0,
+        server_offset: float = 0.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.fallback_ttl = fallback_ttl
+        self.server_offset = server_offset
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # key -> (expires_at, decision)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def claim(self, payload: Dict[str, Any], refresh: bool = False) -> Tuple[str, Any]:
+        """
+        For callers that produce the decision themselves, e.g. a streamed completion:
+        ("hit", decision), ("coalesced", future of the call already in flight), or
+        ("miss", future) — on a miss the caller owns the future and must set its
+        result or exception, or cancel it if it gives up, so coalesced callers are
+        released. Counts like get_or_compute.
+        """
+        key = payload_key(payload)
+        if not refresh:
+            decision = self._lookup(key)
+            if decision is not None:
+                return "hit", decision
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return "coalesced", pending
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        future.add_done_callback(lambda done: self._store(key, payload, done))
+        return "miss", future
+
+    @staticmethod
+    async def wait(future: asyncio.Future) -> Optional[Any]:
+        """
+        Result of an in-flight call; None if its owner gave up (cancelled it), in which
+        case the caller should claim() again. Cancelling the caller leaves the call running.
+        """
+        try:
+            # shield: a caller that disconnects must not cancel the call others are waiting on
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.cancelled():
+                return None
+            raise
+
+    def peek(self, payload: Dict[str, Any], refresh: bool = False) -> str:
+        """What claim() would answer right now ("hit", "coalesced" or "miss"), without counting it."""
+        key = payload_key(payload)
+        entry = self._entries.get(key)
+        if not refresh and entry is not None and entry[0] > self._clock():
+            return "hit"
+        return "coalesced" if key in self._inflight else "miss"
+
+    async def get_or_compute(
+        self,
+        payload: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]],
+        refresh: bool = False,
+    ) -> Tuple[Any, str]:
+        """
+        (decision, outcome) where outcome is "hit", "coalesced" or "miss". With
+        `refresh`, a cached decision is ignored but the new one is still stored.
+        Failed computations are not cached.
+        """
+        while True:
+            outcome, value = self.claim(payload, refresh)
+            if outcome == "hit":
+                return value, outcome
+            if outcome == "miss":
+                task = asyncio.ensure_future(compute())
+                task.add_done_callback(lambda done, future=value: _settle(future, done))
+            decision = await self.wait(value)
+            if decision is not None:
+                return decision, outcome
+            # The call we joined was abandoned (e.g. a streaming client left): claim again
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def _put(self, key: str, payload: Dict[str, Any], decision: Any):
+        self._entries[key] = (bar_close(payload, self._clock(), self.fallback_ttl, self.server_offset), decision)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _store(self, key: str, payload: Dict[str, Any], future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if future.cancelled() or future.exception() is not None:
+            self.errors += 1
+            return
+        self._put(key, payload, future.result())
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        now = self._clock()
+        return {
+            "entries": sum(1 for expires_at, _ in self._entries.values() if expires_at > now),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+        }
+
+
+decision_cache = DecisionCache(
+    max_entries=int(os.getenv("AI_DECISION_CACHE_SIZE", "256")),
+    fallback_ttl=float(os.getenv("AI_DECISION_CACHE_TTL", "300")),
+    # Hours the broker's server clock is ahead of UTC (MT5 bar times are server time)
+    server_offset=float(os.getenv("MT5_SERVER_UTC_OFFSET", "0")) * 3600,
+)
@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+
+CANDLE_FIELDS = ("open", "high", "low", "close")
+
+
+def dumps(obj) -> bytes:
+    """Encode to JSON bytes with orjson when installed, else the stdlib encoder."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def iso_times(epoch_seconds: np.ndarray) -> list:
+    """Vectorized epoch seconds -> ISO-8601 UTC strings ("2025-10-28T12:40:00Z")."""
+    return [t + "Z" for t in epoch_seconds.astype("datetime64[s]").astype(str).tolist()]
+
+
+def candle_records(rates: np.ndarray, newest_first: bool = True) -> list:
+    """
+    MT5 structured rates array -> list of Candle-shaped dicts, without pandas.
+    Columns are converted in bulk with numpy; the only Python loop builds the dicts.
+    """
+    if newest_first:
+        rates = rates[::-1]
+
+    times = iso_times(rates["time"])
+    opens, highs, lows, closes = (rates[field].tolist() for field in CANDLE_FIELDS)
+    volumes = rates["tick_volume"].tolist()
+
+    return [
+        {"time": t, "open": o, "high": h, "low": l, "close": c, "tick_volume": v}
+        for t, o, h, l, c, v in zip(times, opens, highs, lows, closes, volumes)
+    ]
+
+
+def history_response(symbol: str, timeframe: str, rates: np.ndarray) -> bytes:
+    """JSON body of HistoricalDataResponse (newest candle first) straight from the rates array."""
+    return dumps({
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "historical_data": candle_records(rates),
+    })
+
+
+def timeframe_bundle_response(symbol: str, bundle: dict) -> bytes:
+    """JSON body of {timeframe: TimeframeData} (newest candle first), the shape AIRequest.timeframes expects."""
+    return dumps({
+        timeframe: {"symbol": symbol, "timeframe": timeframe, "historical_data": candle_records(rates)}
+        for timeframe, rates in bundle.items()
+    })
+
+
+def sse_event(event: str, data) -> bytes:
+    """One Server-Sent Events message with a JSON data line."""
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
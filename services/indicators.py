@@ -0,0 +1,293 @@
+"""
+Incremental indicators per (symbol, timeframe).
+
+Each indicator keeps O(1) rolling state and advances once per closed bar. The
+engine warms a series up from the candle cache on first use; later requests only
+feed the bars that closed since the previous one. The forming bar never touches
+the state: its values are computed with peek() and reported as "live".
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services import mt5_service
+
+
+class SMA:
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.count = 0
+
+    def update(self, high: float, low: float, close: float):
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(close)
+        self.total += close
+        self.count += 1
+        if self.count % 1024 == 0:
+            self.total = sum(self.window)  # drop accumulated rounding error
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.total / self.period if len(self.window) == self.period else None
+
+    def peek(self, high: float, low: float, close: float) -> Optional[float]:
+        if len(self.window) < self.period - 1:
+            return None
+        dropped = self.window[0] if len(self.window) == self.period else 0.0
+        return (self.total - dropped + close) / self.period
+
+
+class EMA:
+    """Seeded with the SMA of the first `period` closes."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.seed: List[float] = []
+        self.value: Optional[float] = None
+
+    def update(self, high: float, low: float, close: float):
+        self.value = self._step(close)
+        if self.value is None:
+            self.seed.append(close)
+
+    def peek(self, high: float, low: float, close: float) -> Optional[float]:
+        return self._step(close)
+
+    def _step(self, close: float) -> Optional[float]:
+        if self.value is not None:
+            return self.value + self.alpha * (close - self.value)
+        if len(self.seed) == self.period - 1:
+            return (sum(self.seed) + close) / self.period
+        return None
+
+
+class Wilder:
+    """Wilder smoothing: the mean of the first `period` inputs, then avg = (avg * (n - 1) + x) / n."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.seed: List[float] = []
+        self.average: Optional[float] = None
+
+    def step(self, x: float) -> Optional[float]:
+        if self.average is not None:
+            return (self.average * (self.period - 1) + x) / self.period
+        if len(self.seed) == self.period - 1:
+            return (sum(self.seed) + x) / self.period
+        return None
+
+    def update(self, x: float):
+        self.average = self.step(x)
+        if self.average is None:
+            self.seed.append(x)
+
+
+class RSI:
+    def __init__(self, period: int):
+        self.period = period
+        self.gain = Wilder(period)
+        self.loss = Wilder(period)
+        self.prev_close: Optional[float] = None
+
+    @staticmethod
+    def _rsi(gain: Optional[float], loss: Optional[float]) -> Optional[float]:
+        if gain is None or loss is None:
+            return None
+        if loss == 0:
+            return 50.0 if gain == 0 else 100.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def update(self, high: float, low: float, close: float):
+        if self.prev_close is not None:
+            change = close - self.prev_close
+            self.gain.update(max(change, 0.0))
+            self.loss.update(max(-change, 0.0))
+        self.prev_close = close
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._rsi(self.gain.average, self.loss.average)
+
+    def peek(self, high: float, low: float, close: float) -> Optional[float]:
+        if self.prev_close is None:
+            return None
+        change = close - self.prev_close
+        return self._rsi(self.gain.step(max(change, 0.0)), self.loss.step(max(-change, 0.0)))
+
+
+class ATR:
+    def __init__(self, period: int):
+        self.period = period
+        self.range = Wilder(period)
+        self.prev_close: Optional[float] = None
+
+    def _true_range(self, high: float, low: float) -> float:
+        if self.prev_close is None:
+            return high - low
+        return max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+    def update(self, high: float, low: float, close: float):
+        self.range.update(self._true_range(high, low))
+        self.prev_close = close
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.range.average
+
+    def peek(self, high: float, low: float, close: float) -> Optional[float]:
+        return self.range.step(self._true_range(high, low))
+
+
+INDICATORS = {"sma": SMA, "ema": EMA, "rsi": RSI, "atr": ATR}
+MAX_PERIOD = 500
+
+
+def parse_specs(spec: str) -> Dict[str, Tuple[str, int]]:
+    """ "ema:20,rsi:14" -> {"ema_20": ("ema", 20), "rsi_14": ("rsi", 14)}. Raises ValueError."""
+    specs = {}
+    for part in (p.strip().lower() for p in spec.split(",")):
+        if not part:
+            continue
+        kind, _, period = part.partition(":")
+        if kind not in INDICATORS:
+            raise ValueError(f"Unknown indicator '{kind}', expected one of {', '.join(INDICATORS)}")
+        if not period.isdigit() or not (1 <= int(period) <= MAX_PERIOD):
+            raise ValueError(f"Indicator '{part}' needs a period between 1 and {MAX_PERIOD}, e.g. {kind}:14")
+        specs[f"{kind}_{int(period)}"] = (kind, int(period))
+    if not specs:
+        raise ValueError("At least one indicator is required")
+    return specs
+
+
+class IndicatorState:
+    """Indicator set for one (symbol, timeframe), fed with closed bars only."""
+
+    def __init__(self, specs: Dict[str, Tuple[str, int]]):
+        self.indicators = {name: INDICATORS[kind](period) for name, (kind, period) in specs.items()}
+        self.last_closed: Optional[int] = None
+        self.bars = 0
+
+    def feed(self, rates: np.ndarray):
+        if self.last_closed is not None:
+            rates = rates[rates["time"] > self.last_closed]
+        if not len(rates):
+            return
+        for high, low, close in zip(rates["high"].tolist(), rates["low"].tolist(), rates["close"].tolist()):
+            for indicator in self.indicators.values():
+                indicator.update(high, low, close)
+        self.last_closed = int(rates["time"][-1])
+        self.bars += len(rates)
+
+
+class IndicatorEngine:
+    """
+    LRU of IndicatorState keyed by (symbol, timeframe). `get_rates(symbol, count, timeframe)`
+    returns the newest bars oldest first, forming bar last (mt5_service.get_rates).
+    """
+
+    def __init__(
+        self,
+        get_rates: Callable[[str, int, str], np.ndarray],
+        default_specs: str = "sma:20,sma:50,ema:20,ema:50,rsi:14,atr:14",
+        warmup: int = 500,
+        max_series: int = 512,
+    ):
+        self._get_rates = get_rates
+        self.default_specs = parse_specs(default_specs)
+        self.warmup = warmup
+        self.max_series = max_series
+        self._states: "OrderedDict[tuple, IndicatorState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.warmups = 0
+        self.advanced_bars = 0
+
+    def compute(self, symbol: str, timeframe: str, specs: Optional[Dict[str, Tuple[str, int]]] = None) -> dict:
+        """Values as of the last closed bar plus live values including the forming bar."""
+        requested = specs or self.default_specs
+        timeframe = timeframe.upper()
+        key = (symbol, timeframe)
+        with self._lock:
+            state = self._states.get(key)
+            build = requested
+            if state is not None and requested.keys() - state.indicators.keys():
+                # New indicators for this series: rebuild with the union so all share one warm-up
+                build = {**{name: self._spec(name) for name in state.indicators}, **requested}
+                state = None
+
+            forming = None
+            if state is not None:
+                forming = self._advance(state, symbol, timeframe)
+                if forming is None:
+                    state = None  # gap larger than the warm-up window
+            if state is None:
+                state, forming = self._warm_up(symbol, timeframe, build)
+                self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_series:
+                self._states.popitem(last=False)
+
+            high, low, close = float(forming["high"]), float(forming["low"]), float(forming["close"])
+            return {
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "closed_bar_time": state.last_closed,
+                "bar_time": int(forming["time"]),
+                "bars": state.bars,
+                # Only what was asked for, even when the series tracks more
+                "values": {name: state.indicators[name].value for name in requested},
+                "live": {name: state.indicators[name].peek(high, low, close) for name in requested},
+            }
+
+    @staticmethod
+    def _spec(name: str) -> Tuple[str, int]:
+        kind, period = name.rsplit("_", 1)
+        return kind, int(period)
+
+    def _warm_up(self, symbol: str, timeframe: str, specs):
+        periods = [period for _, period in specs.values()]
+        rates = self._get_rates(symbol, max(self.warmup, 4 * max(periods) + 1), timeframe)
+        state = IndicatorState(specs)
+        state.feed(rates[:-1])
+        self.warmups += 1
+        return state, rates[-1]
+
+    def _advance(self, state: IndicatorState, symbol: str, timeframe: str):
+        """Feed the bars closed since the last call. Returns the forming bar, or None if the gap is too large."""
+        window = 2
+        while window <= self.warmup:
+            rates = self._get_rates(symbol, window, timeframe)
+            if state.last_closed is None or rates["time"][0] <= state.last_closed or len(rates) < window:
+                before = state.bars
+                state.feed(rates[:-1])
+                self.advanced_bars += state.bars - before
+                return rates[-1]
+            window *= 2
+        return None
+
+    def invalidate(self, symbol: Optional[str] = None):
+        with self._lock:
+            for key in [k for k in self._states if symbol is None or k[0] == symbol]:
+                del self._states[key]
+
+    def stats(self) -> dict:
+        return {
+            "series": len(self._states),
+            "max_series": self.max_series,
+            "warmups": self.warmups,
+            "advanced_bars": self.advanced_bars,
+        }
+
+
+indicator_engine = IndicatorEngine(
+    mt5_service.get_rates,
+    default_specs=os.getenv("INDICATORS", "sma:20,sma:50,ema:20,ema:50,rsi:14,atr:14"),
+    warmup=int(os.getenv("INDICATOR_WARMUP_BARS", "500")),
+    max_series=int(os.getenv("INDICATOR_MAX_SERIES", "512")),
+)
@@ -0,0 +1,148 @@
+"""
+Incrementally maintained journal performance aggregates (table journal_stats).
+
+db_service.close_trade_async calls apply_close() in the same transaction that sets
+result_pnl, so every read is a single primary-key lookup. Each close updates four
+rows: (symbol, direction), (symbol, "*"), ("*", direction) and ("*", "*").
+
+Rebuild from scratch:
+    python -m services.journal_stats rebuild
+"""
+import sys
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from database import dialect_insert
+from models import JournalStats, TradeJournal
+
+ALL = "*"
+
+
+def buckets(symbol: str, direction: str):
+    return [(symbol, direction), (symbol, ALL), (ALL, direction), (ALL, ALL)]
+
+
+def r_multiple(trade: TradeJournal) -> Optional[float]:
+    """Outcome in units of initial risk, from entry, stop and exit price. None if unknown."""
+    if trade.exit_price is None or trade.entry_price is None or trade.stop_loss is None:
+        return None
+    risk = trade.entry_price - trade.stop_loss
+    if risk == 0:
+        return None
+    # risk is negative for sells, which flips the sign of the move as well
+    return (trade.exit_price - trade.entry_price) / risk
+
+
+def apply_close(db: Session, trade: TradeJournal):
+    """Fold one closed trade into its aggregate rows. Runs inside the caller's transaction."""
+    pnl = trade.result_pnl or 0.0
+    r = r_multiple(trade)
+
+    equity = JournalStats.equity + pnl
+    peak = case((JournalStats.peak_equity < equity, equity), else_=JournalStats.peak_equity)
+    drawdown = case((peak - equity > JournalStats.max_drawdown, peak - equity), else_=JournalStats.max_drawdown)
+
+    for symbol, direction in buckets(trade.symbol, trade.direction):
+        db.execute(
+            dialect_insert(db, JournalStats)
+            .values(symbol=symbol, direction=direction)
+            .on_conflict_do_nothing()
+        )
+        # Single UPDATE with column expressions, so concurrent closes cannot lose increments
+        db.execute(
+            update(JournalStats)
+            .where(JournalStats.symbol == symbol, JournalStats.direction == direction)
+            .values(
+                trades=JournalStats.trades + 1,
+                wins=JournalStats.wins + (1 if pnl > 0 else 0),
+                losses=JournalStats.losses + (1 if pnl < 0 else 0),
+                gross_profit=JournalStats.gross_profit + max(pnl, 0.0),
+                gross_loss=JournalStats.gross_loss + max(-pnl, 0.0),
+                r_trades=JournalStats.r_trades + (0 if r is None else 1),
+                sum_r=JournalStats.sum_r + (r or 0.0),
+                equity=equity,
+                peak_equity=peak,
+                max_drawdown=drawdown,
+                updated_at=datetime.utcnow(),
+            )
+        )
+
+
+def rebuild(db: Session) -> int:
+    """Recompute journal_stats from every closed trade, in close order. Returns the number of trades."""
+    rows = {}
+    count = 0
+    closed = (
+        select(TradeJournal)
+        .where(TradeJournal.status == "closed", TradeJournal.result_pnl.is_not(None))
+        .order_by(TradeJournal.closed_at, TradeJournal.id)
+        .execution_options(yield_per=1000)
+    )
+    for trade in db.execute(closed).scalars():
+        count += 1
+        pnl, r = trade.result_pnl, r_multiple(trade)
+        for key in buckets(trade.symbol, trade.direction):
+            row = rows.setdefault(key, {
+                "symbol": key[0], "direction": key[1], "trades": 0, "wins": 0, "losses": 0,
+                "gross_profit": 0.0, "gross_loss": 0.0, "r_trades": 0, "sum_r": 0.0,
+                "equity": 0.0, "peak_equity": 0.0, "max_drawdown": 0.0,
+            })
+            row["trades"] += 1
+            row["wins"] += pnl > 0
+            row["losses"] += pnl < 0
+            row["gross_profit"] += max(pnl, 0.0)
+            row["gross_loss"] += max(-pnl, 0.0)
+            if r is not None:
+                row["r_trades"] += 1
+                row["sum_r"] += r
+            row["equity"] += pnl
+            row["peak_equity"] = max(row["peak_equity"], row["equity"])
+            row["max_drawdown"] = max(row["max_drawdown"], row["peak_equity"] - row["equity"])
+
+    db.execute(delete(JournalStats))
+    now = datetime.utcnow()
+    if rows:
+        db.execute(insert(JournalStats), [{**row, "updated_at": now} for row in rows.values()])
+    db.commit()
+    return count
+
+
+def to_dict(row: Optional[JournalStats], symbol: str = ALL, direction: str = ALL) -> dict:
+    """Aggregate row -> JournalStatsRead fields. A missing row means no closed trades yet."""
+    if row is None:
+        return {
+            "symbol": symbol, "direction": direction, "trades": 0, "wins": 0, "losses": 0,
+            "win_rate": None, "expectancy": None, "avg_r": None, "profit_factor": None,
+            "net_pnl": 0.0, "max_drawdown": 0.0, "updated_at": None,
+        }
+    return {
+        "symbol": row.symbol,
+        "direction": row.direction,
+        "trades": row.trades,
+        "wins": row.wins,
+        "losses": row.losses,
+        "win_rate": row.wins / row.trades if row.trades else None,
+        "expectancy": (row.gross_profit - row.gross_loss) / row.trades if row.trades else None,
+        "avg_r": row.sum_r / row.r_trades if row.r_trades else None,
+        "profit_factor": row.gross_profit / row.gross_loss if row.gross_loss else None,
+        "net_pnl": row.equity,
+        "max_drawdown": row.max_drawdown,
+        "updated_at": row.updated_at,
+    }
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m services.journal_stats rebuild")
+
+    import database
+
+    database.init_db()
+    db = database.SessionLocal()
+    try:
+        print(f"journal_stats rebuilt from {rebuild(db)} closed trades")
+    finally:
+        db.close()
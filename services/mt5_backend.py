@@ -0,0 +1,54 @@
+import os
+from typing import Any, Optional, Protocol, Tuple
+
+
+class MT5Backend(Protocol):
+    """
+    The part of the MetaTrader5 package API that services/mt5_service.py relies on.
+
+    The real `MetaTrader5` module satisfies it as-is. services/mt5_sim.py provides an
+    in-process simulation with the same calls and constants (TIMEFRAME_*, ORDER_TYPE_*,
+    POSITION_TYPE_*, TRADE_ACTION_*, ORDER_TIME_*, ORDER_FILLING_*, TRADE_RETCODE_*).
+    """
+
+    TRADE_RETCODE_DONE: int
+
+    # ---------- Terminal / session ----------
+    def initialize(self, *args, **kwargs) -> bool: ...
+    def shutdown(self) -> None: ...
+    def last_error(self) -> Tuple[int, str]: ...
+    def terminal_info(self) -> Any: ...
+    def account_info(self) -> Any: ...
+
+    # ---------- Market data ----------
+    def symbols_get(self, group: Optional[str] = None) -> Optional[tuple]: ...
+    def symbol_info(self, symbol: str) -> Any: ...
+    def symbol_info_tick(self, symbol: str) -> Any: ...
+    def symbol_select(self, symbol: str, enable: bool = True) -> bool: ...
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int) -> Any: ...
+
+    # ---------- Trading ----------
+    def positions_get(self, **filters) -> Optional[tuple]: ...
+    def orders_get(self, **filters) -> Optional[tuple]: ...
+    def order_send(self, request: dict) -> Any: ...
+
+
+BACKENDS = ("mt5", "sim")
+
+
+def load_backend(name: Optional[str] = None) -> MT5Backend:
+    """
+    Select the broker backend by name, defaulting to the MT5_BACKEND environment variable.
+    - mt5: the MetaTrader5 terminal package (Windows only)
+    - sim: deterministic simulated terminal for load tests and development on Linux
+    """
+    name = (name or os.getenv("MT5_BACKEND", "mt5")).lower()
+
+    if name == "mt5":
+        import MetaTrader5
+        return MetaTrader5
+    if name == "sim":
+        from services.mt5_sim import SimulatedMT5
+        return SimulatedMT5.from_env()
+
+    raise ValueError(f"Unknown MT5_BACKEND '{name}'. Use one of: {', '.join(BACKENDS)}")
@@ -1,49 +1,195 @@
-from unittest import result
-import MetaTrader5 as mt5
 from datetime import datetime, timezone
-import pandas as pd
 from dotenv import load_dotenv
 from fastapi import HTTPException
 import os
+import threading
 
-from urllib3 import request
+from services.symbol_catalog import SymbolCatalog
+from services.mt5_worker import MT5Worker
+from services.mt5_backend import load_backend
+from services.candle_cache import CandleCache
+
+# The MetaTrader5 module, or the simulated terminal when MT5_BACKEND=sim
+mt5 = load_backend()
 
 def initialize():
     load_dotenv()
-    login = int(os.getenv("MT5_LOGIN"))
+    login = os.getenv("MT5_LOGIN")
     password = os.getenv("MT5_PASSWORD")
     server = os.getenv("MT5_SERVER")
-   
+
+    # Without credentials the terminal keeps its current login (and the simulator needs none)
+    credentials = {"login": int(login), "password": password, "server": server} if login else {}
+
     #print(login, password, server)
     # Always ensure clean start
     mt5.shutdown()
-    if not mt5.initialize(login=login, password=password, server=server):
+    if not mt5.initialize(**credentials):
         raise RuntimeError(f"MT5 initialize failed: {mt5.last_error()}")
     print(f"Connected to {server}")
 
+
+def _terminal_error():
+    """None if the terminal is up and logged in, else why not. Runs on the worker thread."""
+    info = mt5.terminal_info()
+    if info is None or not info.connected:
+        return f"MT5 terminal not responding or not logged in: {mt5.last_error()}"
+    return None
+
+
+class MT5Session:
+    """
+    Owns the single long-lived, logged-in terminal connection.
+
+    start() logs in once; a daemon thread then probes terminal_info() every
+    `probe_interval` seconds and reconnects with exponential backoff when the
+    probe fails. Request handlers only read the connection state.
+    All terminal calls are made on the MT5 worker thread.
+    """
+
+    def __init__(self, worker: MT5Worker, probe_interval: float = 15.0, backoff_initial: float = 1.0, backoff_max: float = 60.0):
+        self.worker = worker
+        self.probe_interval = probe_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+
+        self.connected = False
+        self.last_error = None
+        self.reconnects = 0
+        self.last_probe_at = None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def connect(self):
+        try:
+            self.worker.call(initialize)
+        except Exception as e:
+            self.connected = False
+            self.last_error = str(e)
+            raise
+        self.connected = True
+        self.last_error = None
+
+    def probe(self) -> bool:
+        """
+        Cheap health check: the terminal answers and is connected to the trade server.
+        A probe that raises or times out on the worker counts as disconnected.
+        """
+        try:
+            error = self.worker.call(_terminal_error, timeout=self.probe_interval)
+        except Exception as e:
+            error = f"MT5 health probe failed: {e!r}"
+        self.last_probe_at = datetime.now(timezone.utc)
+        if error is not None:
+            self.connected = False
+            self.last_error = error
+            return False
+        return True
+
+    def start(self):
+        """Log in and start the health-check thread. Never raises; failures are retried in the background."""
+        if self._thread and self._thread.is_alive():
+            return
+        try:
+            self.connect()
+        except Exception as e:
+            print("Warning: MT5 failed to initialize", e)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mt5-session", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.probe_interval)
+            self._thread = None
+        self.worker.call(mt5.shutdown)
+        self.connected = False
+
+    def _run(self):
+        delay = self.backoff_initial
+        while not self._stop.is_set():
+            try:
+                healthy = self.connected and self.probe()
+            except Exception as e:  # never let the health thread die; a dead thread means no reconnects
+                self.connected = False
+                self.last_error = f"MT5 health probe failed: {e!r}"
+                healthy = False
+            if healthy:
+                self._stop.wait(self.probe_interval)
+                continue
+
+            try:
+                self.connect()
+                self.reconnects += 1
+                delay = self.backoff_initial
+                print("MT5 session re-established")
+                self._stop.wait(self.probe_interval)  # a terminal that logs in but fails probes must not spin this loop
+            except Exception as e:
+                print(f"Warning: MT5 reconnect failed, retrying in {delay:.0f}s", e)
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.backoff_max)
+
+    def status(self) -> dict:
+        return {
+            "connected": self.connected,
+            "last_error": self.last_error,
+            "reconnects": self.reconnects,
+            "last_probe_at": self.last_probe_at.isoformat() if self.last_probe_at else None,
+        }
+
+
+# The one thread allowed to touch the MetaTrader5 module
+worker = MT5Worker()
+
+async def run(fn, *args, **kwargs):
+    """Run a function from this module on the MT5 worker thread and await its result."""
+    return await worker.run(fn, *args, **kwargs)
+
+session = MT5Session(
+    worker,
+    probe_interval=float(os.getenv("MT5_PROBE_INTERVAL", "15")),
+    backoff_max=float(os.getenv("MT5_RECONNECT_BACKOFF_MAX", "60")),
+)
+
 def ensure_connection():
-    """Ensure MT5 connection is active."""
-    if not mt5.initialize():
-        raise ConnectionError(f"MT5 initialization failed: {mt5.last_error()}")
-    if not mt5.terminal_info():
-        raise ConnectionError("MT5 terminal not responding or not logged in.")
+    """Ensure MT5 connection is active. The session manager keeps it alive, so this never calls initialize()."""
+    if not session.connected:
+        raise ConnectionError(f"MT5 terminal not connected: {session.last_error}")
     return True
 
-def symbol_exists(symbol: str) -> bool:
-    """Check if a symbol exists on the connected MT5 terminal."""
+def _fetch_symbols():
     ensure_connection()
+    return mt5.symbols_get()
 
-    all_symbols = mt5.symbols_get()
-    if all_symbols is None:
-        raise RuntimeError("Failed to retrieve symbols list. MT5 not initialized or not connected.")
-    return any(s.name == symbol for s in all_symbols)
+def _load_symbols():
+    return worker.call(_fetch_symbols)
 
-def connect():
-    if not mt5.initialize():
-        raise RuntimeError(f"Failed to initialize MT5: {mt5.last_error()}")
+# Symbol index shared by every request; see services/symbol_catalog.py
+symbol_catalog = SymbolCatalog(
+    _load_symbols,
+    ttl=float(os.getenv("MT5_SYMBOL_CATALOG_TTL", "300")),
+    suffixes=tuple(s for s in os.getenv("MT5_SYMBOL_SUFFIXES", "m").split(",") if s),
+)
 
-def disconnect():
-    mt5.shutdown()
+def symbol_exists(symbol: str) -> bool:
+    """Check if a symbol exists on the connected MT5 terminal (served from the symbol catalog)."""
+    return symbol_catalog.exists(symbol)
+
+def resolve_symbol(symbol: str):
+    """Return the broker's name for a symbol (e.g. EURUSD -> EURUSDm), or None if it is not listed."""
+    return symbol_catalog.resolve(symbol)
+
+async def resolve_symbol_async(symbol: str):
+    """
+    Async variant for routes. Once the catalog is loaded this is a dict lookup on
+    the event loop; only the very first load is sent to the MT5 worker.
+    """
+    if not symbol_catalog.loaded:
+        await run(symbol_catalog.refresh)
+    return symbol_catalog.resolve(symbol)
 
 
 def get_account_information():
@@ -52,68 +198,96 @@ def get_account_information():
     Returns a dictionary matching the AccountInfoResponse schema.
     """
     # Ensure MT5 connection is active
-    if not mt5.initialize():
+    try:
+        ensure_connection()
+    except ConnectionError:
         raise HTTPException(status_code=500, detail="Failed to connect to MT5 terminal.")
 
-    try:
-        info = mt5.account_info()
-        if info is None:
-            raise HTTPException(status_code=500, detail="Unable to retrieve account information from MT5.")
+    info = mt5.account_info()
+    if info is None:
+        raise HTTPException(status_code=500, detail="Unable to retrieve account information from MT5.")
 
-        # Return data in the same structure as AccountInfoResponse
-        return {
-            "balance": info.balance,
-            "equity": info.equity,
-            "margin": info.margin,
-            "free_margin": info.margin_free,
-            "margin_level": info.margin_level,
-            "leverage": info.leverage,
-            "currency": info.currency
-        }
-    finally:
-        mt5.shutdown()
+    # Return data in the same structure as AccountInfoResponse
+    return {
+        "balance": info.balance,
+        "equity": info.equity,
+        "margin": info.margin,
+        "free_margin": info.margin_free,
+        "margin_level": info.margin_level,
+        "leverage": info.leverage,
+        "currency": info.currency
+    }
 
-def get_historical_data(symbol: str, candlesticks: int, timeframe: str = "H1"):
-    """Fetch historical candles safely from MT5 and adjust timestamps to local SAST (UTC+2)."""
+TIMEFRAME_MAP = {
+    "1MIN": mt5.TIMEFRAME_M1,
+    "5MIN": mt5.TIMEFRAME_M5,
+    "15MIN": mt5.TIMEFRAME_M15,
+    "30MIN": mt5.TIMEFRAME_M30,
+    "H1": mt5.TIMEFRAME_H1,
+    "H4": mt5.TIMEFRAME_H4,
+    "D1": mt5.TIMEFRAME_D1,
+    "W1": mt5.TIMEFRAME_W1,
+    "MN1": mt5.TIMEFRAME_MN1,
+    # MT5-style names used by the AI agents (AIRequest.timeframes)
+    "M1": mt5.TIMEFRAME_M1,
+    "M5": mt5.TIMEFRAME_M5,
+    "M15": mt5.TIMEFRAME_M15,
+    "M30": mt5.TIMEFRAME_M30,
+}
+
+# Bar length per TIMEFRAME_MAP name (MN1 approximated as 30 days)
+TIMEFRAME_SECONDS = {
+    "1MIN": 60, "5MIN": 300, "15MIN": 900, "30MIN": 1800,
+    "M1": 60, "M5": 300, "M15": 900, "M30": 1800,
+    "H1": 3600, "H4": 14400, "D1": 86400, "W1": 604800, "MN1": 2592000,
+}
+
+def _fetch_rates(symbol: str, timeframe: int, start_pos: int, count: int):
+    rates = mt5.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+    if rates is None:
+        # Symbols hidden from Market Watch return nothing until selected
+        if not mt5.symbol_select(symbol, True):
+            raise ValueError(f"Failed to select symbol {symbol}. Error: {mt5.last_error()}")
+        rates = mt5.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+    return rates
+
+# Per-(symbol, timeframe) candle ring buffers; see services/candle_cache.py
+candle_cache = CandleCache(
+    _fetch_rates,
+    max_bytes=int(os.getenv("CANDLE_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    capacity=int(os.getenv("CANDLE_CACHE_BARS", "1000")),
+    refresh_interval=float(os.getenv("CANDLE_CACHE_REFRESH_SECONDS", "1")),
+)
+
+def get_rates(symbol: str, candlesticks: int, timeframe: str = "H1"):
+    """Newest candles as MT5's numpy structured array (oldest first), served from the candle cache."""
     ensure_connection()
 
-    if not mt5.symbol_select(symbol, True):
-        raise ValueError(f"Failed to select symbol {symbol}. Error: {mt5.last_error()}")
-    print(f'timeframe: {timeframe}, candles: {candlesticks}')
-    timeframe_map = {
-        "1MIN": mt5.TIMEFRAME_M1,
-        "5MIN": mt5.TIMEFRAME_M5,
-        "15MIN": mt5.TIMEFRAME_M15,
-        "30MIN": mt5.TIMEFRAME_M30,
-        "H1": mt5.TIMEFRAME_H1,
-        "H4": mt5.TIMEFRAME_H4,
-        "D1": mt5.TIMEFRAME_D1,
-        "W1": mt5.TIMEFRAME_W1,
-    }
-
-    tf = timeframe_map.get(timeframe.upper())
+    tf = TIMEFRAME_MAP.get(timeframe.upper())
     if tf is None:
         raise ValueError(f"Invalid timeframe: {timeframe}")
 
-    rates = mt5.copy_rates_from_pos(symbol, tf, 0, candlesticks)
+    rates = candle_cache.get(symbol, tf, candlesticks)
     if rates is None:
         raise ValueError(f"No data returned for symbol {symbol}")
+    return rates
 
-    # Broker info (optional diagnostic)
-    symbol_info = mt5.symbol_info(symbol)
-    if symbol_info and symbol_info.time:
-        server_time = symbol_info.time
-        print(f"Broker server time for {symbol}: {datetime.fromtimestamp(server_time)}")
-        #offset_hours = (server_datetime - utc_now.replace(tzinfo=None)).total_seconds() / 360
-    # Convert to DataFrame
-    df = pd.DataFrame(rates)
-
-    # Convert timestamp to datetime and adjust to SAST (UTC+2)
-    df["time"] = pd.to_datetime(df["time"], unit="s", utc=True)  # start as UTC
-    #df["time"] = df["time"].dt.tz_convert("Africa/Johannesburg")  # convert to SAST
-
-    return df[["time", "open", "high", "low", "close", "tick_volume"]]
+def get_timeframe_bundle(symbol: str, timeframes: dict):
+    """Candles for several timeframes of one symbol in a single worker job: {timeframe: rates}."""
+    return {timeframe: get_rates(symbol, candlesticks, timeframe) for timeframe, candlesticks in timeframes.items()}
 
+def get_rates_many(requests):
+    """
+    Candles for many (symbol, timeframe, candlesticks) in a single worker job.
+    Returns {(symbol, timeframe): rates or the ValueError raised for that pair}.
+    """
+    results = {}
+    for symbol, timeframe, candlesticks in requests:
+        try:
+            results[(symbol, timeframe)] = get_rates(symbol, candlesticks, timeframe)
+        except ValueError as e:
+            results[(symbol, timeframe)] = e
+    return results
 
 def get_quote(symbol: str):
     """Fetch current market quote (bid, ask, etc.) for a symbol."""
@@ -131,8 +305,27 @@ def get_quote(symbol: str):
         "time": datetime.fromtimestamp(quote.time).isoformat()
     }
 
+def get_quotes(symbols: list):
+    """
+    Quotes for many symbols in one pass over the terminal (a single worker job).
+    Unknown symbols and missing ticks are reported per symbol instead of failing the batch.
+    """
+    ensure_connection()
+
+    quotes, errors = [], {}
+    for requested in symbols:
+        symbol = resolve_symbol(requested)
+        if symbol is None:
+            errors[requested] = f"Symbol '{requested}' not found on MT5"
+            continue
+        try:
+            quotes.append(get_quote(symbol))
+        except ValueError as e:
+            errors[requested] = str(e)
+    return {"quotes": quotes, "errors": errors}
+
 def open_trade(symbol: str, volume: float, order_type: str, sl: float = None, tp: float = None):
-    connect()
+    ensure_connection()
     order_type_enum = mt5.ORDER_TYPE_BUY if order_type.lower() == "buy" else mt5.ORDER_TYPE_SELL
     price = mt5.symbol_info_tick(symbol).ask if order_type_enum == mt5.ORDER_TYPE_BUY else mt5.symbol_info_tick(symbol).bid
 
@@ -151,7 +344,6 @@ def open_trade(symbol: str, volume: float, order_type: str, sl: float = None, tp
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
     result = mt5.order_send(request)
-    disconnect()
     if result.retcode != mt5.TRADE_RETCODE_DONE:
         raise RuntimeError(f"Trade failed: {result.comment}")
     return {"ticket": result.order, "price": price, "volume": volume, "type": order_type}
@@ -307,7 +499,6 @@ def cancel_pending_order(ticket: int):
         "comment": "cancel_pending",
     }
     result = mt5.order_send(request)
-    print(f'result: {result}'  )
     if not result:
         return {"success": False, "message": f"Failed to cancel order {ticket}"}
     return {"success": True, "message": f"Order {ticket} cancelled successfully"}
@@ -505,18 +696,15 @@ def bulk_close_orders(filter_criteria: dict):
     profit_filter = filter_criteria.get("profit", "all").lower()          # positive, negative, all
 
     # --- Validate symbol ---
-    try:
-        if not symbol_exists(symbol_filter):
-            # Try appending 'm' for brokers like GBPUSDm
-            symbol_filter_with_m = symbol_filter + "m"
-            if symbol_exists(symbol_filter_with_m):
-                symbol_filter = symbol_filter_with_m
-            else:
-                raise HTTPException(status_code=404, detail=f"Symbol '{symbol_filter}' not found on MT5")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-    print(f"Applying filters -> symbol: {symbol_filter}, type: {trade_type_filter}, status: {trade_status_filter}, profit: {profit_filter}")
+    if symbol_filter:
+        try:
+            # Resolves broker suffixes too, e.g. GBPUSD -> GBPUSDm
+            resolved = resolve_symbol(symbol_filter)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if resolved is None:
+            raise HTTPException(status_code=404, detail=f"Symbol '{symbol_filter}' not found on MT5")
+        symbol_filter = resolved
 
     # --- Retrieve trades ---
     open_positions = mt5.positions_get() or []
@@ -536,8 +724,6 @@ def bulk_close_orders(filter_criteria: dict):
 
     # --- Process each trade ---
     for trade_category, trade in target_trades:
-        print(f"\nProcessing ticket: {trade.ticket}, symbol: {trade.symbol}, category: {trade_category}")
-
         # --- Symbol filter ---
         if symbol_filter and trade.symbol != symbol_filter:
             continue
@@ -582,8 +768,6 @@ def bulk_close_orders(filter_criteria: dict):
             result = mt5.order_send(remove_request)
 
         # --- Handle result ---
-        print('\n\nresult_retcode:',(result.keys()))
-        print('\n\nresults:', result.values()  )
         if result and result['message'] == 'success' and mt5.TRADE_RETCODE_DONE == result.get("retcode", mt5.TRADE_RETCODE_DONE):
             closed_count += 1
             results.append(make_trade_result(trade, trade_category, True, "Trade closed successfully"))
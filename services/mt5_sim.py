@@ -0,0 +1,565 @@
+"""
+Deterministic, in-process stand-in for the MetaTrader5 terminal.
+
+Selected with MT5_BACKEND=sim (see services/mt5_backend.py). Prices are a pure
+function of (seed, symbol, time), so two runs with the same seed and clock see the
+same quotes and candles. Market orders fill at the current bid/ask, pending orders
+and SL/TP levels are matched against the simulated price on every call.
+
+Environment:
+    MT5_SIM_SEED            price generator seed (default 42)
+    MT5_SIM_SYMBOLS         comma separated symbol list (default: built-in specs)
+    MT5_SIM_LATENCY_MS      latency added to every terminal call (default 0)
+    MT5_SIM_ORDER_LATENCY_MS  latency for order_send, overrides the default (optional)
+    MT5_SIM_RETCODE         force every order_send to return this retcode (optional)
+    MT5_SIM_REJECT_RATE     fraction of order_send calls rejected with 10006 (default 0)
+    MT5_SIM_BALANCE         starting balance (default 10000)
+"""
+import math
+import os
+import random
+import time
+import zlib
+from collections import namedtuple
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+
+# ---------- MT5 data structures ----------
+
+SymbolInfo = namedtuple("SymbolInfo", "name description digits point spread trade_contract_size trade_mode visible time bid ask")
+Tick = namedtuple("Tick", "time bid ask last volume time_msc flags volume_real")
+TerminalInfo = namedtuple("TerminalInfo", "connected trade_allowed name company path build")
+AccountInfo = namedtuple("AccountInfo", "login server balance equity profit margin margin_free margin_level leverage currency")
+TradePosition = namedtuple("TradePosition", "ticket time type magic volume price_open sl tp price_current profit symbol comment")
+TradeOrder = namedtuple("TradeOrder", "ticket time_setup type magic volume_initial volume_current price_open sl tp price_current symbol comment")
+OrderSendResult = namedtuple("OrderSendResult", "retcode deal order volume price bid ask comment request_id request")
+
+# Same layout as the numpy array returned by MetaTrader5.copy_rates_*
+RATES_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("tick_volume", "<u8"),
+    ("spread", "<i4"),
+    ("real_volume", "<u8"),
+])
+
+SymbolSpec = namedtuple("SymbolSpec", "base digits spread contract_size volatility")
+
+DEFAULT_SYMBOLS = {
+    "EURUSDm": SymbolSpec(1.0850, 5, 10, 100_000, 1.0),
+    "GBPUSDm": SymbolSpec(1.2650, 5, 12, 100_000, 1.2),
+    "USDJPYm": SymbolSpec(151.50, 3, 12, 100_000, 1.1),
+    "AUDUSDm": SymbolSpec(0.6550, 5, 12, 100_000, 1.1),
+    "USDCADm": SymbolSpec(1.3650, 5, 14, 100_000, 0.9),
+    "XAUUSDm": SymbolSpec(2350.0, 2, 20, 100, 1.6),
+    "BTCUSDm": SymbolSpec(65000.0, 2, 1500, 1, 3.0),
+}
+
+
+class SimulatedMT5:
+    """
+    Simulated terminal exposing the MetaTrader5 module API used by mt5_service.
+    Not thread-safe, like the real module; it is only called from the MT5 worker thread.
+    """
+
+    # ---------- Constants (same values as MetaTrader5) ----------
+    TIMEFRAME_M1 = 1
+    TIMEFRAME_M5 = 5
+    TIMEFRAME_M15 = 15
+    TIMEFRAME_M30 = 30
+    TIMEFRAME_H1 = 16385
+    TIMEFRAME_H4 = 16388
+    TIMEFRAME_D1 = 16408
+    TIMEFRAME_W1 = 32769
+    TIMEFRAME_MN1 = 49153
+
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    ORDER_TYPE_BUY_LIMIT = 2
+    ORDER_TYPE_SELL_LIMIT = 3
+    ORDER_TYPE_BUY_STOP = 4
+    ORDER_TYPE_SELL_STOP = 5
+    ORDER_TYPE_BUY_STOP_LIMIT = 6
+    ORDER_TYPE_SELL_STOP_LIMIT = 7
+    ORDER_TYPE_CLOSE_BY = 8
+
+    POSITION_TYPE_BUY = 0
+    POSITION_TYPE_SELL = 1
+
+    TRADE_ACTION_DEAL = 1
+    TRADE_ACTION_PENDING = 5
+    TRADE_ACTION_SLTP = 6
+    TRADE_ACTION_MODIFY = 7
+    TRADE_ACTION_REMOVE = 8
+    TRADE_ACTION_CLOSE_BY = 10
+
+    ORDER_TIME_GTC = 0
+    ORDER_TIME_DAY = 1
+    ORDER_TIME_SPECIFIED = 2
+    ORDER_TIME_SPECIFIED_DAY = 3
+
+    ORDER_FILLING_FOK = 0
+    ORDER_FILLING_IOC = 1
+    ORDER_FILLING_RETURN = 2
+
+    TRADE_RETCODE_REJECT = 10006
+    TRADE_RETCODE_DONE = 10009
+    TRADE_RETCODE_INVALID = 10013
+    TRADE_RETCODE_INVALID_VOLUME = 10014
+    TRADE_RETCODE_INVALID_PRICE = 10015
+    TRADE_RETCODE_INVALID_STOPS = 10016
+    TRADE_RETCODE_NO_MONEY = 10019
+    TRADE_RETCODE_INVALID_ORDER = 10035
+    TRADE_RETCODE_POSITION_CLOSED = 10036
+
+    TIMEFRAME_SECONDS = {
+        TIMEFRAME_M1: 60,
+        TIMEFRAME_M5: 300,
+        TIMEFRAME_M15: 900,
+        TIMEFRAME_M30: 1800,
+        TIMEFRAME_H1: 3600,
+        TIMEFRAME_H4: 14400,
+        TIMEFRAME_D1: 86400,
+        TIMEFRAME_W1: 604800,
+        TIMEFRAME_MN1: 2592000,
+    }
+
+    # Price samples taken inside each bar to derive high/low
+    BAR_SAMPLES = 16
+
+    def __init__(
+        self,
+        symbols: Optional[Dict[str, SymbolSpec]] = None,
+        seed: int = 42,
+        clock: Callable[[], float] = time.time,
+        latency: Optional[Dict[str, float]] = None,
+        retcodes: Optional[Dict[int, int]] = None,
+        reject_rate: float = 0.0,
+        balance: float = 10_000.0,
+        leverage: int = 100,
+        currency: str = "USD",
+    ):
+        """
+        latency:  seconds per call, keyed by method name, with "default" for the rest
+        retcodes: forced order_send retcode per TRADE_ACTION_* (None key = every action)
+        """
+        self.symbols = dict(symbols or DEFAULT_SYMBOLS)
+        self.seed = seed
+        self.clock = clock
+        self.latency = dict(latency or {})
+        self.retcodes = dict(retcodes or {})
+        self.reject_rate = reject_rate
+        self.leverage = leverage
+        self.currency = currency
+
+        self.balance = balance
+        self.positions: Dict[int, dict] = {}
+        self.orders: Dict[int, dict] = {}
+        self.selected = set(self.symbols)
+        self.initialized = False
+
+        self._next_ticket = 1_000_000
+        self._error = (1, "Success")
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_env(cls):
+        names = [s.strip() for s in os.getenv("MT5_SIM_SYMBOLS", "").split(",") if s.strip()]
+        symbols = None
+        if names:
+            fallback = SymbolSpec(1.0, 5, 10, 100_000, 1.0)
+            symbols = {name: DEFAULT_SYMBOLS.get(name, fallback) for name in names}
+
+        latency = {"default": float(os.getenv("MT5_SIM_LATENCY_MS", "0")) / 1000}
+        if os.getenv("MT5_SIM_ORDER_LATENCY_MS"):
+            latency["order_send"] = float(os.getenv("MT5_SIM_ORDER_LATENCY_MS")) / 1000
+
+        retcodes = {}
+        if os.getenv("MT5_SIM_RETCODE"):
+            retcodes[None] = int(os.getenv("MT5_SIM_RETCODE"))
+
+        return cls(
+            symbols=symbols,
+            seed=int(os.getenv("MT5_SIM_SEED", "42")),
+            latency=latency,
+            retcodes=retcodes,
+            reject_rate=float(os.getenv("MT5_SIM_REJECT_RATE", "0")),
+            balance=float(os.getenv("MT5_SIM_BALANCE", "10000")),
+        )
+
+    # ======================================================================
+    # Synthetic price generator
+    # ======================================================================
+
+    def _phase(self, symbol: str) -> float:
+        return (zlib.crc32(f"{self.seed}:{symbol}".encode()) % 10_000) / 10_000 * 2 * math.pi
+
+    def _mid(self, symbol: str, t):
+        """
+        Mid price at time t (seconds, scalar or array): a few overlapping waves plus
+        per-second hash noise. Pure function of (seed, symbol, t).
+        """
+        spec = self.symbols[symbol]
+        phase = self._phase(symbol)
+        t = np.asarray(t, dtype=np.float64)
+
+        noise = np.sin(np.floor(t) * 12.9898 + phase * 78.233) * 43758.5453
+        noise = noise - np.floor(noise) - 0.5
+
+        move = (
+            0.0150 * np.sin(2 * np.pi * t / 432_000 + phase)
+            + 0.0040 * np.sin(2 * np.pi * t / 21_600 + 2 * phase)
+            + 0.0008 * np.sin(2 * np.pi * t / 1_200 + 3 * phase)
+            + 0.0003 * noise
+        )
+        return spec.base * (1 + spec.volatility * move)
+
+    def _bid_ask(self, symbol: str, t: float):
+        spec = self.symbols[symbol]
+        point = 10 ** -spec.digits
+        bid = round(float(self._mid(symbol, t)) - spec.spread * point / 2, spec.digits)
+        ask = round(bid + spec.spread * point, spec.digits)
+        return bid, ask
+
+    def _rates(self, symbol: str, timeframe: int, start_pos: int, count: int):
+        seconds = self.TIMEFRAME_SECONDS[timeframe]
+        now = self.clock()
+        current_bar = math.floor(now / seconds) * seconds
+
+        # Oldest bar first, like MT5
+        starts = current_bar - seconds * np.arange(start_pos + count - 1, start_pos - 1, -1, dtype=np.int64)
+        ends = np.minimum(starts + seconds - 1, now)
+
+        offsets = np.linspace(0.0, 1.0, self.BAR_SAMPLES)
+        samples = self._mid(symbol, starts[:, None] + (ends - starts)[:, None] * offsets[None, :])
+
+        spec = self.symbols[symbol]
+        volume_seed = self._mid(symbol, starts + 0.5) * 1e4
+        rates = np.zeros(count, dtype=RATES_DTYPE)
+        rates["time"] = starts
+        rates["open"] = np.round(samples[:, 0], spec.digits)
+        rates["close"] = np.round(samples[:, -1], spec.digits)
+        rates["high"] = np.round(samples.max(axis=1), spec.digits)
+        rates["low"] = np.round(samples.min(axis=1), spec.digits)
+        rates["tick_volume"] = (50 + (volume_seed % 1) * 200 * max(1, seconds // 300)).astype(np.uint64)
+        rates["spread"] = spec.spread
+        return rates
+
+    # ======================================================================
+    # Order matching
+    # ======================================================================
+
+    def _ticket(self) -> int:
+        self._next_ticket += 1
+        return self._next_ticket
+
+    def _profit(self, position: dict, bid: float, ask: float) -> float:
+        contract = self.symbols[position["symbol"]].contract_size
+        if position["type"] == self.POSITION_TYPE_BUY:
+            return (bid - position["price_open"]) * position["volume"] * contract
+        return (position["price_open"] - ask) * position["volume"] * contract
+
+    def _open_position(self, symbol: str, order_type: int, volume: float, price: float, sl, tp, magic: int, comment: str) -> int:
+        ticket = self._ticket()
+        self.positions[ticket] = {
+            "ticket": ticket,
+            "time": int(self.clock()),
+            "type": self.POSITION_TYPE_BUY if order_type in (self.ORDER_TYPE_BUY, self.ORDER_TYPE_BUY_LIMIT, self.ORDER_TYPE_BUY_STOP) else self.POSITION_TYPE_SELL,
+            "magic": magic,
+            "volume": volume,
+            "price_open": price,
+            "sl": sl or 0.0,
+            "tp": tp or 0.0,
+            "symbol": symbol,
+            "comment": comment,
+        }
+        return ticket
+
+    def _close_position(self, ticket: int, bid: float, ask: float) -> float:
+        position = self.positions.pop(ticket)
+        profit = self._profit(position, bid, ask)
+        self.balance += profit
+        return bid if position["type"] == self.POSITION_TYPE_BUY else ask
+
+    def _match(self):
+        """Fill pending orders and hit SL/TP levels at the current simulated price."""
+        now = self.clock()
+        prices = {}
+
+        def price(symbol):
+            if symbol not in prices:
+                prices[symbol] = self._bid_ask(symbol, now)
+            return prices[symbol]
+
+        for ticket, order in list(self.orders.items()):
+            bid, ask = price(order["symbol"])
+            level, kind = order["price_open"], order["type"]
+            triggered = (
+                (kind == self.ORDER_TYPE_BUY_LIMIT and ask <= level)
+                or (kind == self.ORDER_TYPE_SELL_LIMIT and bid >= level)
+                or (kind == self.ORDER_TYPE_BUY_STOP and ask >= level)
+                or (kind == self.ORDER_TYPE_SELL_STOP and bid <= level)
+            )
+            if triggered:
+                del self.orders[ticket]
+                self._open_position(order["symbol"], kind, order["volume"], level, order["sl"], order["tp"], order["magic"], order["comment"])
+
+        for ticket, position in list(self.positions.items()):
+            bid, ask = price(position["symbol"])
+            sl, tp = position["sl"], position["tp"]
+            if position["type"] == self.POSITION_TYPE_BUY:
+                hit = (sl and bid <= sl) or (tp and bid >= tp)
+            else:
+                hit = (sl and ask >= sl) or (tp and ask <= tp)
+            if hit:
+                self._close_position(ticket, bid, ask)
+
+    # ======================================================================
+    # MetaTrader5 API
+    # ======================================================================
+
+    def _call(self, name: str):
+        delay = self.latency.get(name, self.latency.get("default", 0.0))
+        if delay:
+            time.sleep(delay)
+        self._error = (1, "Success")
+
+    def _fail(self, code: int, message: str):
+        self._error = (code, message)
+        return None
+
+    # ---------- Terminal / session ----------
+
+    def initialize(self, *args, **kwargs) -> bool:
+        self._call("initialize")
+        self.initialized = True
+        return True
+
+    def shutdown(self):
+        self._call("shutdown")
+        self.initialized = False
+
+    def last_error(self):
+        return self._error
+
+    def terminal_info(self):
+        self._call("terminal_info")
+        if not self.initialized:
+            return self._fail(-10004, "No IPC connection")
+        return TerminalInfo(True, True, "Simulated MT5", "Simulator", "", 0)
+
+    def account_info(self):
+        self._call("account_info")
+        if not self.initialized:
+            return self._fail(-10004, "No IPC connection")
+        self._match()
+        now = self.clock()
+        profit = sum(self._profit(p, *self._bid_ask(p["symbol"], now)) for p in self.positions.values())
+        margin = sum(
+            p["volume"] * self.symbols[p["symbol"]].contract_size * p["price_open"] / self.leverage
+            for p in self.positions.values()
+        )
+        equity = self.balance + profit
+        return AccountInfo(
+            login=0,
+            server="Simulator",
+            balance=round(self.balance, 2),
+            equity=round(equity, 2),
+            profit=round(profit, 2),
+            margin=round(margin, 2),
+            margin_free=round(equity - margin, 2),
+            margin_level=round(equity / margin * 100, 2) if margin else 0.0,
+            leverage=self.leverage,
+            currency=self.currency,
+        )
+
+    # ---------- Market data ----------
+
+    def symbols_get(self, group: Optional[str] = None):
+        self._call("symbols_get")
+        return tuple(self._symbol_info(name) for name in self.symbols)
+
+    def _symbol_info(self, symbol: str):
+        spec = self.symbols[symbol]
+        now = self.clock()
+        bid, ask = self._bid_ask(symbol, now)
+        return SymbolInfo(
+            name=symbol,
+            description=symbol,
+            digits=spec.digits,
+            point=10 ** -spec.digits,
+            spread=spec.spread,
+            trade_contract_size=spec.contract_size,
+            trade_mode=4,
+            visible=symbol in self.selected,
+            time=int(now),
+            bid=bid,
+            ask=ask,
+        )
+
+    def symbol_info(self, symbol: str):
+        self._call("symbol_info")
+        if symbol not in self.symbols:
+            return self._fail(-1, f"Unknown symbol {symbol}")
+        return self._symbol_info(symbol)
+
+    def symbol_info_tick(self, symbol: str):
+        self._call("symbol_info_tick")
+        if symbol not in self.symbols:
+            return self._fail(-1, f"Unknown symbol {symbol}")
+        now = self.clock()
+        bid, ask = self._bid_ask(symbol, now)
+        return Tick(int(now), bid, ask, 0.0, 0, int(now * 1000), 6, 0.0)
+
+    def symbol_select(self, symbol: str, enable: bool = True) -> bool:
+        self._call("symbol_select")
+        if symbol not in self.symbols:
+            self._fail(-1, f"Unknown symbol {symbol}")
+            return False
+        if enable:
+            self.selected.add(symbol)
+        else:
+            self.selected.discard(symbol)
+        return True
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int):
+        self._call("copy_rates_from_pos")
+        if symbol not in self.symbols:
+            return self._fail(-1, f"Unknown symbol {symbol}")
+        if timeframe not in self.TIMEFRAME_SECONDS:
+            return self._fail(-2, f"Invalid timeframe {timeframe}")
+        return self._rates(symbol, timeframe, start_pos, count)
+
+    # ---------- Trading ----------
+
+    def positions_get(self, symbol: Optional[str] = None, ticket: Optional[int] = None, group: Optional[str] = None):
+        self._call("positions_get")
+        self._match()
+        now = self.clock()
+        result = []
+        for position in self.positions.values():
+            if ticket is not None and position["ticket"] != ticket:
+                continue
+            if symbol is not None and position["symbol"] != symbol:
+                continue
+            bid, ask = self._bid_ask(position["symbol"], now)
+            result.append(TradePosition(
+                price_current=bid if position["type"] == self.POSITION_TYPE_BUY else ask,
+                profit=round(self._profit(position, bid, ask), 2),
+                **position,
+            ))
+        return tuple(result)
+
+    def orders_get(self, symbol: Optional[str] = None, ticket: Optional[int] = None, group: Optional[str] = None):
+        self._call("orders_get")
+        self._match()
+        now = self.clock()
+        result = []
+        for order in self.orders.values():
+            if ticket is not None and order["ticket"] != ticket:
+                continue
+            if symbol is not None and order["symbol"] != symbol:
+                continue
+            bid, ask = self._bid_ask(order["symbol"], now)
+            result.append(TradeOrder(
+                volume_current=order["volume"],
+                volume_initial=order["volume"],
+                price_current=ask if order["type"] in (self.ORDER_TYPE_BUY_LIMIT, self.ORDER_TYPE_BUY_STOP) else bid,
+                **{k: v for k, v in order.items() if k != "volume"},
+            ))
+        return tuple(result)
+
+    def order_send(self, request: dict):
+        self._call("order_send")
+        self._match()
+
+        action = request.get("action")
+        symbol = request.get("symbol")
+        volume = float(request.get("volume") or 0.0)
+        now = self.clock()
+        bid, ask = self._bid_ask(symbol, now) if symbol in self.symbols else (0.0, 0.0)
+
+        def result(retcode: int, comment: str, order: int = 0, deal: int = 0, price: float = 0.0):
+            return OrderSendResult(retcode, deal, order, volume, price, bid, ask, comment, 0, request)
+
+        forced = self.retcodes.get(action, self.retcodes.get(None))
+        if forced is not None and forced != self.TRADE_RETCODE_DONE:
+            return result(forced, "Simulated retcode")
+        if self.reject_rate and self._rng.random() < self.reject_rate:
+            return result(self.TRADE_RETCODE_REJECT, "Simulated reject")
+
+        if action == self.TRADE_ACTION_DEAL:
+            if symbol not in self.symbols:
+                return result(self.TRADE_RETCODE_INVALID, "Invalid symbol")
+            position_ticket = request.get("position")
+            if position_ticket:
+                if position_ticket not in self.positions:
+                    return result(self.TRADE_RETCODE_POSITION_CLOSED, "Position doesn't exist")
+                price = self._close_position(position_ticket, bid, ask)
+                return result(self.TRADE_RETCODE_DONE, "Request executed", order=self._ticket(), deal=self._ticket(), price=price)
+            if volume <= 0:
+                return result(self.TRADE_RETCODE_INVALID_VOLUME, "Invalid volume")
+            order_type = request.get("type")
+            if order_type not in (self.ORDER_TYPE_BUY, self.ORDER_TYPE_SELL):
+                return result(self.TRADE_RETCODE_INVALID, "Invalid order type")
+            price = ask if order_type == self.ORDER_TYPE_BUY else bid
+            ticket = self._open_position(symbol, order_type, volume, price, request.get("sl"), request.get("tp"), request.get("magic", 0), request.get("comment", ""))
+            return result(self.TRADE_RETCODE_DONE, "Request executed", order=ticket, deal=self._ticket(), price=price)
+
+        if action == self.TRADE_ACTION_PENDING:
+            if symbol not in self.symbols:
+                return result(self.TRADE_RETCODE_INVALID, "Invalid symbol")
+            if volume <= 0:
+                return result(self.TRADE_RETCODE_INVALID_VOLUME, "Invalid volume")
+            order_type, level = request.get("type"), float(request.get("price") or 0.0)
+            valid = (
+                (order_type == self.ORDER_TYPE_BUY_LIMIT and level < ask)
+                or (order_type == self.ORDER_TYPE_SELL_LIMIT and level > bid)
+                or (order_type == self.ORDER_TYPE_BUY_STOP and level > ask)
+                or (order_type == self.ORDER_TYPE_SELL_STOP and level < bid)
+            )
+            if not valid:
+                return result(self.TRADE_RETCODE_INVALID_PRICE, "Invalid price")
+            ticket = self._ticket()
+            self.orders[ticket] = {
+                "ticket": ticket,
+                "time_setup": int(now),
+                "type": order_type,
+                "magic": request.get("magic", 0),
+                "volume": volume,
+                "price_open": level,
+                "sl": request.get("sl") or 0.0,
+                "tp": request.get("tp") or 0.0,
+                "symbol": symbol,
+                "comment": request.get("comment", ""),
+            }
+            return result(self.TRADE_RETCODE_DONE, "Request executed", order=ticket, price=level)
+
+        if action == self.TRADE_ACTION_SLTP:
+            position = self.positions.get(request.get("position"))
+            if position is None:
+                return result(self.TRADE_RETCODE_POSITION_CLOSED, "Position doesn't exist")
+            position["sl"] = request.get("sl") or 0.0
+            position["tp"] = request.get("tp") or 0.0
+            return result(self.TRADE_RETCODE_DONE, "Request executed", order=position["ticket"])
+
+        if action == self.TRADE_ACTION_MODIFY:
+            order = self.orders.get(request.get("order"))
+            if order is None:
+                return result(self.TRADE_RETCODE_INVALID_ORDER, "Invalid order")
+            for field, key in (("price_open", "price"), ("sl", "sl"), ("tp", "tp"), ("volume", "volume")):
+                if request.get(key) is not None:
+                    order[field] = float(request[key])
+            return result(self.TRADE_RETCODE_DONE, "Request executed", order=order["ticket"], price=order["price_open"])
+
+        if action == self.TRADE_ACTION_REMOVE:
+            if self.orders.pop(request.get("order"), None) is None:
+                return result(self.TRADE_RETCODE_INVALID_ORDER, "Invalid order")
+            return result(self.TRADE_RETCODE_DONE, "Request executed", order=request.get("order"))
+
+        return result(self.TRADE_RETCODE_INVALID, "Unsupported trade action")
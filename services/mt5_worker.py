@@ -0,0 +1,118 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MT5Worker:
+    """
+    Single thread that owns the MetaTrader5 terminal.
+
+    The MetaTrader5 module is global and not thread-safe, so every terminal call
+    is queued here and executed one at a time on the same thread. Async routes
+    await `run()`; background threads block on `call()`.
+    """
+
+    _STOP = object()
+
+    def __init__(self, name: str = "mt5-worker"):
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.completed = 0
+        self.failed = 0
+        self.last_wait_ms = 0.0
+        self.max_queue_depth = 0
+
+    # ---------- Lifecycle ----------
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join(timeout=timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def on_worker_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    # ---------- Submitting jobs ----------
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) for the worker thread and return a concurrent Future."""
+        future = Future()
+
+        # Jobs that submit more work (e.g. a symbol catalog load) run inline instead of deadlocking
+        if self.on_worker_thread():
+            future.set_running_or_notify_cancel()
+            self._execute(future, fn, args, kwargs)
+            return future
+
+        self.start()
+        self._queue.put((future, fn, args, kwargs, time.perf_counter()))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return future
+
+    def call(self, fn, *args, timeout: float = None, **kwargs):
+        """Blocking submit, for threads other than the event loop."""
+        return self.submit(fn, *args, **kwargs).result(timeout=timeout)
+
+    async def run(self, fn, *args, **kwargs):
+        """Awaitable submit for async routes. Cancelling the await drops the job if it has not started yet."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    # ---------- Worker loop ----------
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            future, fn, args, kwargs, queued_at = item
+            self.last_wait_ms = (time.perf_counter() - queued_at) * 1000
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._execute(future, fn, args, kwargs)
+
+    def _execute(self, future: Future, fn, args, kwargs):
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.failed += 1
+            future.set_exception(e)
+        else:
+            self.completed += 1
+            future.set_result(result)
+
+    # ---------- Metrics ----------
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "last_wait_ms": round(self.last_wait_ms, 3),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
@@ -0,0 +1,99 @@
+"""
+Content-addressed, compressed storage for journal snapshots (table snapshot_blobs).
+
+A blob's key is the sha256 of its uncompressed text, so identical snapshots are
+stored once however many trades reference them. trade_journal keeps only the key
+(snapshot_ref / sentiment_ref); the text is loaded when a caller asks for it.
+"""
+import asyncio
+import hashlib
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import dialect_insert
+from models import SnapshotBlob
+
+try:
+    import zstandard
+except ImportError:  # optional: falls back to zlib
+    zstandard = None
+
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+# Codec for new blobs; every blob records its own codec, so switching is safe
+CODEC = "zstd" if zstandard is not None else "zlib"
+
+
+def compress(raw: bytes, codec: str = CODEC) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Snapshot blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def blob_row(text: str) -> dict:
+    raw = text.encode()
+    return {
+        "hash": hashlib.sha256(raw).hexdigest(),
+        "codec": CODEC,
+        "size": len(raw),
+        "data": compress(raw),
+        "created_at": datetime.utcnow(),
+    }
+
+
+def _insert(db):
+    # The hash is the primary key: storing a snapshot that already exists is a no-op
+    return dialect_insert(db, SnapshotBlob).on_conflict_do_nothing(index_elements=["hash"])
+
+
+def _decode(rows) -> Dict[str, str]:
+    return {row.hash: decompress(row.data, row.codec).decode() for row in rows}
+
+
+def put(db: Session, text: Optional[str]) -> Optional[str]:
+    """Store `text` (deduplicated) in the caller's transaction and return its ref."""
+    if text is None:
+        return None
+    row = blob_row(text)
+    db.execute(_insert(db).values(**row))
+    return row["hash"]
+
+
+async def put_async(db: AsyncSession, text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    row = blob_row(text)
+    await db.execute(_insert(db).values(**row))
+    return row["hash"]
+
+
+async def put_many_async(db: AsyncSession, texts: List[Optional[str]]) -> List[Optional[str]]:
+    """Store many texts in one executemany (compressed off the event loop) and return their refs in order."""
+    rows = await asyncio.to_thread(lambda: [None if text is None else blob_row(text) for text in texts])
+    unique = list({row["hash"]: row for row in rows if row is not None}.values())
+    if unique:
+        await db.execute(_insert(db), unique)
+    return [None if row is None else row["hash"] for row in rows]
+
+
+async def load_async(db: AsyncSession, refs: Iterable[Optional[str]]) -> Dict[str, str]:
+    wanted = {ref for ref in refs if ref}
+    if not wanted:
+        return {}
+    result = await db.execute(select(SnapshotBlob).where(SnapshotBlob.hash.in_(wanted)))
+    return _decode(result.scalars())
@@ -0,0 +1,127 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+
+class SymbolCatalog:
+    """
+    In-memory index of the symbols offered by the MT5 terminal.
+
+    - symbols are kept in a dict keyed by name, so lookups are O(1)
+    - broker suffix resolution (EURUSD -> EURUSDm) is memoized, and names match
+      case-insensitively because routes upper-case what clients send (EURUSDM -> EURUSDm)
+    - the index is reloaded in the background when the TTL expires or after a miss
+    Only the very first lookup waits for the terminal.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Optional[Iterable]],
+        ttl: float = 300.0,
+        suffixes: Iterable[str] = ("m",),
+        miss_refresh_interval: float = 30.0,
+    ):
+        self._loader = loader
+        self.ttl = ttl
+        self.suffixes = tuple(suffixes)
+        self.miss_refresh_interval = miss_refresh_interval
+
+        self._symbols: Dict[str, object] = {}
+        self._by_upper: Dict[str, str] = {}
+        self._aliases: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    # ---------- Loading ----------
+
+    def refresh(self):
+        """Reload the full symbol list from the terminal and rebuild the index."""
+        symbols = self._loader()
+        if symbols is None:
+            raise RuntimeError("Failed to retrieve symbols list. MT5 not initialized or not connected.")
+
+        index = {s.name: s for s in symbols}
+        by_upper = {}
+        for name in index:
+            by_upper.setdefault(name.upper(), name)
+        with self._lock:
+            self._symbols = index
+            self._by_upper = by_upper
+            self._aliases = {}
+            self._loaded_at = time.monotonic()
+        return len(index)
+
+    def refresh_in_background(self):
+        """Start a reload on a daemon thread unless one is already running."""
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="symbol-catalog-refresh", daemon=True).start()
+        return True
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print("Warning: symbol catalog refresh failed", e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _age(self) -> Optional[float]:
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    def _ensure_loaded(self):
+        age = self._age()
+        if age is None:
+            self.refresh()
+        elif age > self.ttl:
+            self.refresh_in_background()
+
+    # ---------- Lookups ----------
+
+    def get(self, name: str):
+        """Return the cached symbol info for an exact name, or None."""
+        self._ensure_loaded()
+        return self._symbols.get(name)
+
+    def exists(self, name: str) -> bool:
+        self._ensure_loaded()
+        return name in self._symbols
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        Map a requested symbol to the name the broker uses.
+        Tries the exact name first, then each configured suffix (EURUSD -> EURUSDm),
+        each exactly and then ignoring case.
+        Returns None if nothing matches.
+        """
+        self._ensure_loaded()
+
+        alias = self._aliases.get(name)
+        if alias is not None:
+            return alias
+
+        symbols, by_upper = self._symbols, self._by_upper
+        for candidate in (name, *(name + suffix for suffix in self.suffixes)):
+            match = candidate if candidate in symbols else by_upper.get(candidate.upper())
+            if match is not None:
+                self._aliases[name] = match
+                return match
+
+        # The broker may have listed the symbol since our last load
+        age = self._age()
+        if age is not None and age > self.miss_refresh_interval:
+            self.refresh_in_background()
+        return None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def __len__(self):
+        return len(self._symbols)
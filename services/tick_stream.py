@@ -0,0 +1,130 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from services import mt5_service
+
+
+class TickSubscriber:
+    """
+    One streaming client. Holds only the newest tick per symbol: if the client
+    reads slower than ticks arrive, older ticks are overwritten instead of queued.
+    """
+
+    def __init__(self):
+        self.symbols: Set[str] = set()
+        self._pending: Dict[str, dict] = {}
+        self._ready = asyncio.Event()
+        # Last bid/ask sent to this client, per symbol
+        self._sent: Dict[str, tuple] = {}
+
+    def push(self, symbol: str, tick: dict):
+        self._pending[symbol] = tick
+        self._ready.set()
+
+    async def next_batch(self) -> Dict[str, dict]:
+        await self._ready.wait()
+        self._ready.clear()
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def delta(self, symbol: str, tick: dict) -> Optional[dict]:
+        """The fields of `tick` that changed since the last message to this client, or None."""
+        previous = self._sent.get(symbol)
+        current = (tick["bid"], tick["ask"])
+        if previous == current:
+            return None
+        self._sent[symbol] = current
+
+        message = {"type": "tick", "symbol": symbol, "time": tick["time"]}
+        if previous is None or previous[0] != current[0]:
+            message["bid"] = tick["bid"]
+        if previous is None or previous[1] != current[1]:
+            message["ask"] = tick["ask"]
+        return message
+
+    def forget(self, symbol: str):
+        self._pending.pop(symbol, None)
+        self._sent.pop(symbol, None)
+
+
+class TickHub:
+    """
+    Fans ticks out to streaming clients with exactly one poller task per subscribed
+    symbol, however many clients watch it. A poller publishes only when bid or ask
+    changed and stops when its last subscriber leaves.
+    """
+
+    def __init__(self, fetch_tick: Callable[[str], Awaitable[dict]], interval: float = 0.25):
+        self._fetch_tick = fetch_tick
+        self.interval = interval
+        self._subscribers: Dict[str, Set[TickSubscriber]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._last: Dict[str, dict] = {}
+
+    def subscribe(self, subscriber: TickSubscriber, symbols: Iterable[str]):
+        for symbol in symbols:
+            subscriber.symbols.add(symbol)
+            self._subscribers.setdefault(symbol, set()).add(subscriber)
+            if symbol not in self._pollers:
+                self._pollers[symbol] = asyncio.create_task(self._poll(symbol), name=f"tick-poller-{symbol}")
+            elif symbol in self._last:
+                # Late joiners get the current price without waiting for the next change
+                subscriber.push(symbol, self._last[symbol])
+
+    def unsubscribe(self, subscriber: TickSubscriber, symbols: Optional[Iterable[str]] = None):
+        for symbol in list(subscriber.symbols if symbols is None else symbols):
+            subscriber.symbols.discard(symbol)
+            subscriber.forget(symbol)
+            watchers = self._subscribers.get(symbol)
+            if watchers is None:
+                continue
+            watchers.discard(subscriber)
+            if not watchers:
+                del self._subscribers[symbol]
+                self._last.pop(symbol, None)
+                poller = self._pollers.pop(symbol, None)
+                if poller:
+                    poller.cancel()
+
+    async def _poll(self, symbol: str):
+        last_quote = None
+        while True:
+            try:
+                tick = await self._fetch_tick(symbol)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Warning: tick poll failed for {symbol}", e)
+                await asyncio.sleep(self.interval * 4)
+                continue
+
+            quote = (tick["bid"], tick["ask"])
+            if quote != last_quote:
+                last_quote = quote
+                self._last[symbol] = tick
+                for subscriber in self._subscribers.get(symbol, ()):
+                    subscriber.push(symbol, tick)
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        pollers = list(self._pollers.values())
+        for poller in pollers:
+            poller.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+        self._pollers.clear()
+        self._subscribers.clear()
+        self._last.clear()
+
+    def stats(self) -> dict:
+        return {
+            "pollers": len(self._pollers),
+            "subscriptions": sum(len(s) for s in self._subscribers.values()),
+        }
+
+
+async def _fetch_tick(symbol: str) -> dict:
+    return await mt5_service.run(mt5_service.get_quote, symbol)
+
+
+tick_hub = TickHub(_fetch_tick, interval=float(os.getenv("TICK_STREAM_INTERVAL_MS", "250")) / 1000)
@@ -0,0 +1,51 @@
+import numpy as np
+
+
+def trend_bias(close: np.ndarray, high: np.ndarray, low: np.ndarray) -> dict:
+    """
+    The /bias/compute heuristic on numpy columns (same order as the candles given):
+    slope over the window, direction of the last 3 closes, and whether the last
+    candle made a new high / low. Returns { bias, confidence, reason }.
+    """
+    n = len(close)
+    if n < 3:
+        return {"bias": "neutral", "confidence": 40, "reason": "insufficient data"}
+
+    # slope over entire window
+    slope = float(close[-1] - close[0]) / max(1, n)
+    # recent direction using last 3 closes
+    changes = np.diff(close[-3:])
+    rise_count = int(np.count_nonzero(changes > 0))
+    fall_count = int(np.count_nonzero(changes < 0))
+
+    # HH/HL vs LL/LH detection
+    hh = bool(high[-1] > high[:-1].max())
+    ll = bool(low[-1] < low[:-1].min())
+
+    if slope > 0 and rise_count >= 2:
+        bias = "bullish"
+        confidence = min(95, 60 + int(abs(slope) * 1000))
+        reason = "Upward slope and recent higher closes"
+    elif slope < 0 and fall_count >= 2:
+        bias = "bearish"
+        confidence = min(95, 60 + int(abs(slope) * 1000))
+        reason = "Downward slope and recent lower closes"
+    else:
+        bias = "neutral"
+        confidence = 40
+        reason = "No clear slope; mixed closes"
+
+    # strengthen confidence if HH/HL or LL/LH obvious
+    if bias == "bullish" and hh:
+        confidence = min(100, confidence + 10)
+        reason += "; detected higher high"
+    if bias == "bearish" and ll:
+        confidence = min(100, confidence + 10)
+        reason += "; detected lower low"
+
+    return {"bias": bias, "confidence": confidence, "reason": reason}
+
+
+def trend_bias_rates(rates: np.ndarray) -> dict:
+    """trend_bias() straight from an MT5 rates array (oldest candle first)."""
+    return trend_bias(rates["close"], rates["high"], rates["low"])
@@ -0,0 +1,59 @@
+"""
+Test setup: the simulated MT5 backend and a throwaway SQLite database.
+
+The environment is set before any repo module is imported, so database.py and
+mt5_service pick it up at import time. Tests that touch the schema get their own
+database file through the `engine` / `db` fixtures.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["MT5_BACKEND"] = "sim"
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ai-backend-tests-'), 'test.db')}"
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import database
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def engine(db_url):
+    """Engine on an empty database migrated to the latest schema version."""
+    engine = database.make_engine(db_url)
+    database.init_db(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = Session(engine, autoflush=False)
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def run_async(engine, db_url):
+    """run_async(body) runs `await body(async_session)` on the same database as `db`."""
+    def run(body):
+        async def main():
+            async_engine = database.make_async_engine(db_url)
+            try:
+                async with AsyncSession(async_engine, autoflush=False, expire_on_commit=False) as session:
+                    return await body(session)
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
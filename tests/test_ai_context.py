@@ -0,0 +1,33 @@
+import asyncio
+
+import numpy as np
+
+import database
+from services import ai_context, mt5_service
+from services.mt5_sim import RATES_DTYPE
+
+
+def test_database_reads_do_not_wait_for_the_candles(monkeypatch):
+    database.init_db()
+    rates = np.zeros(3, dtype=RATES_DTYPE)
+    rates["time"] = [1_700_000_000, 1_700_003_600, 1_700_007_200]
+    checked_out = []
+
+    async def slow_candles(fn, symbol, timeframes):
+        await asyncio.sleep(0.2)  # the MT5 worker is busy
+        checked_out.append(database.async_engine.pool.checkedout())
+        return {tf: rates for tf in timeframes}
+
+    monkeypatch.setattr(mt5_service, "run", slow_candles)
+
+    async def main():
+        try:
+            return await ai_context.assemble_model_payload(None, "EURUSD", "EURUSDm", timeframes={"H1": 3})
+        finally:
+            await database.async_engine.dispose()
+
+    payload = asyncio.run(main())
+    assert checked_out == [0]
+    assert payload["symbol"] == "EURUSDm"
+    assert payload["journal_recent"] == []
+    assert len(payload["timeframes"]["H1"]["historical_data"]) == 3
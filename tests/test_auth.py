@@ -0,0 +1,38 @@
+import pytest
+from fastapi import HTTPException
+
+import auth
+import models
+from schemas import TokenCreate
+
+
+@pytest.fixture
+def token(db):
+    auth.token_cache.clear()
+    user = models.User(username="bot", hashed_password="x", role="admin")
+    db.add(user)
+    db.commit()
+    yield auth.create_token(TokenCreate(username="bot", name="test"), db)["token"]
+    auth.token_cache.clear()
+
+
+def test_only_the_hash_is_stored(db, token):
+    stored = db.query(models.Token).one()
+    assert stored.token_hash == auth.hash_token(token) != token
+
+
+def test_cache_is_keyed_by_the_stored_hash(db, token, run_async):
+    async def authenticate(session):
+        return await auth.get_current_user(x_api_key=token, db=session)
+
+    assert run_async(authenticate).username == "bot"
+    assert auth.token_cache.get(auth.hash_token(token)).username == "bot"
+    hits = auth.token_cache.hits
+    assert run_async(authenticate).username == "bot"
+    assert auth.token_cache.hits == hits + 1
+
+    auth.revoke_token(token, db)
+    assert auth.token_cache.get(auth.hash_token(token)) is None
+    with pytest.raises(HTTPException) as raised:
+        run_async(authenticate)
+    assert raised.value.status_code == 403
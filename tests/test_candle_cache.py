@@ -0,0 +1,144 @@
+import numpy as np
+
+from services.candle_cache import CandleCache
+from services.mt5_sim import RATES_DTYPE
+
+H1 = 3600
+
+
+class Terminal:
+    """copy_rates_from_pos over an in-memory history that tests can extend tick by tick."""
+
+    def __init__(self, bars: int = 300):
+        self.rates = np.zeros(0, dtype=RATES_DTYPE)
+        self.requests = []
+        for _ in range(bars):
+            self.new_bar()
+
+    def new_bar(self):
+        bar = np.zeros(1, dtype=RATES_DTYPE)
+        index = len(self.rates)
+        bar["time"] = 1_700_000_000 + index * H1
+        bar["open"] = bar["high"] = bar["low"] = bar["close"] = 1.1 + index * 1e-4
+        self.rates = np.concatenate([self.rates, bar])
+
+    def tick(self, price: float):
+        """Move the forming (last) bar."""
+        last = self.rates[-1]
+        last["close"] = price
+        last["high"] = max(last["high"], price)
+        last["low"] = min(last["low"], price)
+        last["tick_volume"] += 1
+
+    def __call__(self, symbol, timeframe, start_pos, count):
+        self.requests.append(count)
+        end = len(self.rates) - start_pos
+        return self.rates[max(0, end - count):end].copy()
+
+
+def test_first_request_loads_the_series():
+    terminal = Terminal()
+    cache = CandleCache(terminal, capacity=100)
+    rates = cache.get("EURUSD", H1, 50)
+    np.testing.assert_array_equal(rates, terminal.rates[-50:])
+    assert cache.stats()["misses"] == 1
+
+
+def test_request_within_refresh_interval_is_a_hit():
+    terminal = Terminal()
+    cache = CandleCache(terminal, capacity=100, refresh_interval=60)
+    cache.get("EURUSD", H1, 50)
+    terminal.new_bar()
+    rates = cache.get("EURUSD", H1, 50)
+    assert cache.stats()["hits"] == 1
+    assert len(terminal.requests) == 1
+    assert rates["time"][-1] == terminal.rates["time"][-2]
+
+
+def test_sync_patches_forming_bar_and_appends_closed_bars():
+    terminal = Terminal()
+    cache = CandleCache(terminal, capacity=100, refresh_interval=0)
+    cache.get("EURUSD", H1, 50)
+
+    terminal.tick(1.5)
+    terminal.new_bar()
+    terminal.new_bar()
+    terminal.tick(1.6)
+    del terminal.requests[:]
+    rates = cache.get("EURUSD", H1, 50)
+
+    np.testing.assert_array_equal(rates, terminal.rates[-50:])
+    stats = cache.stats()
+    assert (stats["misses"], stats["updates"]) == (1, 1)
+    # Only a few newest bars were fetched, not the whole window again
+    assert max(terminal.requests) <= 4
+
+
+def test_sync_over_many_syncs_matches_the_terminal():
+    terminal = Terminal()
+    cache = CandleCache(terminal, capacity=100, refresh_interval=0)
+    for step in range(150):
+        if step % 3 == 0:
+            terminal.new_bar()
+        terminal.tick(1.2 + step * 1e-5)
+        np.testing.assert_array_equal(cache.get("EURUSD", H1, 80), terminal.rates[-80:])
+    assert cache.stats()["misses"] == 1
+
+
+def test_gap_larger_than_capacity_reloads():
+    terminal = Terminal()
+    cache = CandleCache(terminal, capacity=100, refresh_interval=0)
+    cache.get("EURUSD", H1, 50)
+    for _ in range(150):
+        terminal.new_bar()
+    rates = cache.get("EURUSD", H1, 50)
+    np.testing.assert_array_equal(rates, terminal.rates[-50:])
+    assert cache.stats()["misses"] == 2
+
+
+def test_larger_request_than_cached_reloads():
+    terminal = Terminal(bars=1000)
+    cache = CandleCache(terminal, capacity=100, refresh_interval=60)
+    cache.get("EURUSD", H1, 50)
+    rates = cache.get("EURUSD", H1, 400)
+    np.testing.assert_array_equal(rates, terminal.rates[-400:])
+    assert cache.stats()["misses"] == 2
+
+
+def test_short_history_is_complete():
+    terminal = Terminal(bars=30)
+    cache = CandleCache(terminal, capacity=100, refresh_interval=60)
+    cache.get("EURUSD", H1, 50)
+    rates = cache.get("EURUSD", H1, 50)
+    assert len(rates) == 30
+    assert cache.stats()["hits"] == 1
+
+
+def test_eviction_keeps_bytes_under_the_limit_lru_first():
+    terminal = Terminal()
+    series_bytes = 100 * RATES_DTYPE.itemsize
+    cache = CandleCache(terminal, capacity=100, max_bytes=2 * series_bytes, refresh_interval=60)
+
+    cache.get("EURUSD", H1, 50)
+    cache.get("GBPUSD", H1, 50)
+    cache.get("EURUSD", H1, 50)  # most recently used now
+    cache.get("XAUUSD", H1, 50)
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["series"] == 2
+    assert stats["bytes"] <= cache.max_bytes
+
+    misses = stats["misses"]
+    cache.get("EURUSD", H1, 50)
+    assert cache.stats()["misses"] == misses  # kept
+    cache.get("GBPUSD", H1, 50)
+    assert cache.stats()["misses"] == misses + 1  # evicted
+
+
+def test_series_larger_than_the_limit_is_still_served():
+    terminal = Terminal()
+    cache = CandleCache(terminal, capacity=100, max_bytes=1)
+    rates = cache.get("EURUSD", H1, 50)
+    np.testing.assert_array_equal(rates, terminal.rates[-50:])
+    assert cache.stats()["series"] == 1
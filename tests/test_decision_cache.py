@@ -0,0 +1,219 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from services.decision_cache import DecisionCache, bar_close, payload_key
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def payload(close=1.1005, forming_time="2100-01-01T10:05:00Z", tf="M5"):
+    """Newest-first candles, as build_model_payload() passes them on. The default bar closes far in the future."""
+    return {
+        "symbol": "EURUSD",
+        "timeframes": {tf: {"historical_data": [
+            {"time": forming_time, "open": 1.1, "high": max(1.1, close), "low": min(1.1, close), "close": close, "tick_volume": 12},
+            {"time": "2000-01-01T00:00:00Z", "open": 1.099, "high": 1.101, "low": 1.098, "close": 1.1, "tick_volume": 80},
+        ]}},
+        "sentiment": {"score": 0.2},
+    }
+
+
+class Model:
+    """Stand-in for the LLM call: counts calls and answers when released."""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise ValueError("AI returned an invalid JSON response.")
+        return {"action": "buy", "call": self.calls}
+
+
+def test_concurrent_identical_payloads_share_one_call():
+    async def main():
+        cache, model = DecisionCache(), Model()
+        tasks = [asyncio.ensure_future(cache.get_or_compute(payload(), model)) for _ in range(5)]
+        await asyncio.sleep(0)
+        model.release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert model.calls == 1
+        assert sorted(outcome for _, outcome in results) == ["coalesced"] * 4 + ["miss"]
+        assert all(decision == {"action": "buy", "call": 1} for decision, _ in results)
+
+        decision, outcome = await cache.get_or_compute(payload(), model)
+        assert (outcome, model.calls) == ("hit", 1)
+        assert cache.stats() == {"entries": 1, "inflight": 0, "hits": 1, "misses": 1, "coalesced": 4, "errors": 0}
+    asyncio.run(main())
+
+
+def test_refresh_asks_again_and_replaces_the_entry():
+    async def main():
+        cache, model = DecisionCache(), Model()
+        model.release.set()
+        await cache.get_or_compute(payload(), model)
+        decision, outcome = await cache.get_or_compute(payload(), model, refresh=True)
+        assert (outcome, decision["call"]) == ("miss", 2)
+        decision, outcome = await cache.get_or_compute(payload(), model)
+        assert (outcome, decision["call"]) == ("hit", 2)
+    asyncio.run(main())
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    async def main():
+        cache, model = DecisionCache(), Model(fail=True)
+        tasks = [asyncio.ensure_future(cache.get_or_compute(payload(), model)) for _ in range(3)]
+        await asyncio.sleep(0)
+        model.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert model.calls == 1
+        assert cache.stats()["errors"] == 1
+
+        model.fail = False
+        decision, outcome = await cache.get_or_compute(payload(), model)
+        assert (outcome, model.calls) == ("miss", 2)
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def main():
+        cache, model = DecisionCache(), Model()
+        first = asyncio.ensure_future(cache.get_or_compute(payload(), model))
+        second = asyncio.ensure_future(cache.get_or_compute(payload(), model))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        model.release.set()
+        decision, outcome = await second
+        assert (decision["call"], outcome) == (1, "coalesced")
+        assert first.cancelled()
+        assert (await cache.get_or_compute(payload(), model))[1] == "hit"
+    asyncio.run(main())
+
+
+def test_abandoned_claim_is_taken_over():
+    async def main():
+        cache, model = DecisionCache(), Model()
+        model.release.set()
+        outcome, future = cache.claim(payload())
+        assert outcome == "miss"
+        assert cache.peek(payload()) == "coalesced"
+
+        waiter = asyncio.ensure_future(cache.get_or_compute(payload(), model))
+        await asyncio.sleep(0)
+        future.cancel()  # e.g. a streaming client disconnected
+        decision, outcome = await waiter
+        assert (decision["call"], outcome) == (1, "miss")
+        assert cache.peek(payload()) == "hit"
+    asyncio.run(main())
+
+
+def test_claim_owner_settles_waiters():
+    async def main():
+        cache = DecisionCache()
+        outcome, future = cache.claim(payload())
+        waiter = asyncio.ensure_future(cache.get_or_compute(payload(), Model()))
+        await asyncio.sleep(0)
+        future.set_result({"action": "sell"})
+        assert await waiter == ({"action": "sell"}, "coalesced")
+        assert cache.claim(payload()) == ("hit", {"action": "sell"})
+    asyncio.run(main())
+
+
+def test_key_ignores_forming_bar_ticks_but_not_a_new_bar():
+    assert payload_key(payload(close=1.1005)) == payload_key(payload(close=1.0990))
+    assert payload_key(payload()) != payload_key(payload(forming_time="2100-01-01T10:10:00Z"))
+    changed = payload()
+    changed["timeframes"]["M5"]["historical_data"][1]["close"] = 1.2
+    assert payload_key(changed) != payload_key(payload())
+    changed = payload()
+    changed["sentiment"]["score"] = -0.5
+    assert payload_key(changed) != payload_key(payload())
+
+
+def test_entries_expire_when_the_bar_closes():
+    async def main():
+        opened = datetime(2024, 1, 1, 10, 5, tzinfo=timezone.utc).timestamp()
+        clock = Clock(opened + 1)
+        cache, model = DecisionCache(clock=clock), Model()
+        model.release.set()
+        item = payload(forming_time="2024-01-01T10:05:00Z")
+        await cache.get_or_compute(item, model)
+        clock.now = opened + 299
+        assert (await cache.get_or_compute(item, model))[1] == "hit"
+        clock.now = opened + 300
+        assert (await cache.get_or_compute(item, model))[1] == "miss"
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("tf, seconds", [("H4", 4 * 3600), ("D1", 86400)])
+def test_expiry_follows_broker_server_time(tf, seconds):
+    # A UTC+2 broker's D1 bar stamped 2024-01-02 00:00 server time opened at 2024-01-01 22:00 UTC
+    opened_server = datetime(2024, 1, 2, tzinfo=timezone.utc).timestamp()
+    item = payload(forming_time="2024-01-02T00:00:00Z", tf=tf)
+    assert bar_close(item, 0.0, 300.0, server_offset=2 * 3600) == opened_server + seconds - 2 * 3600
+    assert bar_close(item, 0.0, 300.0) == opened_server + seconds
+
+
+def test_expiry_uses_the_shortest_timeframe_with_candles():
+    item = payload(forming_time="2024-01-02T08:00:00Z", tf="H4")
+    item["timeframes"]["M5"] = {"historical_data": []}
+    item["timeframes"]["D1"] = payload(forming_time="2024-01-02T00:00:00Z", tf="D1")["timeframes"]["D1"]
+    assert bar_close(item, 0.0, 300.0) == datetime(2024, 1, 2, 12, tzinfo=timezone.utc).timestamp()
+
+
+def test_epoch_candle_times():
+    item = {"timeframes": {"H1": {"historical_data": [{"time": 1_700_000_000}, {"time": 1_699_996_400}]}}}
+    assert bar_close(item, 0.0, 300.0) == 1_700_003_600
+
+
+def test_stale_payload_is_not_kept():
+    async def main():
+        cache, model = DecisionCache(), Model()
+        model.release.set()
+        item = payload(forming_time="2000-01-01T00:05:00Z")
+        assert (await cache.get_or_compute(item, model))[1] == "miss"
+        assert (await cache.get_or_compute(item, model))[1] == "miss"
+    asyncio.run(main())
+
+
+def test_lru_bound():
+    async def main():
+        cache, model = DecisionCache(max_entries=2), Model()
+        model.release.set()
+        payloads = [{**payload(), "sentiment": {"score": score}} for score in range(3)]
+        for item in payloads:
+            await cache.get_or_compute(item, model)
+        assert cache.stats()["entries"] == 2
+        assert (await cache.get_or_compute(payloads[0], model))[1] == "miss"
+        assert (await cache.get_or_compute(payloads[2], model))[1] == "hit"
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("timeframes", [{}, {"custom": {"historical_data": []}}])
+def test_fallback_ttl_without_known_timeframes(timeframes):
+    async def main():
+        clock = Clock()
+        cache, model = DecisionCache(fallback_ttl=60, clock=clock), Model()
+        model.release.set()
+        item = {"symbol": "EURUSD", "timeframes": timeframes}
+        await cache.get_or_compute(item, model)
+        clock.now += 59
+        assert (await cache.get_or_compute(item, model))[1] == "hit"
+        clock.now += 1
+        assert (await cache.get_or_compute(item, model))[1] == "miss"
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+import random
+
+import numpy as np
+import pytest
+
+from services.indicators import IndicatorEngine, IndicatorState, parse_specs
+from services.mt5_sim import RATES_DTYPE
+
+SPECS = "sma:5,sma:20,ema:10,ema:50,rsi:14,atr:14"
+
+
+class Terminal:
+    """get_rates(symbol, count, timeframe) over a random walk: newest `count` bars, forming bar last."""
+
+    def __init__(self, bars: int = 400, seed: int = 3):
+        self.rng = random.Random(seed)
+        self.rates = np.zeros(0, dtype=RATES_DTYPE)
+        for _ in range(bars):
+            self.new_bar()
+
+    def new_bar(self):
+        bar = np.zeros(1, dtype=RATES_DTYPE)
+        price = float(self.rates["close"][-1]) if len(self.rates) else 1.1
+        bar["time"] = 1_700_000_000 + len(self.rates) * 300
+        bar["open"] = bar["high"] = bar["low"] = bar["close"] = price
+        self.rates = np.concatenate([self.rates, bar])
+        self.tick()
+
+    def tick(self):
+        last = self.rates[-1]
+        last["close"] = last["close"] + self.rng.gauss(0, 0.001)
+        last["high"] = max(last["high"], last["close"])
+        last["low"] = min(last["low"], last["close"])
+
+    def __call__(self, symbol, count, timeframe):
+        return self.rates[-count:].copy()
+
+
+def full_recompute(terminal, first_bar, specs):
+    """Every indicator fed from scratch with the closed bars since `first_bar`, plus live values."""
+    state = IndicatorState(specs)
+    state.feed(terminal.rates[first_bar:-1])
+    forming = terminal.rates[-1]
+    high, low, close = float(forming["high"]), float(forming["low"]), float(forming["close"])
+    return (
+        {name: indicator.value for name, indicator in state.indicators.items()},
+        {name: indicator.peek(high, low, close) for name, indicator in state.indicators.items()},
+    )
+
+
+def assert_values(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        assert actual[name] == pytest.approx(value, rel=1e-9, abs=1e-12), name
+
+
+def test_incremental_matches_full_recompute():
+    terminal = Terminal()
+    engine = IndicatorEngine(terminal, default_specs=SPECS, warmup=300)
+    specs = parse_specs(SPECS)
+    engine.compute("EURUSD", "M5")
+    first_bar = len(terminal.rates) - 300  # the warm-up window
+
+    for step in range(300):
+        if step % 4 == 0:
+            terminal.new_bar()
+        else:
+            terminal.tick()
+        result = engine.compute("EURUSD", "M5")
+        values, live = full_recompute(terminal, first_bar, specs)
+        assert_values(result["values"], values)
+        assert_values(result["live"], live)
+        assert result["closed_bar_time"] == int(terminal.rates["time"][-2])
+        assert result["bar_time"] == int(terminal.rates["time"][-1])
+
+    assert engine.stats()["warmups"] == 1
+    assert engine.stats()["advanced_bars"] == 75
+
+
+def test_simple_values_against_numpy():
+    terminal = Terminal()
+    engine = IndicatorEngine(terminal, default_specs="sma:20", warmup=200)
+    terminal.new_bar()
+    result = engine.compute("EURUSD", "M5")
+    closed = terminal.rates["close"][:-1]
+    assert result["values"]["sma_20"] == pytest.approx(closed[-20:].mean())
+    assert result["live"]["sma_20"] == pytest.approx(terminal.rates["close"][-20:].mean())
+
+
+def test_returns_only_requested_indicators():
+    terminal = Terminal()
+    engine = IndicatorEngine(terminal, default_specs=SPECS, warmup=200)
+    engine.compute("EURUSD", "M5")
+
+    result = engine.compute("EURUSD", "M5", parse_specs("rsi:14"))
+    assert set(result["values"]) == set(result["live"]) == {"rsi_14"}
+
+    # A new indicator rebuilds the series with the union, but still answers only what was asked
+    result = engine.compute("EURUSD", "M5", parse_specs("ema:30"))
+    assert set(result["values"]) == {"ema_30"}
+    result = engine.compute("EURUSD", "M5")
+    assert set(result["values"]) == set(parse_specs(SPECS))
+    assert engine.stats()["warmups"] == 2
+
+
+def test_gap_larger_than_warmup_warms_up_again():
+    terminal = Terminal()
+    engine = IndicatorEngine(terminal, default_specs=SPECS, warmup=300)
+    engine.compute("EURUSD", "M5")
+    for _ in range(350):
+        terminal.new_bar()
+
+    result = engine.compute("EURUSD", "M5")
+    values, _ = full_recompute(terminal, len(terminal.rates) - 300, parse_specs(SPECS))
+    assert_values(result["values"], values)
+    assert engine.stats()["warmups"] == 2
+
+
+@pytest.mark.parametrize("spec", ["", "macd:12", "sma", "sma:0", "rsi:501", "ema:x"])
+def test_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        parse_specs(spec)
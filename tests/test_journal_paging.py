@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from models import TradeJournal
+from services import db_service
+
+
+@pytest.fixture
+def trades(db):
+    """60 trades over 12 distinct opened_at values, so most pages end inside a tie."""
+    start = datetime(2024, 1, 1, 9, 0)
+    rows = [
+        TradeJournal(
+            symbol=("EURUSD", "XAUUSD", "GBPUSD")[i % 3],
+            direction="buy" if i % 2 else "sell",
+            status="open",
+            opened_at=start + timedelta(minutes=5 * (i % 12)),
+        )
+        for i in range(60)
+    ]
+    db.add_all(rows)
+    db.commit()
+    return sorted(rows, key=lambda row: (row.opened_at, row.id), reverse=True)
+
+
+def all_pages(run_async, limit, **filters):
+    async def body(session):
+        ids, cursor, pages = [], None, 0
+        while True:
+            items, cursor = await db_service.query_trades_async(session, limit=limit, cursor=cursor, **filters)
+            pages += 1
+            ids += [item["id"] if isinstance(item, dict) else item.id for item in items]
+            if cursor is None:
+                return ids, pages
+    return run_async(body)
+
+
+def test_cursor_round_trip():
+    item = SimpleNamespace(id=42, opened_at=datetime(2024, 3, 1, 12, 30, 15, 250000))
+    assert db_service.decode_cursor(db_service.encode_cursor(item)) == (item.opened_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "MjAyNC0wMS0wMQ=="])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        db_service.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("limit", [1, 7, 12, 59, 60, 100])
+def test_pages_cover_every_trade_once_in_order(trades, run_async, limit):
+    ids, pages = all_pages(run_async, limit)
+    assert ids == [row.id for row in trades]
+    assert pages == max(1, -(-len(trades) // limit))
+
+
+def test_paging_with_fields(trades, run_async):
+    ids, _ = all_pages(run_async, 9, fields=["id", "symbol"])
+    assert ids == [row.id for row in trades]
+
+
+def test_paging_with_filters(trades, run_async):
+    ids, _ = all_pages(run_async, 4, symbol="XAUUSD", direction="buy")
+    assert ids == [row.id for row in trades if row.symbol == "XAUUSD" and row.direction == "buy"]
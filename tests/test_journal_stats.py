@@ -0,0 +1,136 @@
+import asyncio
+import random
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import JournalStats, TradeJournal
+from services import db_service, journal_stats
+
+COLUMNS = [
+    "trades", "wins", "losses", "gross_profit", "gross_loss",
+    "r_trades", "sum_r", "equity", "peak_equity", "max_drawdown",
+]
+
+
+def stats_rows(db):
+    db.expire_all()
+    return {
+        (row.symbol, row.direction): {name: getattr(row, name) for name in COLUMNS}
+        for row in db.execute(select(JournalStats)).scalars()
+    }
+
+
+def assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key in expected:
+        for name in COLUMNS:
+            assert actual[key][name] == pytest.approx(expected[key][name]), (key, name)
+
+
+@pytest.fixture
+def closed_trades(db, run_async):
+    """40 trades closed in shuffled order through close_trade_async, i.e. apply_close."""
+    rng = random.Random(7)
+    trades = []
+    for i in range(40):
+        direction = rng.choice(["buy", "sell"])
+        entry = 1.1 + rng.uniform(-0.01, 0.01)
+        stop = entry - 0.002 if direction == "buy" else entry + 0.002
+        trades.append(TradeJournal(symbol=rng.choice(["EURUSD", "XAUUSD"]), direction=direction,
+                                   entry_price=entry, stop_loss=stop, status="open"))
+    trades.append(TradeJournal(symbol="EURUSD", direction="buy", entry_price=1.1, stop_loss=1.1, status="open"))  # zero risk
+    db.add_all(trades)
+    db.commit()
+
+    closes = []
+    for trade in rng.sample(trades, len(trades)):
+        pnl = rng.choice([0.0, round(rng.uniform(-50, 80), 2)])
+        exit_price = None if rng.random() < 0.2 else trade.entry_price + rng.uniform(-0.004, 0.004)
+        closes.append((trade.id, pnl, exit_price))
+
+    async def body(session):
+        for trade_id, pnl, exit_price in closes:
+            await db_service.close_trade_async(session, trade_id, pnl, exit_price)
+    run_async(body)
+    return closes
+
+
+def test_apply_close_matches_rebuild(db, closed_trades):
+    incremental = stats_rows(db)
+    journal_stats.rebuild(db)
+    assert_same(incremental, stats_rows(db))
+
+
+def test_aggregates(db, closed_trades):
+    pnls = [pnl for _, pnl, _ in closed_trades]
+    overall = stats_rows(db)[(journal_stats.ALL, journal_stats.ALL)]
+    assert overall["trades"] == len(pnls)
+    assert overall["wins"] == sum(pnl > 0 for pnl in pnls)
+    assert overall["losses"] == sum(pnl < 0 for pnl in pnls)
+    assert overall["equity"] == pytest.approx(sum(pnls))
+
+    equity = peak = drawdown = 0.0
+    for pnl in pnls:
+        equity += pnl
+        peak = max(peak, equity)
+        drawdown = max(drawdown, peak - equity)
+    assert overall["max_drawdown"] == pytest.approx(drawdown)
+
+    buckets = stats_rows(db)
+    for direction in ("buy", "sell"):
+        per_symbol = sum(buckets.get((symbol, direction), {"trades": 0})["trades"] for symbol in ("EURUSD", "XAUUSD"))
+        assert per_symbol == buckets[(journal_stats.ALL, direction)]["trades"]
+
+
+def test_closing_twice_is_rejected(db, run_async):
+    trade = TradeJournal(symbol="EURUSD", direction="buy", entry_price=1.1, stop_loss=1.09, status="open")
+    db.add(trade)
+    db.commit()
+
+    async def body(session):
+        await db_service.close_trade_async(session, trade.id, 10.0, 1.11)
+        with pytest.raises(ValueError):
+            await db_service.close_trade_async(session, trade.id, 10.0, 1.11)
+    run_async(body)
+    assert stats_rows(db)[("EURUSD", "buy")]["trades"] == 1
+
+
+def test_concurrent_closes_count_once(db, run_async):
+    trade = TradeJournal(symbol="EURUSD", direction="buy", entry_price=1.1, stop_loss=1.09, status="open")
+    db.add(trade)
+    db.commit()
+
+    async def close(session):
+        async with AsyncSession(session.bind, autoflush=False, expire_on_commit=False) as other:
+            return await db_service.close_trade_async(other, trade.id, 10.0, 1.11)
+
+    async def body(session):
+        return await asyncio.gather(*(close(session) for _ in range(4)), return_exceptions=True)
+
+    results = run_async(body)
+    assert sum(isinstance(result, TradeJournal) for result in results) == 1
+    assert all(isinstance(result, (TradeJournal, ValueError)) for result in results), results
+    assert stats_rows(db)[(journal_stats.ALL, journal_stats.ALL)]["trades"] == 1
+
+
+def test_cancelled_trade_cannot_be_closed(db, run_async):
+    trade = TradeJournal(symbol="EURUSD", direction="sell", entry_price=1.1, stop_loss=1.11, status="cancelled")
+    db.add(trade)
+    db.commit()
+
+    async def body(session):
+        with pytest.raises(ValueError):
+            await db_service.close_trade_async(session, trade.id, 5.0, 1.09)
+    run_async(body)
+    assert stats_rows(db) == {}
+
+
+def test_r_multiple():
+    buy = TradeJournal(direction="buy", entry_price=1.10, stop_loss=1.09, exit_price=1.12)
+    sell = TradeJournal(direction="sell", entry_price=1.10, stop_loss=1.11, exit_price=1.12)
+    assert journal_stats.r_multiple(buy) == pytest.approx(2.0)
+    assert journal_stats.r_multiple(sell) == pytest.approx(-2.0)
+    assert journal_stats.r_multiple(TradeJournal(entry_price=1.1, stop_loss=1.1, exit_price=1.2)) is None
+    assert journal_stats.r_multiple(TradeJournal(entry_price=1.1, stop_loss=1.09)) is None
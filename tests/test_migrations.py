@@ -0,0 +1,147 @@
+import json
+import sqlite3
+
+from sqlalchemy import inspect, text
+
+import auth
+import database
+from services import snapshot_store
+
+# Schema of a database created by the baseline build: the ORM tables plus the raw
+# sqlite3 `trades` and `instruments` tables its import-time init_db() created
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL, username VARCHAR, hashed_password VARCHAR, role VARCHAR, PRIMARY KEY (id)
+);
+CREATE INDEX ix_users_id ON users (id);
+CREATE UNIQUE INDEX ix_users_username ON users (username);
+CREATE TABLE tokens (
+    id INTEGER NOT NULL, token VARCHAR, user_id INTEGER, created_at DATETIME,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_tokens_id ON tokens (id);
+CREATE UNIQUE INDEX ix_tokens_token ON tokens (token);
+CREATE TABLE trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, symbol TEXT, direction TEXT, entry_price REAL, stop_loss REAL,
+    take_profit_1 REAL, take_profit_2 REAL, take_profit_3 REAL, position_size REAL, risk_pct REAL,
+    status TEXT, result_pnl REAL, confidence REAL, reasoning TEXT, snapshot_json TEXT,
+    sentiment_json TEXT, opened_at TEXT, closed_at TEXT
+);
+CREATE TABLE instruments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, symbol TEXT, description TEXT, session TEXT,
+    volatility_profile TEXT, backtest_json TEXT, created_at TEXT
+);
+CREATE TABLE trade_journal (
+    id INTEGER NOT NULL, symbol VARCHAR, direction VARCHAR, entry_price FLOAT, stop_loss FLOAT,
+    take_profit_1 FLOAT, take_profit_2 FLOAT, take_profit_3 FLOAT, position_size FLOAT, risk_pct FLOAT,
+    status VARCHAR, result_pnl FLOAT, confidence FLOAT, reasoning TEXT, snapshot_json TEXT,
+    sentiment_json TEXT, opened_at DATETIME, closed_at DATETIME, PRIMARY KEY (id)
+);
+CREATE INDEX ix_trade_journal_id ON trade_journal (id);
+CREATE INDEX ix_trade_journal_symbol ON trade_journal (symbol);
+"""
+
+SNAPSHOT = json.dumps({"H1": [{"time": "2024-01-01T00:00:00Z", "close": 1.1}]})
+
+
+def make_baseline(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO users (id, username, hashed_password, role) VALUES (1, 'bot', 'x', 'admin')")
+    conn.execute("INSERT INTO tokens (id, token, user_id, created_at) VALUES (1, 'plain-token', 1, '2024-01-01 00:00:00')")
+    conn.execute(
+        "INSERT INTO trade_journal (id, symbol, direction, entry_price, stop_loss, status, snapshot_json, sentiment_json, opened_at) "
+        "VALUES (1, 'EURUSD', 'buy', 1.1, 1.09, 'open', ?, '{}', '2024-01-01 10:00:00')",
+        (SNAPSHOT,),
+    )
+    # Legacy rows, one of them without opened_at
+    conn.execute(
+        "INSERT INTO trades (symbol, direction, entry_price, stop_loss, status, result_pnl, snapshot_json, opened_at, closed_at) "
+        "VALUES ('XAUUSD', 'sell', 2000, 2010, 'closed', 25.0, ?, NULL, '2024-01-02 12:00:00')",
+        (SNAPSHOT,),
+    )
+    conn.execute("INSERT INTO trades (symbol, direction, status, opened_at) VALUES ('GBPUSD', 'buy', 'open', NULL)")
+    conn.commit()
+    conn.close()
+
+
+def test_init_db_upgrades_a_baseline_database(tmp_path):
+    path = tmp_path / "baseline.db"
+    make_baseline(path)
+    engine = database.make_engine(f"sqlite:///{path}")
+    database.init_db(engine)
+
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        assert conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() == database.MIGRATIONS[-1][0]
+
+        tables = set(inspector.get_table_names())
+        assert "trades" not in tables
+        assert {"journal_stats", "snapshot_blobs"} <= tables
+
+        columns = {c["name"] for c in inspector.get_columns("trade_journal")}
+        assert {"exit_price", "snapshot_ref", "sentiment_ref"} <= columns
+        assert not {"snapshot_json", "sentiment_json"} & columns
+        indexes = {index["name"] for index in inspector.get_indexes("trade_journal")}
+        assert {"ix_trade_journal_opened_at", "ix_trade_journal_symbol_status_opened_at"} <= indexes
+
+        rows = conn.execute(text("SELECT symbol, opened_at, snapshot_ref FROM trade_journal ORDER BY id")).fetchall()
+        assert [row.symbol for row in rows] == ["EURUSD", "XAUUSD", "GBPUSD"]
+        assert all(row.opened_at is not None for row in rows)
+        assert str(rows[1].opened_at).startswith("2024-01-02 12:00:00")  # backfilled from closed_at
+
+        # The identical snapshot of two trades is stored once and decodes to the original text
+        assert rows[0].snapshot_ref == rows[1].snapshot_ref
+        blobs = conn.execute(text("SELECT hash, codec, data FROM snapshot_blobs")).fetchall()
+        texts = {blob.hash: snapshot_store.decompress(blob.data, blob.codec).decode() for blob in blobs}
+        assert texts[rows[0].snapshot_ref] == SNAPSHOT
+        assert len(blobs) == 2  # the snapshot and "{}"
+
+        token_columns = {c["name"] for c in inspector.get_columns("tokens")}
+        assert "token" not in token_columns
+        assert conn.execute(text("SELECT token_hash FROM tokens")).scalar() == auth.hash_token("plain-token")
+    engine.dispose()
+
+
+def test_init_db_is_idempotent(tmp_path):
+    path = tmp_path / "baseline.db"
+    make_baseline(path)
+    engine = database.make_engine(f"sqlite:///{path}")
+    database.init_db(engine)
+    database.init_db(engine)
+    with engine.connect() as conn:
+        versions = conn.execute(text("SELECT version FROM schema_version ORDER BY version")).scalars().all()
+        assert versions == [version for version, _ in database.MIGRATIONS]
+        assert conn.execute(text("SELECT COUNT(*) FROM trade_journal")).scalar() == 3
+    engine.dispose()
+
+
+def schema(engine):
+    inspector = inspect(engine)
+    return {
+        table: (
+            {column["name"] for column in inspector.get_columns(table)},
+            {(index["name"], bool(index["unique"])) for index in inspector.get_indexes(table)},
+            {(tuple(fk["constrained_columns"]), fk["referred_table"]) for fk in inspector.get_foreign_keys(table)},
+        )
+        for table in inspector.get_table_names()
+        if table != "schema_version"
+    }
+
+
+def test_fresh_database_migrates_to_the_models(engine, tmp_path):
+    """Migration 1 creates the original tables; the rest must end at what models.py declares."""
+    reference = database.make_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    database.Base.metadata.create_all(bind=reference)
+    assert schema(engine) == schema(reference)
+    reference.dispose()
+
+
+def test_first_migration_creates_the_original_schema(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'v1.db'}")
+    with engine.begin() as conn:
+        database.MIGRATIONS[0][1](conn)
+        columns = {c["name"] for c in inspect(conn).get_columns("trade_journal")}
+        assert {"snapshot_json", "sentiment_json"} <= columns and "exit_price" not in columns
+        assert "token" in {c["name"] for c in inspect(conn).get_columns("tokens")}
+    engine.dispose()
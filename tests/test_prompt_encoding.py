@@ -0,0 +1,92 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.ai_services import count_tokens, encode_model_input
+
+SECONDS = {"M5": 300, "H1": 3600, "D1": 86400}
+END = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def candles(tf, n, gap_at=None):
+    """Newest-first candles ending at END, like build_model_payload() passes them on."""
+    step = timedelta(seconds=SECONDS[tf])
+    out = []
+    for i in range(n):
+        offset = i + (1 if gap_at is not None and i >= gap_at else 0)
+        price = 1.1 + 0.00037 * ((i * 7919) % 113)
+        out.append({
+            "time": (END - offset * step).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "open": round(price, 5), "high": round(price + 0.0004, 5),
+            "low": round(price - 0.0003, 5), "close": round(price + 0.0001, 5), "tick_volume": 100 + i,
+        })
+    return out
+
+
+def model_input(bars=300):
+    return {
+        "symbol": "EURUSD",
+        "timeframes": {tf: {"historical_data": candles(tf, bars)} for tf in ("D1", "M5", "H1")},
+        "sentiment": {"score": 0.1},
+    }
+
+
+def frames(text):
+    return json.loads(text)["timeframes"]
+
+
+def test_untrimmed_encoding_is_lossless():
+    data = model_input(100)
+    encoded = frames(encode_model_input(data, digits=5, token_budget=0))
+    for tf, frame in encoded.items():
+        source = data["timeframes"][tf]["historical_data"][::-1]  # oldest first
+        assert frame["c"] == [c["close"] for c in source]
+        assert frame["v"] == [c["tick_volume"] for c in source]
+        assert frame["bar"] == SECONDS[tf]
+        assert frame["end"].startswith("2024-03-01T00:00:00")
+        assert "t" not in frame
+
+
+def test_gaps_are_encoded_as_offsets():
+    data = {"symbol": "EURUSD", "timeframes": {"H1": {"historical_data": candles("H1", 10, gap_at=4)}}}
+    frame = frames(encode_model_input(data, digits=5, token_budget=0))["H1"]
+    assert frame["t"] == [-10, -9, -8, -7, -6, -5, -3, -2, -1, 0]
+
+
+def test_stays_within_budget_trimming_the_lowest_timeframe_first():
+    data = model_input()
+    full = count_tokens(encode_model_input(data, digits=5, token_budget=0))
+    budget = int(full * 0.75)
+    text = encode_model_input(data, digits=5, token_budget=budget, min_bars=20)
+    encoded = frames(text)
+
+    assert count_tokens(text) <= budget
+    assert len(encoded["M5"]["c"]) < 300
+    assert len(encoded["H1"]["c"]) == len(encoded["D1"]["c"]) == 300
+    # The oldest bars go; the newest bar and its time stay
+    newest_first = data["timeframes"]["M5"]["historical_data"]
+    assert encoded["M5"]["c"] == [c["close"] for c in newest_first[:len(encoded["M5"]["c"])][::-1]]
+    assert encoded["M5"]["end"].startswith("2024-03-01T00:00:00")
+
+
+def test_next_timeframe_is_trimmed_once_the_lowest_hits_min_bars():
+    data = model_input()
+    full = count_tokens(encode_model_input(data, digits=5, token_budget=0))
+    text = encode_model_input(data, digits=5, token_budget=int(full * 0.4), min_bars=20)
+    encoded = frames(text)
+    assert count_tokens(text) <= int(full * 0.4)
+    assert len(encoded["M5"]["c"]) == 20
+    assert len(encoded["H1"]["c"]) < 300
+    assert len(encoded["D1"]["c"]) == 300
+
+
+def test_unreachable_budget_stops_at_min_bars():
+    text = encode_model_input(model_input(), digits=5, token_budget=10, min_bars=20)
+    assert {tf: len(frame["c"]) for tf, frame in frames(text).items()} == {"M5": 20, "H1": 20, "D1": 20}
+
+
+@pytest.mark.parametrize("budget", [0, 100000])
+def test_within_budget_is_untouched(budget):
+    data = model_input(50)
+    assert encode_model_input(data, digits=5, token_budget=budget) == encode_model_input(data, digits=5, token_budget=0)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import zlib
+
+import pytest
+from sqlalchemy import func, select
+
+from models import SnapshotBlob
+from schemas import TradeJournalCreate
+from services import db_service, snapshot_store
+
+CANDLES = json.dumps([
+    {"time": f"2024-01-01T{hour:02d}:00:00Z", "open": 1.1, "high": 1.2, "low": 1.0, "close": 1.15}
+    for hour in range(24)
+])
+
+
+def blob_count(db):
+    return db.execute(select(func.count()).select_from(SnapshotBlob)).scalar()
+
+
+def journal_entry(**overrides):
+    values = dict(
+        symbol="EURUSD", direction="buy", entry_price=1.1, stop_loss=1.09, position_size=0.1,
+        risk_pct=1.0, confidence=0.7, reasoning="test", snapshot_json=CANDLES, sentiment_json="{}",
+    )
+    return TradeJournalCreate(**{**values, **overrides})
+
+
+def test_identical_snapshots_are_stored_once(db):
+    first = snapshot_store.put(db, CANDLES)
+    second = snapshot_store.put(db, CANDLES)
+    db.commit()
+    assert first == second == hashlib.sha256(CANDLES.encode()).hexdigest()
+    assert blob_count(db) == 1
+
+    blob = db.get(SnapshotBlob, first)
+    assert blob.size == len(CANDLES.encode())
+    assert len(blob.data) < blob.size
+    assert snapshot_store.decompress(blob.data, blob.codec).decode() == CANDLES
+
+
+def test_none_is_not_stored(db):
+    assert snapshot_store.put(db, None) is None
+    assert blob_count(db) == 0
+
+
+def test_put_many_keeps_order_and_dedups(db, run_async):
+    texts = [CANDLES, None, "{}", CANDLES, "{}"]
+
+    async def body(session):
+        refs = await snapshot_store.put_many_async(session, texts)
+        await session.commit()
+        return refs, await snapshot_store.load_async(session, refs)
+
+    refs, loaded = run_async(body)
+    assert refs[1] is None
+    assert refs[0] == refs[3] and refs[2] == refs[4]
+    assert blob_count(db) == 2
+    assert [None if ref is None else loaded[ref] for ref in refs] == texts
+
+
+def test_blobs_in_another_codec_still_load(db, run_async):
+    raw = b'{"legacy": true}'
+    ref = hashlib.sha256(raw).hexdigest()
+    db.add(SnapshotBlob(hash=ref, codec="zlib", size=len(raw), data=zlib.compress(raw)))
+    db.commit()
+    assert run_async(lambda session: snapshot_store.load_async(session, [ref, None])) == {ref: raw.decode()}
+
+
+def test_journal_entries_round_trip(db, run_async):
+    async def body(session):
+        item = await db_service.create_trade_journal_async(session, journal_entry())
+        ids, errors = await db_service.bulk_create_trade_journal_async(
+            session, [journal_entry(symbol="XAUUSD"), journal_entry(snapshot_json="[]")]
+        )
+        assert not errors
+        items = [await db_service.get_trade_async(session, trade_id) for trade_id in [item.id, *ids]]
+        return await db_service.load_snapshots_async(session, items)
+
+    items = run_async(body)
+    assert [item.snapshot_json for item in items] == [CANDLES, CANDLES, "[]"]
+    assert all(item.sentiment_json == "{}" for item in items)
+    assert items[0].snapshot_ref == items[1].snapshot_ref
+    assert blob_count(db) == 3  # CANDLES, "[]" and "{}"
+
+
+def test_zstd_blob_without_zstandard():
+    if snapshot_store.zstandard is not None:
+        pytest.skip("zstandard is installed")
+    with pytest.raises(RuntimeError):
+        snapshot_store.decompress(b"", "zstd")
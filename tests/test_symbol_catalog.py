@@ -0,0 +1,76 @@
+import time
+from types import SimpleNamespace
+
+from services.symbol_catalog import SymbolCatalog
+
+
+class Broker:
+    """Symbol list loader that counts how often the catalog asks for it."""
+
+    def __init__(self, *names):
+        self.names = list(names)
+        self.loads = 0
+
+    def __call__(self):
+        self.loads += 1
+        return [SimpleNamespace(name=name) for name in self.names]
+
+
+def wait_for_refresh(catalog, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while catalog._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_resolve_exact_name():
+    catalog = SymbolCatalog(Broker("EURUSD", "XAUUSDm"))
+    assert catalog.resolve("EURUSD") == "EURUSD"
+
+
+def test_resolve_broker_suffix():
+    catalog = SymbolCatalog(Broker("EURUSDm", "XAUUSDm"))
+    assert catalog.resolve("EURUSD") == "EURUSDm"
+    assert catalog.resolve("XAUUSD") == "XAUUSDm"
+
+
+def test_resolve_ignores_case():
+    # Routes upper-case what clients send, so a suffixed name arrives as EURUSDM
+    catalog = SymbolCatalog(Broker("EURUSDm"))
+    assert catalog.resolve("EURUSDM") == "EURUSDm"
+    assert catalog.resolve("eurusd") == "EURUSDm"
+
+
+def test_exact_name_wins_over_suffix():
+    catalog = SymbolCatalog(Broker("EURUSD", "EURUSDm"))
+    assert catalog.resolve("EURUSD") == "EURUSD"
+
+
+def test_lookups_are_served_from_one_load():
+    broker = Broker("EURUSDm", "GBPUSDm")
+    catalog = SymbolCatalog(broker)
+    for _ in range(3):
+        catalog.resolve("EURUSD")
+        catalog.resolve("GBPUSDM")
+    assert broker.loads == 1
+
+
+def test_miss_returns_none_and_is_not_memoized():
+    broker = Broker("EURUSDm")
+    catalog = SymbolCatalog(broker, miss_refresh_interval=0)
+    assert catalog.resolve("BTCUSD") is None
+
+    broker.names.append("BTCUSDm")
+    time.sleep(0.01)
+    assert catalog.resolve("BTCUSD") is None  # starts a background reload
+    wait_for_refresh(catalog)
+    assert catalog.resolve("BTCUSD") == "BTCUSDm"
+    assert catalog.resolve("BTCUSDM") == "BTCUSDm"
+
+
+def test_miss_within_interval_does_not_reload():
+    broker = Broker("EURUSDm")
+    catalog = SymbolCatalog(broker, miss_refresh_interval=60)
+    for _ in range(5):
+        assert catalog.resolve("BTCUSD") is None
+    wait_for_refresh(catalog)
+    assert broker.loads == 1
@@ -0,0 +1,151 @@
+import random
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import auth
+import main
+from routes import bias
+from services.mt5_sim import RATES_DTYPE
+from services.trend_bias import trend_bias, trend_bias_rates
+
+
+def reference_trend_bias(candles):
+    """routes/bias.py simple_trend_bias before the numpy port, kept verbatim as the reference."""
+    n = len(candles)
+    if n < 3:
+        return {"bias": "neutral", "confidence": 40, "reason": "insufficient data"}
+
+    closes = [c["close"] for c in candles]
+    slope = (closes[-1] - closes[0]) / max(1, n)
+    last_changes = closes[-3:]
+    rise_count = sum(1 for i in range(1, len(last_changes)) if last_changes[i] > last_changes[i-1])
+    fall_count = sum(1 for i in range(1, len(last_changes)) if last_changes[i] < last_changes[i-1])
+
+    highs = [c["high"] for c in candles]
+    lows = [c["low"] for c in candles]
+    hh = highs[-1] > max(highs[:-1])
+    ll = lows[-1] < min(lows[:-1])
+
+    if slope > 0 and rise_count >= 2:
+        bias = "bullish"
+        confidence = min(95, 60 + int(abs(slope) * 1000))
+        reason = "Upward slope and recent higher closes"
+    elif slope < 0 and fall_count >= 2:
+        bias = "bearish"
+        confidence = min(95, 60 + int(abs(slope) * 1000))
+        reason = "Downward slope and recent lower closes"
+    else:
+        bias = "neutral"
+        confidence = 40
+        reason = "No clear slope; mixed closes"
+
+    if bias == "bullish" and hh:
+        confidence = min(100, confidence + 10)
+        reason += "; detected higher high"
+    if bias == "bearish" and ll:
+        confidence = min(100, confidence + 10)
+        reason += "; detected lower low"
+
+    return {"bias": bias, "confidence": confidence, "reason": reason}
+
+
+def random_candles(rng, n, drift, step, flat=False):
+    price, candles = rng.uniform(0.5, 2000), []
+    for _ in range(n):
+        close = price if flat else price + drift + rng.gauss(0, step)
+        candles.append({
+            "close": close,
+            "high": max(price, close) + (0 if flat else abs(rng.gauss(0, step))),
+            "low": min(price, close) - (0 if flat else abs(rng.gauss(0, step))),
+        })
+        price = close
+    return candles
+
+
+def columns(candles):
+    return tuple(np.array([c[field] for c in candles], dtype=np.float64) for field in ("close", "high", "low"))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_reference(seed):
+    rng = random.Random(seed)
+    for n in (0, 1, 2, 3, 4, 10, 100, 500):
+        for drift in (-0.5, -0.001, 0.0, 0.001, 0.5):
+            for step in (0.0001, 0.01, 1.0):
+                candles = random_candles(rng, n, drift, step)
+                assert trend_bias(*columns(candles)) == reference_trend_bias(candles), (n, drift, step)
+
+
+def test_flat_series_is_neutral():
+    candles = random_candles(random.Random(1), 50, 0.0, 0.0, flat=True)
+    assert trend_bias(*columns(candles)) == reference_trend_bias(candles)
+    assert trend_bias(*columns(candles))["bias"] == "neutral"
+
+
+def test_rates_array():
+    candles = random_candles(random.Random(2), 100, 0.01, 0.005)
+    rates = np.zeros(len(candles), dtype=RATES_DTYPE)
+    for field in ("close", "high", "low"):
+        rates[field] = [c[field] for c in candles]
+    assert trend_bias_rates(rates) == reference_trend_bias(candles)
+
+
+def test_batch_reports_every_pair_by_broker_name():
+    main.app.dependency_overrides[auth.get_current_user] = lambda: None
+    try:
+        with TestClient(main.app) as client:
+            response = client.post("/bias/compute/batch", json={
+                "items": [{"symbol": "eurusd", "timeframe": "h1"}, {"symbol": "NOPE", "timeframe": "H1"}],
+                "symbols": ["EURUSD", "XAUUSD"],
+                "timeframes": ["H1", "X9"],
+                "candles": 50,
+            })
+    finally:
+        main.app.dependency_overrides.pop(auth.get_current_user, None)
+
+    assert response.status_code == 200
+    body = response.json()
+    results, errors = body["results"], {int(index): error for index, error in body["errors"].items()}
+    assert len(results) == 6
+    assert set(errors) == {1, 3, 5}
+    assert "NOPE" in errors[1] and "X9" in errors[3]
+    # The same pair asked for twice gets two identical entries
+    assert results[0]["symbol"] == results[2]["symbol"] == "EURUSDm"
+    assert results[0] == results[2]
+    assert results[4]["symbol"] == "XAUUSDm" and results[4]["timeframe"] == "H1"
+
+
+def candle_items(n=30):
+    candles = random_candles(random.Random(4), n, 0.01, 0.005)
+    return [
+        {"time": f"2024-01-01T{i % 24:02d}:00:00Z", "open": c["close"], "tick_volume": 1, **c}
+        for i, c in enumerate(candles)
+    ], candles
+
+
+def test_batch_with_client_candles_needs_no_terminal(monkeypatch):
+    async def terminal_down(symbol):
+        raise ConnectionError("MT5 not connected")
+    monkeypatch.setattr(bias.mt5_service, "resolve_symbol_async", terminal_down)
+
+    items, candles = candle_items()
+    main.app.dependency_overrides[auth.get_current_user] = lambda: None
+    try:
+        client = TestClient(main.app)  # no lifespan: the terminal is never connected
+        response = client.post("/bias/compute/batch", json={
+            "items": [{"symbol": "MyCustomIndex", "timeframe": "h1", "historical_data": items}],
+        })
+        assert response.status_code == 200
+        body = response.json()
+        assert body["errors"] == {}
+        result = body["results"][0]
+        assert result["symbol"] == "MyCustomIndex" and result["timeframe"] == "H1"
+        assert result["bias"] == reference_trend_bias(candles)["bias"]
+
+        # Server-side candles still need the terminal
+        response = client.post("/bias/compute/batch", json={"symbols": ["EURUSD"], "timeframes": ["H1"]})
+        assert response.status_code == 503
+    finally:
+        main.app.dependency_overrides.pop(auth.get_current_user, None)